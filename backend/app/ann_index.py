@@ -0,0 +1,626 @@
+# backend/app/ann_index.py
+
+import time
+from pathlib import Path
+from typing import Sequence
+
+import numpy as np
+from scipy import sparse
+
+from .instrumentation import RECOMMENDER_STAGE_SECONDS
+from .masks import fit_mask
+
+
+def top_k_rows(scores: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Row-wise top-k of a (batch, num_candidates) score block:
+    argpartition + sort of only k elements per row.
+    Returns (indices, scores), both of shape (batch, k), best first.
+    """
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        empty = np.empty((scores.shape[0], 0))
+        return empty.astype("int64"), empty.astype(scores.dtype)
+
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    part_scores = np.take_along_axis(scores, part, axis=1)
+    order = np.argsort(-part_scores, axis=1)
+    return (
+        np.take_along_axis(part, order, axis=1),
+        np.take_along_axis(part_scores, order, axis=1),
+    )
+
+
+def merge_candidates(
+    owner: np.ndarray,
+    idx: np.ndarray,
+    scores: np.ndarray,
+    priority: np.ndarray,
+    n_rows: int,
+    k: int,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Merges several ranked candidate lists per output row into one top-k list,
+    without a Python loop: flat candidates (owner row, item, score, priority),
+    duplicates of an item keep their lowest priority, each row is ordered by
+    priority (-score = best score first). idx < 0 marks padding.
+    Returns (n_rows, k) indices / scores padded with -1 / -inf.
+    """
+    keep = idx >= 0
+    owner, idx, scores, priority = owner[keep], idx[keep], scores[keep], priority[keep]
+
+    # best occurrence of every (row, item)
+    order = np.lexsort((priority, idx, owner))
+    owner, idx, scores, priority = owner[order], idx[order], scores[order], priority[order]
+    first = np.ones(len(idx), dtype=bool)
+    first[1:] = (idx[1:] != idx[:-1]) | (owner[1:] != owner[:-1])
+    owner, idx, scores, priority = owner[first], idx[first], scores[first], priority[first]
+
+    order = np.lexsort((priority, owner))
+    owner, idx, scores = owner[order], idx[order], scores[order]
+    row_start = np.zeros(n_rows + 1, dtype="int64")
+    row_start[1:] = np.cumsum(np.bincount(owner, minlength=n_rows))
+    rank = np.arange(len(owner)) - row_start[owner]
+    keep = rank < k
+
+    out_idx = np.full((n_rows, k), -1, dtype="int64")
+    out_scores = np.full((n_rows, k), -np.inf, dtype="float32")
+    out_idx[owner[keep], rank[keep]] = idx[keep]
+    out_scores[owner[keep], rank[keep]] = scores[keep]
+    return out_idx, out_scores
+
+
+QUANTIZATION_MODES = ("none", "float16", "int8")
+
+# files next to vectors.f32 in the embedding store directory, written by
+# scripts/convert_embeddings.py --quantize
+QUANTIZED_FILES = {"float16": "vectors.f16", "int8": "vectors.i8"}
+SCALES_FILE = "scales.f32"
+
+
+class QuantizedMatrix:
+    """
+    Compressed copy of the embedding matrix used for scoring:
+    - "float16": half-precision rows (2x smaller),
+    - "int8": symmetric scalar quantization with a float32 scale per row,
+      row ~= codes * scale (4x smaller).
+    Codes are built offline (write()) and memory-mapped by open(), so all
+    workers share one copy through the page cache and the float32 matrix is
+    only read for re-rank candidates. Rows appended to the store later are
+    quantized in memory (extend()).
+    numpy has no float16 / int8 GEMM, so scores() up-casts a few hundred
+    rows at a time into a float32 buffer that stays in cache. int8 scores
+    at about float32 GEMV speed; float16 is several times slower where
+    numpy has no SIMD half-precision conversion.
+    """
+
+    def __init__(self, mode: str, codes: np.ndarray, scales: np.ndarray | None):
+        self.mode = mode
+        self.codes = codes
+        self.scales = scales
+        # rows appended after the codes were built
+        self.tail_codes = codes[:0].copy()
+        self.tail_scales = None if scales is None else scales[:0].copy()
+        # rows up-cast per GEMM chunk (~512 KB of float32, stays in L2)
+        self.chunk_rows = max(16, (1 << 17) // max(1, codes.shape[1]))
+
+    def __len__(self) -> int:
+        return len(self.codes) + len(self.tail_codes)
+
+    @property
+    def nbytes(self) -> int:
+        scales = 0 if self.scales is None else self.scales.nbytes + self.tail_scales.nbytes
+        return self.codes.nbytes + self.tail_codes.nbytes + scales
+
+    @staticmethod
+    def _quantize(mode: str, rows: np.ndarray) -> tuple[np.ndarray, np.ndarray | None]:
+        rows = np.asarray(rows, dtype="float32")
+        if mode == "float16":
+            return rows.astype("float16"), None
+        if mode == "int8":
+            scales = np.abs(rows).max(axis=1) / 127.0
+            scales = np.where(scales > 0, scales, 1.0).astype("float32")
+            codes = np.clip(np.rint(rows / scales[:, None]), -127, 127).astype("int8")
+            return codes, scales
+        raise ValueError(f"unknown quantization mode {mode!r}")
+
+    @classmethod
+    def from_matrix(
+        cls, matrix: np.ndarray, mode: str, chunk_size: int = 65536
+    ) -> "QuantizedMatrix":
+        """
+        Quantizes a (memmapped) matrix in chunks of rows, in memory.
+        """
+        codes = np.empty(matrix.shape, dtype="float16" if mode == "float16" else "int8")
+        scales = np.empty(len(matrix), dtype="float32") if mode == "int8" else None
+        for start in range(0, len(matrix), chunk_size):
+            c, sc = cls._quantize(mode, matrix[start : start + chunk_size])
+            codes[start : start + len(c)] = c
+            if scales is not None:
+                scales[start : start + len(c)] = sc
+        return cls(mode, codes, scales)
+
+    @classmethod
+    def write(
+        cls, path: str | Path, matrix: np.ndarray, mode: str, chunk_size: int = 65536
+    ) -> None:
+        """
+        Quantizes matrix in chunks of rows into the store directory path
+        (temporary files renamed at the end, so readers never see half a file).
+        """
+        if mode not in QUANTIZED_FILES:
+            raise ValueError(f"unknown quantization mode {mode!r}")
+        path = Path(path)
+        codes_path = path / QUANTIZED_FILES[mode]
+        scales_path = path / SCALES_FILE
+        tmp_codes = codes_path.with_name(codes_path.name + ".tmp")
+        tmp_scales = scales_path.with_name(scales_path.name + ".tmp")
+        with open(tmp_codes, "wb") as fc, open(tmp_scales, "wb") as fs:
+            for start in range(0, len(matrix), chunk_size):
+                codes, scales = cls._quantize(mode, matrix[start : start + chunk_size])
+                fc.write(codes.tobytes())
+                if scales is not None:
+                    fs.write(scales.tobytes())
+        tmp_codes.replace(codes_path)
+        if mode == "int8":
+            tmp_scales.replace(scales_path)
+        else:
+            tmp_scales.unlink()
+
+    @classmethod
+    def open(cls, path: str | Path, mode: str, dim: int) -> "QuantizedMatrix | None":
+        """
+        Read-only memmap of codes written by write(); None if missing.
+        """
+        path = Path(path)
+        codes_path = path / QUANTIZED_FILES[mode]
+        scales_path = path / SCALES_FILE
+        if not codes_path.exists() or (mode == "int8" and not scales_path.exists()):
+            return None
+        dtype = np.dtype("float16" if mode == "float16" else "int8")
+        n_rows = codes_path.stat().st_size // (dim * dtype.itemsize)
+        if n_rows == 0:
+            return None
+        codes = np.memmap(codes_path, dtype=dtype, mode="r", shape=(n_rows, dim))
+        scales = None
+        if mode == "int8":
+            scales = np.memmap(scales_path, dtype="float32", mode="r")
+            if len(scales) != n_rows:
+                return None  # written by another run of write()
+        return cls(mode, codes, scales)
+
+    def extend(self, matrix: np.ndarray) -> None:
+        """
+        Quantizes rows appended to the matrix since the last call.
+        """
+        if len(matrix) <= len(self):
+            return
+        codes, scales = self._quantize(self.mode, matrix[len(self) :])
+        self.tail_codes = np.concatenate([self.tail_codes, codes])
+        if self.scales is not None:
+            self.tail_scales = np.concatenate([self.tail_scales, scales])
+
+    def rows(self, idx: np.ndarray) -> np.ndarray:
+        """
+        Dequantized float32 rows.
+        """
+        idx = np.asarray(idx)
+        base = len(self.codes)
+        in_tail = idx >= base
+        out = np.empty((len(idx), self.codes.shape[1]), dtype="float32")
+        out[~in_tail] = self.codes[idx[~in_tail]]
+        out[in_tail] = self.tail_codes[idx[in_tail] - base]
+        if self.scales is not None:
+            out[~in_tail] *= self.scales[idx[~in_tail]][:, None]
+            out[in_tail] *= self.tail_scales[idx[in_tail] - base][:, None]
+        return out
+
+    def scores(self, queries: np.ndarray) -> np.ndarray:
+        """
+        queries @ matrix.T, shape (b, num_rows), float32.
+        """
+        out = np.empty((len(queries), len(self)), dtype="float32")
+        buf = np.empty((self.chunk_rows, self.codes.shape[1]), dtype="float32")
+        offset = 0
+        for codes in (np.asarray(self.codes), self.tail_codes):
+            for start in range(0, len(codes), self.chunk_rows):
+                stop = min(start + self.chunk_rows, len(codes))
+                rows = buf[: stop - start]
+                np.copyto(rows, codes[start:stop], casting="unsafe")
+                out[:, offset + start : offset + stop] = queries @ rows.T
+            offset += len(codes)
+        if self.scales is not None:
+            out[:, : len(self.codes)] *= self.scales[None, :]
+            out[:, len(self.codes) :] *= self.tail_scales[None, :]
+        return out
+
+
+def rerank_exact(
+    matrix: np.ndarray, queries: np.ndarray, cand: np.ndarray, k: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Re-scores (b, m) candidate rows (-1 = padding) with the exact float32
+    matrix and returns the top-k, padded with -1 / -inf.
+    """
+    valid = cand >= 0
+    exact = np.full(cand.shape, -np.inf, dtype="float32")
+    if valid.any():
+        vectors = np.asarray(matrix[cand[valid]], dtype="float32")
+        owner = np.nonzero(valid)[0]
+        exact[valid] = np.einsum("ij,ij->i", vectors, queries[owner])
+    top, top_scores = top_k_rows(exact, k)
+    idx = np.take_along_axis(cand, top, axis=1)
+    idx[~np.isfinite(top_scores)] = -1
+    return idx, top_scores
+
+
+def spherical_kmeans(
+    x: np.ndarray,
+    k: int,
+    n_iter: int = 20,
+    seed: int = 0,
+    chunk_size: int = 65536,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    k-means on L2-normalized rows with cosine similarity.
+    Returns (centroids of shape (k, dim), assignment of shape (n,)).
+    Assignment is computed in chunks so memory stays O(chunk_size * k).
+    """
+    rng = np.random.default_rng(seed)
+    n = len(x)
+    k = min(k, n)
+    centroids = np.array(x[rng.choice(n, size=k, replace=False)], dtype="float32")
+    assign = np.zeros(n, dtype="int32")
+
+    for _ in range(n_iter):
+        for start in range(0, n, chunk_size):
+            chunk = np.asarray(x[start : start + chunk_size], dtype="float32")
+            assign[start : start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+
+        # cluster sums as one sparse (k x n) one-hot @ x product
+        one_hot = sparse.csr_matrix(
+            (np.ones(n, dtype="float32"), (assign, np.arange(n))), shape=(k, n)
+        )
+        sums = np.asarray(one_hot @ x, dtype="float32")
+        counts = np.bincount(assign, minlength=k)
+
+        # empty clusters are re-seeded with random points
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            sums[empty] = x[rng.choice(n, size=len(empty), replace=False)]
+
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        centroids = sums / np.clip(norms, 1e-8, None)
+
+    for start in range(0, n, chunk_size):
+        chunk = np.asarray(x[start : start + chunk_size], dtype="float32")
+        assign[start : start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+
+    return centroids.astype("float32"), assign
+
+
+class ExactIndex:
+    """
+    Brute-force cosine search over the full embedding matrix.
+    Always correct; the baseline every approximate index is measured against.
+    """
+
+    name = "exact"
+
+    def __init__(
+        self,
+        matrix: np.ndarray,
+        quantized: QuantizedMatrix | None = None,
+        rerank: int = 4,
+    ):
+        self.matrix = matrix
+        # rows that must never be returned (superseded / deleted products)
+        self.dead_rows = np.empty(0, dtype="int64")
+        # optional compressed copy scored instead of matrix; the best
+        # k * rerank candidates are re-scored in float32 (0 = no re-rank)
+        self.quantized = quantized
+        self.rerank = rerank
+
+    def update(self, matrix: np.ndarray, dead_rows: np.ndarray) -> None:
+        """
+        Switches to a grown matrix (rows are only ever appended).
+        """
+        self.matrix = matrix
+        self.dead_rows = dead_rows
+        if self.quantized is not None:
+            self.quantized.extend(matrix)
+
+    def search(
+        self,
+        queries: np.ndarray,
+        k: int,
+        exclude: Sequence[np.ndarray] | None = None,
+        mask: np.ndarray | None = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k rows of matrix for each query (L2-normalized, shape (b, dim)).
+        exclude[i] holds row indices that must not be returned for query i,
+        mask (bool per row, see masks.py) rows excluded for every query.
+        Missing results are padded with index -1 and score -inf.
+        """
+        with RECOMMENDER_STAGE_SECONDS.time(stage="score"):
+            if self.quantized is not None:
+                scores = self.quantized.scores(queries)
+            else:
+                scores = queries @ self.matrix.T  # (b, num_products)
+            if len(self.dead_rows):
+                scores[:, self.dead_rows] = -np.inf
+            if mask is not None:
+                np.copyto(scores, -np.inf, where=fit_mask(mask, scores.shape[1])[None, :])
+
+            if exclude is not None:
+                mask_rows = np.repeat(np.arange(len(queries)), [len(e) for e in exclude])
+                if len(mask_rows):
+                    scores[mask_rows, np.concatenate(exclude)] = -np.inf
+
+        rerank = self.quantized is not None and self.rerank > 0
+        with RECOMMENDER_STAGE_SECONDS.time(stage="topk"):
+            top_idx, top_scores = top_k_rows(scores, k * self.rerank if rerank else k)
+            top_idx[~np.isfinite(top_scores)] = -1
+        if rerank:
+            with RECOMMENDER_STAGE_SECONDS.time(stage="rerank"):
+                top_idx, top_scores = rerank_exact(self.matrix, queries, top_idx, k)
+        return top_idx, top_scores
+
+
+class IVFIndex:
+    """
+    Inverted-file index: a spherical k-means coarse quantizer splits the
+    catalog into nlist cells; a query is scored exactly only against items
+    of its nprobe closest cells.
+
+    nprobe is the recall/latency knob: nprobe = nlist is exact search,
+    small nprobe scans roughly nprobe / nlist of the catalog.
+    """
+
+    name = "ivf"
+
+    def __init__(
+        self,
+        matrix: np.ndarray,
+        centroids: np.ndarray,
+        list_offsets: np.ndarray,
+        list_items: np.ndarray,
+        nprobe: int = 8,
+        quantized: QuantizedMatrix | None = None,
+        rerank: int = 4,
+    ):
+        self.matrix = matrix
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.list_items = list_items
+        self.nprobe = nprobe
+        self.dead = np.zeros(len(matrix), dtype=bool)
+        # as in ExactIndex: candidates scored from the compressed copy
+        self.quantized = quantized
+        self.rerank = rerank
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    @classmethod
+    def build(
+        cls,
+        matrix: np.ndarray,
+        nlist: int | None = None,
+        n_iter: int = 20,
+        max_train_points: int = 200_000,
+        nprobe: int = 8,
+        seed: int = 0,
+    ) -> "IVFIndex":
+        n = len(matrix)
+        if nlist is None:
+            nlist = max(1, int(4 * np.sqrt(n)))
+        nlist = min(nlist, n)
+
+        # train the coarse quantizer on a sample, then assign every item
+        rng = np.random.default_rng(seed)
+        if n > max_train_points:
+            train = np.asarray(matrix[np.sort(rng.choice(n, max_train_points, replace=False))])
+        else:
+            train = np.asarray(matrix)
+        centroids, _ = spherical_kmeans(train, nlist, n_iter=n_iter, seed=seed)
+
+        assign = np.empty(n, dtype="int32")
+        for start in range(0, n, 65536):
+            chunk = np.asarray(matrix[start : start + 65536], dtype="float32")
+            assign[start : start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+
+        list_items = np.argsort(assign, kind="stable").astype("int32")
+        list_offsets = np.zeros(len(centroids) + 1, dtype="int64")
+        list_offsets[1:] = np.cumsum(np.bincount(assign, minlength=len(centroids)))
+
+        return cls(matrix, centroids, list_offsets, list_items, nprobe=nprobe)
+
+    def save(self, path: str | Path) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez(
+            path,
+            centroids=self.centroids,
+            list_offsets=self.list_offsets,
+            list_items=self.list_items,
+            num_items=np.int64(len(self.matrix)),
+        )
+
+    @classmethod
+    def load(
+        cls,
+        path: str | Path,
+        matrix: np.ndarray,
+        nprobe: int = 8,
+        quantized: QuantizedMatrix | None = None,
+        rerank: int = 4,
+    ) -> "IVFIndex":
+        """
+        Rows appended to the store after the index was built are assigned
+        to their nearest cells on load; a shrunk matrix needs a rebuild.
+        """
+        data = np.load(path)
+        num_items = int(data["num_items"])
+        if num_items > len(matrix):
+            raise ValueError(
+                f"IVF index at {path} covers {num_items} items, "
+                f"embedding matrix has {len(matrix)} — rebuild the index"
+            )
+        index = cls(
+            matrix[:num_items],
+            data["centroids"],
+            data["list_offsets"],
+            data["list_items"],
+            nprobe=nprobe,
+            quantized=quantized,
+            rerank=rerank,
+        )
+        if num_items < len(matrix):
+            index.update(matrix, np.empty(0, dtype="int64"))
+        return index
+
+    def update(self, matrix: np.ndarray, dead_rows: np.ndarray) -> None:
+        """
+        Switches to a grown matrix (rows are only ever appended): new rows
+        go to the inverted list of their nearest centroid.
+        """
+        n_old = len(self.matrix)
+        if len(matrix) > n_old:
+            sizes = np.diff(self.list_offsets)
+            assign = np.empty(len(matrix), dtype="int32")
+            assign[self.list_items] = np.repeat(np.arange(self.nlist), sizes)
+            new = np.asarray(matrix[n_old:], dtype="float32")
+            assign[n_old:] = np.argmax(new @ self.centroids.T, axis=1)
+
+            self.list_items = np.argsort(assign, kind="stable").astype("int32")
+            self.list_offsets = np.zeros(self.nlist + 1, dtype="int64")
+            self.list_offsets[1:] = np.cumsum(np.bincount(assign, minlength=self.nlist))
+
+        self.matrix = matrix
+        self.dead = np.zeros(len(matrix), dtype=bool)
+        self.dead[dead_rows] = True
+        if self.quantized is not None:
+            self.quantized.extend(matrix)
+
+    def search(
+        self,
+        queries: np.ndarray,
+        k: int,
+        exclude: Sequence[np.ndarray] | None = None,
+        mask: np.ndarray | None = None,
+        nprobe: int | None = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Same contract as ExactIndex.search.
+        """
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        k = min(k, len(self.matrix))
+        b = len(queries)
+        out_idx = np.full((b, k), -1, dtype="int64")
+        out_scores = np.full((b, k), -np.inf, dtype="float32")
+
+        # coarse step for the whole batch at once
+        with RECOMMENDER_STAGE_SECONDS.time(stage="ivf_probe"):
+            probe, _ = top_k_rows(queries @ self.centroids.T, nprobe)
+
+        rerank = self.quantized is not None and self.rerank > 0
+        k_cand = k * self.rerank if rerank else k
+        if rerank:
+            out_idx = np.full((b, k_cand), -1, dtype="int64")
+            out_scores = np.full((b, k_cand), -np.inf, dtype="float32")
+
+        # dead rows and masked rows are dropped from every candidate list
+        skip = self.dead
+        if mask is not None:
+            skip = skip | fit_mask(mask, len(skip))
+
+        t_start = time.perf_counter()
+        t_topk = 0.0
+        for i in range(b):
+            starts = self.list_offsets[probe[i]]
+            ends = self.list_offsets[probe[i] + 1]
+            cand = np.concatenate(
+                [self.list_items[s:e] for s, e in zip(starts, ends)]
+            )
+            cand = cand[~skip[cand]]
+            if exclude is not None and len(exclude[i]):
+                cand = cand[~np.isin(cand, exclude[i])]
+            if len(cand) == 0:
+                continue
+
+            if self.quantized is not None:
+                scores = self.quantized.rows(cand) @ queries[i]
+            else:
+                scores = np.asarray(self.matrix[cand]) @ queries[i]
+            t = time.perf_counter()
+            top, top_scores = top_k_rows(scores[None, :], k_cand)
+            t_topk += time.perf_counter() - t
+            out_idx[i, : top.shape[1]] = cand[top[0]]
+            out_scores[i, : top.shape[1]] = top_scores[0]
+
+        # per-query loop: candidate gathering + scoring vs top-k selection
+        RECOMMENDER_STAGE_SECONDS.observe(time.perf_counter() - t_start - t_topk, stage="score")
+        RECOMMENDER_STAGE_SECONDS.observe(t_topk, stage="topk")
+        if rerank:
+            with RECOMMENDER_STAGE_SECONDS.time(stage="rerank"):
+                out_idx, out_scores = rerank_exact(self.matrix, queries, out_idx, k)
+        return out_idx, out_scores
+
+
+def load_index(settings, matrix: np.ndarray) -> ExactIndex | IVFIndex:
+    """
+    Index selected by Settings.ann_backend, scoring the quantized codes of
+    the embedding store if Settings.embedding_quantization is set.
+    Falls back to exact search when the IVF index is missing or stale.
+    """
+    quantized = None
+    mode = settings.embedding_quantization
+    if mode not in QUANTIZATION_MODES:
+        print(f"⚠️ WARNING: unknown embedding_quantization={mode!r}, scoring float32")
+    elif mode != "none":
+        path = Path(settings.product_embeddings_store_path)
+        quantized = QuantizedMatrix.open(path, mode, matrix.shape[1])
+        if quantized is None:
+            print(
+                f"⚠️ WARNING: {mode} codes not found in {path}, scoring float32. "
+                f"Run scripts/convert_embeddings.py --quantize {mode} to build them."
+            )
+        elif len(quantized) > len(matrix):
+            print(
+                f"⚠️ WARNING: {mode} codes in {path} cover {len(quantized)} rows, "
+                f"embedding matrix has {len(matrix)} — rebuild them, scoring float32"
+            )
+            quantized = None
+        else:
+            quantized.extend(matrix)
+            print(
+                f"Loaded {mode} codes: {quantized.nbytes / 2**20:.1f} MB "
+                f"({len(quantized.tail_codes)} rows quantized in memory), "
+                f"re-rank x{settings.quantization_rerank}"
+            )
+    rerank = settings.quantization_rerank
+
+    if settings.ann_backend == "ivf":
+        path = Path(settings.ann_index_path)
+        if path.exists():
+            try:
+                index = IVFIndex.load(
+                    path, matrix, nprobe=settings.ann_nprobe, quantized=quantized, rerank=rerank
+                )
+                print(f"Loaded IVF index: nlist={index.nlist}, nprobe={index.nprobe}")
+                return index
+            except ValueError as e:
+                print(f"⚠️ WARNING: {e}")
+        else:
+            print(
+                f"⚠️ WARNING: IVF index not found at {path}, using exact search. "
+                "Run scripts/build_ann_index.py to build it."
+            )
+    elif settings.ann_backend != "exact":
+        print(f"⚠️ WARNING: unknown ann_backend={settings.ann_backend!r}, using exact search")
+
+    return ExactIndex(matrix, quantized=quantized, rerank=rerank)
+
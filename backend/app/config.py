@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -6,8 +8,88 @@ class Settings(BaseSettings):
     api_host: str = "0.0.0.0"
     api_port: int = 8000
 
+    # legacy JSON histories — used only if the binary purchase store is missing
     user_purchases_path: str = "backend/data/user_purchases.json"
+    # CSR purchase histories (scripts/build_user_purchases.py)
+    user_purchases_store_path: str = "backend/data/user_purchases.npz"
+    # legacy JSON embeddings — used only if the binary store is missing
     product_embeddings_path: str = "backend/data/product_embeddings.json"
+    # binary embedding store (scripts/convert_embeddings.py), opened with np.memmap
+    product_embeddings_store_path: str = "backend/data/product_embeddings"
+
+    # user profile weighting (counts / timestamps from build_user_purchases.py):
+    # weight = count ** profile_frequency_exponent * 0.5 ** (age_days / profile_half_life_days),
+    # age counted from the user's latest purchase; 0 disables a factor (plain mean)
+    profile_half_life_days: float = 0.0
+    profile_frequency_exponent: float = 0.0
+
+    # multi-interest profiles (scripts/build_user_interests.py): every interest
+    # vector is scored and the lists merged by "max" score or "round_robin";
+    # "off" = one mean vector per user
+    multi_interest_merge: str = "off"
+    user_interests_path: str = "backend/data/user_interests.npz"
+
+    # co-purchase neighbours (scripts/build_item_neighbours.py)
+    item_neighbours_path: str = "backend/data/item_neighbours.npz"
+    # backend for similar products (checked at startup; the request's
+    # ?backend= overrides it)
+    similar_products_backend: Literal["embedding", "copurchase"] = "embedding"
+
+    # users scored per matmul in Recommender.recommend_for_users
+    # (block x num_products float32 scores are held in memory at once)
+    recommend_batch_size: int = 128
+
+    # nearest-neighbour search: "exact" (brute force) or "ivf" (scripts/build_ann_index.py)
+    ann_backend: str = "exact"
+    ann_index_path: str = "backend/data/ann_ivf.npz"
+    # IVF cells scanned per query: higher = better recall, slower
+    ann_nprobe: int = 8
+    # score a compressed copy of the embedding matrix: "none" (float32),
+    # "float16" or "int8" (per-row scales); the best top_n * quantization_rerank
+    # candidates are re-scored with the float32 matrix (0 = quantized scores as-is);
+    # codes are built by scripts/convert_embeddings.py --quantize-only <mode>
+    embedding_quantization: str = "none"
+    quantization_rerank: int = 4
+
+    # candidate masks (masks.py): non-product stock codes (POST, DOT, M, ...)
+    # are never recommended, nor are product ids listed here or in the
+    # blocklist file (one id per line, e.g. out-of-stock items)
+    product_blocklist: list[str] = []
+    product_blocklist_path: str = "backend/data/product_blocklist.txt"
+
+    # diversity re-rank (diversity.py): MMR over the top diversity_pool
+    # candidates, lambda = weight of relevance vs. similarity to picked items
+    # (1 = off). On by default for the listed endpoints: "recommendations"
+    # (single + batch), "similar" (product page), "cart"; requests can
+    # override lambda with ?diversity=
+    diversity_lambda: float = 0.7
+    diversity_pool: int = 200
+    diversity_endpoints: list[str] = []
+
+    # precomputed top-K tables (scripts/build_topk_tables.py): O(1) lookups for
+    # known, unchanged users / products; everything else is scored live.
+    # Used only if the file exists; max age 0 = no limit
+    topk_tables_enabled: bool = True
+    topk_tables_path: str = "backend/data/topk_tables.npz"
+    topk_tables_max_age_s: float = 0.0
+
+    # live purchase events (events.py): write-ahead log of JSONL segments,
+    # tailed by every worker and compacted into user_purchases_store_path
+    purchase_events_enabled: bool = True
+    purchase_events_path: str = "backend/data/purchase_events"
+    purchase_events_fsync: bool = False
+    purchase_events_poll_s: float = 0.5
+    # 0 = never compact (e.g. when another process owns the store)
+    purchase_events_compact_interval_s: float = 60.0
+
+    # pre-fork serving (python -m backend.app.serve): 0 workers = one per CPU,
+    # 0 BLAS threads = cpu_count // workers per worker
+    serve_workers: int = 0
+    serve_blas_threads: int = 0
+
+    # hot reload: poll data files and swap in a new Recommender snapshot on change
+    reload_watch: bool = False
+    reload_watch_interval_s: float = 5.0
 
     # LLM (Cloud.ru Foundation Models)
     foundation_models_api_key: str = Field(default="", validation_alias="API_KEY")
@@ -21,6 +103,24 @@ class Settings(BaseSettings):
         validation_alias="FOUNDATION_MODELS_CHAT_MODEL",
     )
 
+    # parallel LLM calls per worker and per-call timeout for explanations;
+    # a timed out explanation is returned empty instead of blocking the response
+    llm_max_concurrency: int = 8
+    llm_timeout_s: float = 10.0
+
+    # LLM explanations cache: in-process LRU + SQLite file shared by workers
+    explanation_cache_enabled: bool = True
+    explanation_cache_path: str = "backend/data/explanation_cache.sqlite"
+    explanation_cache_memory_items: int = 2048
+    explanation_cache_disk_items: int = 100_000
+    explanation_cache_ttl_s: float = 7 * 24 * 3600
+
+    # /metrics (Prometheus text format) + per-request timing middleware
+    metrics_enabled: bool = True
+    # sampling profiler behind /api/admin/profiler/{start,stop}; off by default
+    profiler_enabled: bool = False
+    profiler_interval_ms: float = 5.0
+
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
 
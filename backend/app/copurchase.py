@@ -0,0 +1,36 @@
+# backend/app/copurchase.py
+
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+
+class ItemNeighbours:
+    """
+    Precomputed co-purchase neighbours (scripts/build_item_neighbours.py):
+    top-K items bought in the same baskets, stored as CSR arrays
+    (indptr / indices / scores) over the item_ids vocabulary.
+    """
+
+    def __init__(self, path: str | Path):
+        data = np.load(path)
+        self.item_ids: List[str] = data["item_ids"].tolist()
+        self.descriptions: List[str] = data["descriptions"].tolist()
+        self.indptr: np.ndarray = data["indptr"]
+        self.indices: np.ndarray = data["indices"]
+        self.scores: np.ndarray = data["scores"]
+        self.id_to_index: Dict[str, int] = {pid: i for i, pid in enumerate(self.item_ids)}
+
+    def neighbours(self, product_id: str, top_n: int) -> List[tuple[str, float]]:
+        """
+        [(product_id, score), ...] best first; rows are stored pre-sorted.
+        """
+        i = self.id_to_index.get(product_id)
+        if i is None:
+            return []
+        start, end = self.indptr[i], min(self.indptr[i + 1], self.indptr[i] + top_n)
+        return [
+            (self.item_ids[j], float(score))
+            for j, score in zip(self.indices[start:end], self.scores[start:end])
+        ]
@@ -0,0 +1,273 @@
+# backend/app/embedding_store.py
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+META_FILE = "meta.json"
+VECTORS_FILE = "vectors.f32"
+ROWS_FILE = "rows.jsonl"
+
+
+def content_hash(text: str) -> str:
+    """
+    Hash of a product description — detects changed items in incremental builds.
+    """
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+def normalize_rows(arr: np.ndarray) -> np.ndarray:
+    """
+    L2-normalizes rows so cosine similarity = dot product.
+    """
+    arr = np.asarray(arr, dtype="float32")
+    norms = np.linalg.norm(arr, axis=1, keepdims=True)
+    norms = np.clip(norms, 1e-8, None)
+    return (arr / norms).astype("float32", copy=False)
+
+
+class EmbeddingStore:
+    """
+    Read side of the binary product embedding store.
+
+    A store is a directory with:
+    - meta.json   — {"dim": int, "dtype": "float32", "model": str}
+    - vectors.f32 — raw row-major float32 matrix, rows are L2-normalized
+    - rows.jsonl  — one {"product_id", "description", "hash"} object per matrix row
+
+    Both files are append-only. When a product_id appears on several rows
+    the last one wins; a row with "deleted": true (and a zero vector) is a
+    tombstone. live_rows() gives the rows that are current.
+
+    The matrix is opened with np.memmap (read-only), so uvicorn workers
+    share the same pages through the OS page cache and opening the store
+    costs almost nothing regardless of catalog size.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+
+        with open(self.path / META_FILE, "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.dim: int = int(self.meta["dim"])
+
+        # per matrix row
+        self.product_ids: List[str] = []
+        self.descriptions: List[str] = []
+        self.hashes: List[str] = []
+        self.deleted: List[bool] = []
+
+        self.matrix: np.ndarray = np.empty((0, self.dim), dtype="float32")
+        self.in_memory = False
+
+        # byte offset of the first unread line in rows.jsonl
+        self._rows_offset = 0
+
+        self.refresh()
+
+    def refresh(self) -> int:
+        """
+        Picks up rows appended since the last open/refresh.
+        Returns the number of new rows.
+        """
+        if self.in_memory:
+            return 0  # legacy JSON store, nothing is ever appended
+
+        row_bytes = self.dim * 4
+        vectors_path = self.path / VECTORS_FILE
+        n_vectors = vectors_path.stat().st_size // row_bytes if vectors_path.exists() else 0
+
+        n_before = len(self.product_ids)
+        with open(self.path / ROWS_FILE, "rb") as f:
+            f.seek(self._rows_offset)
+            # rows.jsonl and vectors.f32 are appended separately, so after a
+            # crash (or mid-write) one of them can be ahead — only take rows
+            # present in both
+            while len(self.product_ids) < n_vectors:
+                line = f.readline()
+                if not line.endswith(b"\n"):
+                    break  # half-written trailing line
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                self._rows_offset += len(line)
+
+                desc = row.get("description", "")
+                self.product_ids.append(str(row["product_id"]))
+                self.descriptions.append(desc)
+                self.hashes.append(row.get("hash") or content_hash(desc))
+                self.deleted.append(bool(row.get("deleted", False)))
+
+        n_rows = len(self.product_ids)
+        if n_rows != n_before:
+            self.matrix = np.memmap(
+                vectors_path, dtype="float32", mode="r", shape=(n_rows, self.dim)
+            )
+        return n_rows - n_before
+
+    def live_rows(self) -> Dict[str, int]:
+        """
+        product_id -> row of its current (last, non-deleted) version.
+        """
+        latest: Dict[str, int] = {}
+        for row, pid in enumerate(self.product_ids):
+            latest[pid] = row
+        return {pid: row for pid, row in latest.items() if not self.deleted[row]}
+
+    def __len__(self) -> int:
+        return len(self.product_ids)
+
+    @classmethod
+    def exists(cls, path: str | Path) -> bool:
+        path = Path(path)
+        return (path / META_FILE).exists() and (path / ROWS_FILE).exists()
+
+    @classmethod
+    def from_json(cls, json_path: str | Path) -> "EmbeddingStore":
+        """
+        Legacy loader for product_embeddings.json.
+
+        Builds an in-memory store with the same attributes as the binary
+        one. Slow and memory-hungry — use scripts/convert_embeddings.py
+        to produce the binary store instead.
+        """
+        with open(json_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+        store = cls.__new__(cls)
+        store.path = Path(json_path)
+        store.product_ids = [str(pid) for pid in data.keys()]
+        store.descriptions = [data[pid].get("description", "") for pid in data.keys()]
+        store.hashes = [content_hash(d) for d in store.descriptions]
+        store.deleted = [False] * len(store.product_ids)
+        store._rows_offset = 0
+
+        embs = [data[pid]["embedding"] for pid in data.keys()]
+        del data
+        dim = len(embs[0]) if embs else 0
+        store.matrix = (
+            normalize_rows(np.array(embs, dtype="float32"))
+            if embs
+            else np.empty((0, dim), dtype="float32")
+        )
+        store.dim = dim
+        store.meta = {"dim": dim, "dtype": "float32", "model": ""}
+        store.in_memory = True
+        return store
+
+
+class EmbeddingStoreWriter:
+    """
+    Append-only writer for the binary embedding store.
+
+    Vectors are flushed before their rows.jsonl entries, so a reader never
+    sees a row without its vector; a torn write at the end is dropped by
+    EmbeddingStore on open.
+    """
+
+    def __init__(self, path: str | Path, dim: int, model: str = ""):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.dim = dim
+
+        meta_path = self.path / META_FILE
+        if meta_path.exists():
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if int(meta["dim"]) != dim:
+                raise ValueError(
+                    f"Store at {self.path} has dim={meta['dim']}, got dim={dim}"
+                )
+        else:
+            with open(meta_path, "w", encoding="utf-8") as f:
+                json.dump({"dim": dim, "dtype": "float32", "model": model}, f)
+
+        self._repair()
+
+        self._vectors = open(self.path / VECTORS_FILE, "ab")
+        self._rows = open(self.path / ROWS_FILE, "a", encoding="utf-8")
+
+    def _repair(self) -> None:
+        """
+        Truncates vectors.f32 and rows.jsonl to their common valid prefix,
+        so appends after a crash stay aligned row-for-row.
+        """
+        vectors_path = self.path / VECTORS_FILE
+        rows_path = self.path / ROWS_FILE
+        row_bytes = self.dim * 4
+
+        lines: List[str] = []
+        if rows_path.exists():
+            with open(rows_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if not line.endswith("\n"):
+                        break
+                    try:
+                        json.loads(line)
+                    except json.JSONDecodeError:
+                        break
+                    lines.append(line)
+
+        n_vectors = vectors_path.stat().st_size // row_bytes if vectors_path.exists() else 0
+        n = min(len(lines), n_vectors)
+
+        if vectors_path.exists() and vectors_path.stat().st_size != n * row_bytes:
+            with open(vectors_path, "r+b") as f:
+                f.truncate(n * row_bytes)
+        if not rows_path.exists() or len(lines) != n or rows_path.stat().st_size != sum(
+            len(line.encode("utf-8")) for line in lines
+        ):
+            with open(rows_path, "w", encoding="utf-8") as f:
+                f.writelines(lines[:n])
+
+    def append(
+        self,
+        product_ids: Sequence[str],
+        descriptions: Sequence[str],
+        vectors: np.ndarray,
+    ) -> None:
+        vectors = normalize_rows(np.asarray(vectors, dtype="float32").reshape(-1, self.dim))
+        if len(product_ids) != len(vectors) or len(descriptions) != len(vectors):
+            raise ValueError("product_ids, descriptions and vectors must have the same length")
+
+        self._vectors.write(vectors.tobytes())
+        self._vectors.flush()
+        os.fsync(self._vectors.fileno())
+
+        self._write_rows(
+            {"product_id": str(pid), "description": desc, "hash": content_hash(desc)}
+            for pid, desc in zip(product_ids, descriptions)
+        )
+
+    def delete(self, product_ids: Sequence[str]) -> None:
+        """
+        Appends tombstones (zero vector + "deleted": true) for product_ids.
+        """
+        if not product_ids:
+            return
+        self._vectors.write(np.zeros((len(product_ids), self.dim), dtype="float32").tobytes())
+        self._vectors.flush()
+        os.fsync(self._vectors.fileno())
+
+        self._write_rows({"product_id": str(pid), "deleted": True} for pid in product_ids)
+
+    def _write_rows(self, rows) -> None:
+        for row in rows:
+            self._rows.write(json.dumps(row, ensure_ascii=False) + "\n")
+        self._rows.flush()
+        os.fsync(self._rows.fileno())
+
+    def close(self) -> None:
+        self._vectors.close()
+        self._rows.close()
+
+    def __enter__(self) -> "EmbeddingStoreWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,323 @@
+# backend/app/events.py
+#
+# Live purchase events: a write-ahead log of JSONL segments
+#
+#   <purchase_events_path>/00000001.jsonl, 00000002.jsonl, ...
+#   one {"user_id", "product_id", "ts"} object per line
+#
+# - POST /api/events/purchase (and scripts/replay_events.py) append to the
+#   newest segment under a file lock, so several workers / processes can write,
+# - every worker tails the log (EventFollower) and applies new events to its
+#   recommender snapshot, so a purchase reaches all workers within a poll,
+# - compaction merges closed segments into the purchase store
+#   (user_purchases.npz, which records the last merged segment) and deletes
+#   them; the active segment is rotated once per compaction, and a closed
+#   segment is only merged once it has been idle for grace_s, so every
+#   worker's follower has read it first.
+#
+# A snapshot loads the store and reads the segments newer than its
+# wal_segment under the compaction lock, replays them, and from then on reads every event once by its log position
+# (a repeated purchase raises the item's count, so an event applied twice
+# would be counted twice).
+
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+from .purchase_store import load_histories
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process locking only
+    fcntl = None
+
+SEGMENT_SUFFIX = ".jsonl"
+LOCK_FILE = "wal.lock"
+COMPACT_LOCK_FILE = "compact.lock"
+
+# (segment number, byte offset of the first unread line)
+Position = Tuple[int, int]
+
+
+def make_event(record: Dict[str, Any]) -> Dict[str, Any] | None:
+    """
+    Log record from an incoming event ({"user_id", "product_id", "ts"?}),
+    None if it lacks ids or has an invalid time; events without a time are
+    stamped now.
+    """
+    user_id, product_id = record.get("user_id"), record.get("product_id")
+    if user_id in (None, "") or product_id in (None, ""):
+        return None
+    ts = record.get("ts")
+    if ts is None:
+        ts = time.time()
+    else:
+        try:
+            ts = float(ts)
+        except (TypeError, ValueError):
+            ts = math.nan
+        if not math.isfinite(ts):
+            print(f"⚠️ WARNING: skipping purchase event with invalid ts: {record.get('ts')!r}")
+            return None
+    return {"user_id": str(user_id), "product_id": str(product_id), "ts": ts}
+
+
+def read_jsonl(
+    path: str | Path, offset: int = 0, max_bytes: int = -1
+) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Complete lines of a JSONL file from byte offset on (about max_bytes
+    read); returns (records, offset after the last complete line). A
+    half-written last line is left for the next call, which is what a tail
+    reader needs. A line longer than max_bytes is read to its end, so the
+    offset always moves past a complete line.
+    """
+    with open(path, "rb") as f:
+        f.seek(offset)
+        data = f.read(max_bytes)
+        if max_bytes > 0 and len(data) == max_bytes and b"\n" not in data:
+            data += f.readline()
+    end = data.rfind(b"\n") + 1
+    records = []
+    for line in data[:end].splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            records.append(json.loads(line))
+        except json.JSONDecodeError:
+            print(f"⚠️ WARNING: skipping malformed event line in {path}: {line[:80]!r}")
+    return records, offset + end
+
+
+class PurchaseEventLog:
+    def __init__(self, path: str | Path, fsync: bool = False, grace_s: float = 10.0):
+        self.path = Path(path)
+        self.fsync = fsync
+        # a closed segment is merged only after it has been idle this long,
+        # so every worker's follower has read it
+        self.grace_s = grace_s
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._thread_locks = {LOCK_FILE: threading.Lock(), COMPACT_LOCK_FILE: threading.Lock()}
+
+    # --- segments ---
+
+    def _segment_path(self, n: int) -> Path:
+        return self.path / f"{n:08d}{SEGMENT_SUFFIX}"
+
+    def segments(self) -> List[int]:
+        return sorted(
+            int(p.stem) for p in self.path.glob(f"*{SEGMENT_SUFFIX}") if p.stem.isdigit()
+        )
+
+    @contextmanager
+    def _locked(self, name: str = LOCK_FILE, blocking: bool = True) -> Iterator[bool]:
+        """
+        Cross-process lock on a file in the log directory (thread lock as well).
+        Yields False if blocking=False and the lock is taken.
+        """
+        thread_lock = self._thread_locks[name]
+        if not thread_lock.acquire(blocking=blocking):
+            yield False
+            return
+        try:
+            if fcntl is None:
+                yield True
+                return
+            with open(self.path / name, "a") as f:
+                flags = fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB)
+                try:
+                    fcntl.flock(f, flags)
+                except BlockingIOError:
+                    yield False
+                    return
+                try:
+                    yield True
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+        finally:
+            thread_lock.release()
+
+    @contextmanager
+    def compaction_lock(self) -> Iterator[None]:
+        """
+        Waits for a running compaction and keeps others out: the purchase
+        store and the segments it has not merged stay consistent meanwhile.
+        """
+        with self._locked(COMPACT_LOCK_FILE):
+            yield
+
+    # --- write side ---
+
+    def append(self, events: List[Dict[str, Any]]) -> None:
+        """
+        Appends {"user_id", "product_id", "ts"} events to the active segment.
+        """
+        if not events:
+            return
+        data = "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in events).encode("utf-8")
+        with self._locked():
+            segments = self.segments()
+            active = segments[-1] if segments else 1
+            with open(self._segment_path(active), "ab") as f:
+                f.write(data)
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+
+    # --- read side ---
+
+    def read_since(self, position: Position) -> Tuple[List[Dict[str, Any]], Position]:
+        """
+        Events after position, and the position after them.
+        """
+        segment, offset = position
+        events: List[Dict[str, Any]] = []
+        for n in self.segments():
+            if n < segment:
+                continue
+            start = offset if n == segment else 0
+            try:
+                records, end = read_jsonl(self._segment_path(n), start)
+            except FileNotFoundError:
+                continue  # compacted meanwhile
+            events.extend(records)
+            segment, offset = n, end
+        return events, (segment, offset)
+
+    # --- compaction ---
+
+    def compact(self, store_path: str | Path, json_path: str | Path) -> Dict[str, int] | None:
+        """
+        Merges closed segments into the purchase store, deletes them and
+        rotates the active segment. None if another process is compacting.
+        """
+        with self._locked(COMPACT_LOCK_FILE, blocking=False) as acquired:
+            if not acquired:
+                return None
+
+            # oldest closed segments that have been idle for grace_s
+            closed: List[int] = []
+            now = time.time()
+            for n in self.segments()[:-1]:
+                if now - self._segment_path(n).stat().st_mtime < self.grace_s:
+                    break
+                closed.append(n)
+
+            stats = {"segments": len(closed), "events": 0}
+            if closed:
+                histories = load_histories(store_path, json_path)
+                merge = [n for n in closed if n > histories.wal_segment]
+                if merge:
+                    events: List[Dict[str, Any]] = []
+                    for n in merge:
+                        events.extend(read_jsonl(self._segment_path(n))[0])
+                    histories = histories.with_events(
+                        [str(e["user_id"]) for e in events],
+                        [str(e["product_id"]) for e in events],
+                        [float(e["ts"]) for e in events],
+                    )
+                    histories.wal_segment = merge[-1]
+                    histories.save(store_path)
+                    stats["events"] = len(events)
+                for n in closed:
+                    self._segment_path(n).unlink(missing_ok=True)
+
+            # later appends go to a new segment, merged on the next run
+            with self._locked():
+                segments = self.segments()
+                if segments and self._segment_path(segments[-1]).stat().st_size > 0:
+                    self._segment_path(segments[-1] + 1).touch()
+            return stats
+
+
+class EventFollower:
+    """
+    Background thread of a worker: every poll_s applies events appended to
+    the log (by any process) to the current recommender snapshot,
+    and every compact_interval_s (0 = never) tries to compact the log.
+    """
+
+    def __init__(
+        self,
+        log: PurchaseEventLog,
+        get_recommender: Callable[[], Any],
+        poll_s: float,
+        compact_interval_s: float,
+        store_path: str | Path,
+        json_path: str | Path,
+    ):
+        self.log = log
+        self._get_recommender = get_recommender
+        self.poll_s = poll_s
+        self.compact_interval_s = compact_interval_s
+        self.store_path = store_path
+        self.json_path = json_path
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+        # the request thread polls too (POST /api/events/purchase): every
+        # event must reach the snapshot exactly once
+        self._poll_lock = threading.Lock()
+        self.last_compaction: Dict[str, int] | None = None
+
+    def _poll(self) -> Tuple[List[Dict[str, Any]], List[bool]]:
+        recommender = self._get_recommender()
+        events, position = self.log.read_since(recommender.event_position)
+        changed = recommender.apply_purchase_events(events)
+        recommender.event_position = position
+        return events, changed
+
+    def poll(self) -> int:
+        """
+        Applies events appended since the snapshot's log position;
+        returns how many changed a profile.
+        """
+        with self._poll_lock:
+            return sum(self._poll()[1])
+
+    def append(self, event: Dict[str, Any]) -> bool:
+        """
+        Appends an event and applies the log up to it; returns whether this
+        event changed its user's profile.
+        """
+        with self._poll_lock:
+            self.log.append([event])
+            events, changed = self._poll()
+        # ours is the last matching one (other processes may append after it)
+        for e, c in zip(reversed(events), reversed(changed)):
+            if e == event:
+                return c
+        return False
+
+    def _run(self) -> None:
+        next_compaction = time.monotonic() + self.compact_interval_s
+        while not self._stop.wait(self.poll_s):
+            try:
+                self.poll()
+                if self.compact_interval_s > 0 and time.monotonic() >= next_compaction:
+                    next_compaction = time.monotonic() + self.compact_interval_s
+                    stats = self.log.compact(self.store_path, self.json_path)
+                    if stats is not None:
+                        self.last_compaction = stats
+                        if stats["events"]:
+                            print(f"Purchase events compacted: {stats}")
+            except Exception as e:
+                print(f"⚠️ WARNING: purchase event follower: {type(e).__name__}: {e}")
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="event-follower", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
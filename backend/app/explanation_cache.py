@@ -0,0 +1,184 @@
+# backend/app/explanation_cache.py
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List
+
+
+def explanation_key(
+    bought_descriptions: List[str],
+    rec_description: str,
+    model: str,
+    language: str,
+) -> str:
+    """
+    Content-addressed key: hash of everything that goes into the prompt.
+    """
+    payload = json.dumps(
+        [bought_descriptions, rec_description, model, language],
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ExplanationCache:
+    """
+    Two-tier cache for LLM explanations:
+    - in-process LRU (OrderedDict) for hot keys,
+    - SQLite file shared by all workers, with TTL and size-bounded eviction
+      (least recently accessed rows go first).
+
+    get_memory() never touches SQLite, so async callers can try it on the event
+    loop and run get_disk() / set() in a thread. Disk hits do not write: their
+    access times are queued and flushed with the next set().
+
+    Hit/miss counters are per process and exposed via stats().
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        max_memory_items: int = 2048,
+        max_disk_items: int = 100_000,
+        ttl_s: float = 7 * 24 * 3600,
+    ):
+        self.path = Path(path)
+        self.max_memory_items = max_memory_items
+        self.max_disk_items = max_disk_items
+        self.ttl_s = ttl_s
+
+        # key -> (value, created_at)
+        self._memory: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        # serializes the shared sqlite3 connection; never held with _lock
+        self._db_lock = threading.Lock()
+        self._writes_since_evict = 0
+        # key -> accessed_at of disk hits not yet written back
+        self._touched: Dict[str, float] = {}
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, timeout=5.0)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS explanations (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS explanations_accessed ON explanations (accessed_at)"
+        )
+        self._db.commit()
+
+    def _remember(self, key: str, value: str, created_at: float) -> None:
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def get_memory(self, key: str) -> str | None:
+        """
+        In-process LRU only; a miss here is not counted (get_disk() follows).
+        """
+        now = time.time()
+        with self._lock:
+            item = self._memory.get(key)
+            if item is None:
+                return None
+            value, created_at = item
+            if now - created_at > self.ttl_s:
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            self.memory_hits += 1
+            return value
+
+    def get_disk(self, key: str) -> str | None:
+        """
+        SQLite lookup (may wait on another worker's write lock).
+        """
+        now = time.time()
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT value, created_at FROM explanations WHERE key = ?", (key,)
+            ).fetchone()
+        with self._lock:
+            if row is not None and now - row[1] <= self.ttl_s:
+                self._touched[key] = now
+                self._remember(key, row[0], row[1])
+                self.disk_hits += 1
+                return row[0]
+            self.misses += 1
+            return None
+
+    def get(self, key: str) -> str | None:
+        value = self.get_memory(key)
+        if value is None:
+            value = self.get_disk(key)
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+            touched, self._touched = self._touched, {}
+        with self._db_lock:
+            if touched:
+                self._db.executemany(
+                    "UPDATE explanations SET accessed_at = ? WHERE key = ?",
+                    [(t, k) for k, t in touched.items()],
+                )
+            self._db.execute(
+                "INSERT OR REPLACE INTO explanations (key, value, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            self._writes_since_evict += 1
+            # eviction scans the table, so run it once per batch of writes
+            if self._writes_since_evict >= 256:
+                self._evict(now)
+            self._db.commit()
+
+    def _evict(self, now: float) -> None:
+        self._writes_since_evict = 0
+        self._db.execute(
+            "DELETE FROM explanations WHERE created_at < ?", (now - self.ttl_s,)
+        )
+        (count,) = self._db.execute("SELECT COUNT(*) FROM explanations").fetchone()
+        overflow = count - self.max_disk_items
+        if overflow > 0:
+            self._db.execute(
+                "DELETE FROM explanations WHERE key IN ("
+                "SELECT key FROM explanations ORDER BY accessed_at LIMIT ?)",
+                (overflow,),
+            )
+
+    def stats(self) -> Dict[str, float]:
+        with self._db_lock:
+            (disk_items,) = self._db.execute("SELECT COUNT(*) FROM explanations").fetchone()
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            total = hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": hits / total if total else 0.0,
+                "memory_items": len(self._memory),
+                "disk_items": disk_items,
+            }
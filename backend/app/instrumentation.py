@@ -0,0 +1,291 @@
+# backend/app/instrumentation.py
+#
+# In-process metrics for the hot path, exposed on /metrics in the
+# Prometheus text format:
+# - histograms with fixed buckets (recommender stages, LLM calls, HTTP requests),
+# - gauges (in-flight requests / LLM calls, values read on scrape) and counters,
+# - an ASGI middleware timing every request,
+# - an optional sampling profiler (collapsed stacks, flamegraph.pl format).
+#
+# Everything is per worker process; observe() is a lock + a few additions.
+
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+# seconds; covers sub-millisecond numpy stages up to slow LLM calls
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _format_labels(labels: LabelKey, extra: str = "") -> str:
+    parts = [f'{k}="{v}"' for k, v in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts..., +Inf count], sum
+        self._counts: Dict[LabelKey, List[int]] = {}
+        self._sums: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+                self._sums[key] = 0.0
+            counts[i] += 1
+            self._sums[key] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(k, list(c), self._sums[k]) for k, c in self._counts.items()]
+        for key, counts, total in sorted(items):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_format_labels(key, le)} {cumulative}")
+            cumulative += counts[-1]
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_format_labels(key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {total:.6f}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """
+    Settable gauge, or a callback read on every scrape (fn returns the value).
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, fn: Callable[[], float] | None = None):
+        self.name = name
+        self.help = help
+        self._fn = fn
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track(self, **labels: str) -> Iterator[None]:
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        if self._fn is not None:
+            try:
+                lines.append(f"{self.name} {float(self._fn())}")
+            except Exception:
+                return []
+            return lines
+        with self._lock:
+            items = sorted(self._values.items())
+        lines.extend(f"{self.name}{_format_labels(k)} {v:g}" for k, v in items)
+        return lines
+
+
+class Count(Gauge):
+    """
+    Monotonic counter (only inc() is meant to be used), or a callback
+    returning a monotonic total.
+    """
+
+    kind = "counter"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, Histogram | Gauge] = {}  # Count is a Gauge
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, name: str, factory: Callable[[], Histogram | Gauge]):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = factory()
+            return metric
+
+    def histogram(
+        self, name: str, help: str, buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._get_or_create(name, lambda: Histogram(name, help, buckets))
+
+    def gauge(self, name: str, help: str, fn: Callable[[], float] | None = None) -> Gauge:
+        return self._get_or_create(name, lambda: Gauge(name, help, fn))
+
+    def counter(self, name: str, help: str, fn: Callable[[], float] | None = None) -> Count:
+        return self._get_or_create(name, lambda: Count(name, help, fn))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+RECOMMENDER_STAGE_SECONDS = registry.histogram(
+    "recommender_stage_seconds",
+    "Time per recommender stage (user_vector, score, topk, format, total, ...)",
+)
+LLM_CALL_SECONDS = registry.histogram(
+    "llm_call_seconds",
+    "Latency of one LLM explanation call (cache hits excluded)",
+)
+LLM_IN_FLIGHT = registry.gauge("llm_calls_in_flight", "LLM calls currently running")
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "http_request_seconds", "HTTP request latency by route template and status"
+)
+HTTP_IN_FLIGHT = registry.gauge("http_requests_in_flight", "HTTP requests being served")
+TOPK_TABLE_LOOKUPS = registry.counter(
+    "topk_table_lookups_total",
+    "Precomputed top-K table lookups by table (user, product) and result "
+    "(hit, stale, miss, filtered: too few entries left after masks)",
+)
+# report 0 before the first request / call
+LLM_IN_FLIGHT.inc(0)
+HTTP_IN_FLIGHT.inc(0)
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware (does not buffer streaming responses): times each
+    HTTP request until its last body chunk and labels it with the route
+    template, so /api/users/{user_id}/... stays one series.
+    """
+
+    def __init__(self, app, skip_paths: Sequence[str] = ("/metrics",)):
+        self.app = app
+        self.skip_paths = set(skip_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.skip_paths:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def _send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        t0 = time.perf_counter()
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            # the router stores the matched route in the (shared) scope
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - t0,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=str(status),
+            )
+
+
+class SamplingProfiler:
+    """
+    Low-overhead statistical profiler: a daemon thread snapshots the stacks of
+    all other threads every interval_s and counts identical stacks.
+    report() returns collapsed stacks ("frame;frame;frame count"),
+    ready for flamegraph.pl / speedscope.
+    """
+
+    def __init__(self):
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+        self._stacks: Counter = Counter()
+        self.samples = 0
+        self.started_at = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval_s: float) -> bool:
+        if self.running:
+            return False
+        self._stacks = Counter()
+        self.samples = 0
+        self.started_at = time.time()
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, args=(interval_s,), name="sampling-profiler", daemon=True
+        )
+        self._thread.start()
+        return True
+
+    def _run(self, interval_s: float) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(interval_s):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({code.co_filename}:{frame.f_lineno})")
+                    frame = frame.f_back
+                self._stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def report(self, limit: int | None = None) -> str:
+        return "".join(
+            f"{stack} {count}\n" for stack, count in self._stacks.most_common(limit)
+        )
+
+
+profiler = SamplingProfiler()
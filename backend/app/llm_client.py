@@ -1,7 +1,11 @@
-from typing import List
-from openai import OpenAI
+import asyncio
+import time
+from typing import Any, AsyncIterator, Dict, List
+from openai import AsyncOpenAI, OpenAI
 
 from .config import get_settings
+from .explanation_cache import ExplanationCache, explanation_key
+from .instrumentation import LLM_CALL_SECONDS, LLM_IN_FLIGHT
 
 settings = get_settings()
 
@@ -13,17 +17,41 @@ client = OpenAI(
     base_url=settings.foundation_models_base_url,
 )
 
+async_client = AsyncOpenAI(
+    api_key=settings.foundation_models_api_key,
+    base_url=settings.foundation_models_base_url,
+    max_retries=0,  # per-call timeout below is the latency budget, no retries
+)
 
-def generate_explanation(
-    bought_items: List[str],
-    recommended_item: str,
+# explanations cache (in-process LRU + SQLite), None when disabled
+cache: ExplanationCache | None = (
+    ExplanationCache(
+        settings.explanation_cache_path,
+        max_memory_items=settings.explanation_cache_memory_items,
+        max_disk_items=settings.explanation_cache_disk_items,
+        ttl_s=settings.explanation_cache_ttl_s,
+    )
+    if settings.explanation_cache_enabled
+    else None
+)
+
+# bounds in-flight LLM calls per worker; created lazily inside the event loop
+_semaphore: asyncio.Semaphore | None = None
+
+
+def _cache_key(bought_descriptions: List[str], rec_description: str, language: str) -> str:
+    return explanation_key(
+        bought_descriptions,
+        rec_description,
+        settings.foundation_models_chat_model,
+        language,
+    )
+
+
+def _build_request(
     bought_descriptions: List[str],
     rec_description: str,
-    language: str = "en",
-) -> str:
-    """
-    Generates a short explanation of why the recommended_item is suggested.
-    """
+) -> Dict[str, Any]:
     user_message = f"""
 You are a recommendation system for an online store.
 
@@ -37,7 +65,7 @@ Explain in one short sentence in English why it makes sense to recommend this pr
 Do not mention any technical details such as "algorithm", "model", or similar.
 """
 
-    response = client.chat.completions.create(
+    return dict(
         model=settings.foundation_models_chat_model,  # 👈 ТУТ КОНКРЕТНО gpt-oss
         max_tokens=300,
         temperature=0.3,
@@ -51,4 +79,145 @@ Do not mention any technical details such as "algorithm", "model", or similar.
         ],
     )
 
-    return response.choices[0].message.content.strip()
+
+def generate_explanation(
+    bought_items: List[str],
+    recommended_item: str,
+    bought_descriptions: List[str],
+    rec_description: str,
+    language: str = "en",
+) -> str:
+    """
+    Generates a short explanation of why the recommended_item is suggested.
+    """
+    key = _cache_key(bought_descriptions, rec_description, language)
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    t0 = time.perf_counter()
+    outcome = "error"
+    try:
+        with LLM_IN_FLIGHT.track():
+            response = client.chat.completions.create(
+                **_build_request(bought_descriptions, rec_description)
+            )
+        outcome = "ok"
+    finally:
+        LLM_CALL_SECONDS.observe(time.perf_counter() - t0, mode="sync", outcome=outcome)
+    explanation = response.choices[0].message.content.strip()
+
+    if cache is not None and explanation:
+        cache.set(key, explanation)
+    return explanation
+
+
+async def generate_explanation_async(
+    bought_items: List[str],
+    recommended_item: str,
+    bought_descriptions: List[str],
+    rec_description: str,
+    language: str = "en",
+) -> str:
+    """
+    Async version of generate_explanation.
+
+    Cached explanations are returned without touching the LLM. Otherwise
+    waits for a slot in the shared concurrency semaphore and gives up after
+    settings.llm_timeout_s — on timeout or any API error returns "" so
+    one slow call never blocks the whole response.
+    """
+    key = _cache_key(bought_descriptions, rec_description, language)
+    if cache is not None:
+        # SQLite may wait on another worker's lock: keep it off the event loop
+        cached = cache.get_memory(key)
+        if cached is None:
+            cached = await asyncio.to_thread(cache.get_disk, key)
+        if cached is not None:
+            return cached
+
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(max(1, settings.llm_max_concurrency))
+
+    async def _call() -> str:
+        async with _semaphore:
+            with LLM_IN_FLIGHT.track():
+                response = await async_client.chat.completions.create(
+                    **_build_request(bought_descriptions, rec_description)
+                )
+        return (response.choices[0].message.content or "").strip()
+
+    # per-call latency includes waiting for a semaphore slot
+    t0 = time.perf_counter()
+    outcome = "ok"
+    try:
+        explanation = await asyncio.wait_for(_call(), timeout=settings.llm_timeout_s)
+        if cache is not None and explanation:
+            await asyncio.to_thread(cache.set, key, explanation)
+        return explanation
+    except asyncio.TimeoutError:
+        outcome = "timeout"
+        print(f"LLM explanation timeout for {recommended_item}")
+    except Exception as e:
+        outcome = "error"
+        print(f"LLM explanation error for {recommended_item}: {e}")
+    finally:
+        LLM_CALL_SECONDS.observe(time.perf_counter() - t0, mode="async", outcome=outcome)
+    return ""
+
+
+async def generate_explanations(
+    bought_items: List[str],
+    bought_descriptions: List[str],
+    recs: List[Dict[str, Any]],
+    language: str = "en",
+) -> List[str]:
+    """
+    Explanations for all recommendations, fanned out concurrently.
+    Result order matches recs; failed or timed out items get "".
+    """
+    return await asyncio.gather(
+        *(
+            generate_explanation_async(
+                bought_items=bought_items,
+                recommended_item=rec.get("product_id"),
+                bought_descriptions=bought_descriptions,
+                rec_description=rec.get("description", ""),
+                language=language,
+            )
+            for rec in recs
+        )
+    )
+
+
+async def iter_explanations(
+    bought_items: List[str],
+    bought_descriptions: List[str],
+    recs: List[Dict[str, Any]],
+    language: str = "en",
+) -> AsyncIterator[tuple[int, str]]:
+    """
+    Same fan-out as generate_explanations, but yields (index in recs, explanation)
+    as soon as each call completes — cached ones first.
+    """
+
+    async def _one(i: int, rec: Dict[str, Any]) -> tuple[int, str]:
+        explanation = await generate_explanation_async(
+            bought_items=bought_items,
+            recommended_item=rec.get("product_id"),
+            bought_descriptions=bought_descriptions,
+            rec_description=rec.get("description", ""),
+            language=language,
+        )
+        return i, explanation
+
+    tasks = [asyncio.create_task(_one(i, rec)) for i, rec in enumerate(recs)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # client went away — don't keep paying for calls nobody will read
+        for task in tasks:
+            task.cancel()
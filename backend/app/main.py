@@ -1,23 +1,75 @@
 # backend/app/main.py
+import json
+from contextlib import asynccontextmanager
 from pathlib import Path
+from typing import List
 
-from fastapi import FastAPI, HTTPException, Response
+from fastapi import FastAPI, HTTPException, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
+from starlette.concurrency import run_in_threadpool
 
 from .config import get_settings
-from .recommender import Recommender
-from .schemas import UserListResponse  # UserRecommendationsResponse можно не использовать
-from .llm_client import generate_explanation
+from .events import EventFollower, PurchaseEventLog, make_event
+from .instrumentation import MetricsMiddleware, profiler, registry
+from .reloader import RecommenderHolder
+from .schemas import (  # UserRecommendationsResponse можно не использовать
+    BatchRecommendationsRequest,
+    BatchRecommendationsResponse,
+    CartAddonsRequest,
+    CartAddonsResponse,
+    PurchaseEvent,
+    PurchaseEventResponse,
+    UserExclusionsRequest,
+    UserExclusionsResponse,
+    UserListResponse,
+)
+from . import llm_client
+from .llm_client import generate_explanations, iter_explanations
 
 settings = get_settings()
 
+# Recommender snapshot holder: request handlers take `holder.current` once
+# and keep using it, reloads swap in a new snapshot atomically
+holder = RecommenderHolder()
+
+# live purchase events: write-ahead log + follower applying logged events
+event_log: PurchaseEventLog | None = None
+event_follower: EventFollower | None = None
+if settings.purchase_events_enabled:
+    event_log = PurchaseEventLog(settings.purchase_events_path, fsync=settings.purchase_events_fsync)
+    event_follower = EventFollower(
+        event_log,
+        lambda: holder.current,
+        poll_s=settings.purchase_events_poll_s,
+        compact_interval_s=settings.purchase_events_compact_interval_s,
+        store_path=settings.user_purchases_store_path,
+        json_path=settings.user_purchases_path,
+    )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.reload_watch:
+        holder.start_watcher(settings.reload_watch_interval_s)
+    if event_follower is not None:
+        event_follower.start()
+    yield
+    if event_follower is not None:
+        event_follower.stop()
+    holder.stop_watcher()
+
+
 app = FastAPI(
     title="OnlineRetail LLM Recommender",
     version="1.1.0",
+    lifespan=lifespan,
 )
 
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
+
 # CORS
 app.add_middleware(
     CORSMiddleware,
@@ -27,9 +79,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Recommender instance
-recommender = Recommender()
-
 # ---------- STATIC + FRONTEND ----------
 
 BASE_DIR = Path(__file__).resolve().parents[2]  # rec_sys_project_retail
@@ -58,53 +107,116 @@ def health():
     return {"status": "ok"}
 
 
+def _cache_hit_ratio() -> float:
+    cache = llm_client.cache
+    hits = cache.memory_hits + cache.disk_hits
+    total = hits + cache.misses
+    return hits / total if total else 0.0
+
+
+if llm_client.cache is not None:
+    registry.gauge(
+        "explanation_cache_hit_ratio",
+        "LLM explanations cache hits / lookups (this worker)",
+        _cache_hit_ratio,
+    )
+    registry.counter(
+        "explanation_cache_memory_hits_total",
+        "LLM explanations served from the in-process LRU",
+        lambda: llm_client.cache.memory_hits,
+    )
+    registry.counter(
+        "explanation_cache_disk_hits_total",
+        "LLM explanations served from SQLite",
+        lambda: llm_client.cache.disk_hits,
+    )
+    registry.counter(
+        "explanation_cache_misses_total",
+        "LLM explanations cache misses",
+        lambda: llm_client.cache.misses,
+    )
+registry.gauge("recommender_version", "Loaded recommender snapshot version", lambda: holder.version)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """
+    Prometheus text exposition: per-stage histograms, in-flight counts,
+    cache hit ratio (this worker).
+    """
+    if not settings.metrics_enabled:
+        raise HTTPException(status_code=404, detail="Metrics disabled")
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/api/cache/stats")
+def cache_stats():
+    """
+    Hit/miss counters of the LLM explanations cache (this worker only).
+    """
+    if llm_client.cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **llm_client.cache.stats()}
+
+
 @app.get("/api/users", response_model=UserListResponse)
 def list_users(limit: int = 50, offset: int = 0):
     """
     Returns user_ids only for users who still have purchases.
     Used to populate the customer dropdown.
     """
-    all_user_ids = recommender.get_all_users_with_purchases()
+    all_user_ids = holder.current.get_all_users_with_purchases()
     sliced = all_user_ids[offset : offset + limit]
     has_more = offset + limit < len(all_user_ids)
     return UserListResponse(users=sliced, has_more=has_more)
 
 
 @app.get("/api/users/{user_id}/recommendations")
-def user_recommendations(user_id: str, top_n: int = 12):
+async def user_recommendations(
+    user_id: str,
+    top_n: int = Query(default=12, le=1000),
+    explain: bool = True,
+    exclude_ids: List[str] = Query(default=[]),
+    exclude_terms: List[str] = Query(default=[]),
+    diversity: float | None = Query(default=None, ge=0.0, le=1.0),
+):
     """
     Main endpoint:
     - gets user purchase history,
     - computes recommendations using embeddings,
-    - calls LLM to generate explanations per item,
+    - calls LLM concurrently to generate explanations per item,
     - returns everything as JSON.
+
+    With explain=false returns right after step 2 with empty explanations;
+    the UI then streams them from /api/users/{user_id}/explanations/stream.
+    exclude_ids / exclude_terms (repeatable) filter out products by id or
+    by a word in the description, e.g. ?exclude_terms=christmas;
+    diversity (MMR lambda, 1 = off) spreads the list over different items.
     """
+    recommender = holder.current
+
     # 1. Descriptions of bought products (for 'Previous purchases' and LLM)
     bought_descriptions = recommender.get_bought_descriptions(user_id)
 
-    # 2. Embedding-based recommendations
-    base_recs = recommender.recommend_for_user(user_id, top_n=top_n)
+    # 2. Embedding-based recommendations (CPU-bound, keep the event loop free)
+    base_recs = await run_in_threadpool(
+        recommender.recommend_for_user, user_id, top_n, exclude_ids, exclude_terms, diversity
+    )
 
     # 3. Product_ids the user purchased (for prompt context)
     bought_items = recommender.get_user_items(user_id)
 
-    # 4. Ask LLM for an explanation for each recommendation
-    for rec in base_recs:
-        pid = rec.get("product_id")
-        desc = rec.get("description", "")
-
-        try:
-            explanation = generate_explanation(
-                bought_items=bought_items,
-                recommended_item=pid,
-                bought_descriptions=bought_descriptions,
-                rec_description=desc,
-                language="en",
-            )
-        except Exception as e:
-            print(f"LLM explanation error for {pid}: {e}")
-            explanation = ""
-
+    # 4. Ask LLM for an explanation for each recommendation, all at once
+    if explain:
+        explanations = await generate_explanations(
+            bought_items=bought_items,
+            bought_descriptions=bought_descriptions,
+            recs=base_recs,
+            language="en",
+        )
+    else:
+        explanations = [""] * len(base_recs)
+    for rec, explanation in zip(base_recs, explanations):
         rec["explanation"] = explanation
 
     return {
@@ -114,6 +226,83 @@ def user_recommendations(user_id: str, top_n: int = 12):
     }
 
 
+@app.get("/api/users/{user_id}/explanations/stream")
+async def stream_explanations(
+    user_id: str,
+    top_n: int = Query(default=12, le=1000),
+    exclude_ids: List[str] = Query(default=[]),
+    exclude_terms: List[str] = Query(default=[]),
+    diversity: float | None = Query(default=None, ge=0.0, le=1.0),
+):
+    """
+    Server-Sent Events stream of LLM explanations for the user's recommendations
+    (same top_n / filters / diversity as the recommendations request).
+
+    Sends one 'explanation' event ({"product_id", "explanation"}) per item
+    as soon as its LLM call completes, then a final 'done' event.
+    """
+    recommender = holder.current
+    bought_descriptions = recommender.get_bought_descriptions(user_id)
+    base_recs = await run_in_threadpool(
+        recommender.recommend_for_user, user_id, top_n, exclude_ids, exclude_terms, diversity
+    )
+    bought_items = recommender.get_user_items(user_id)
+
+    async def events():
+        async for i, explanation in iter_explanations(
+            bought_items=bought_items,
+            bought_descriptions=bought_descriptions,
+            recs=base_recs,
+            language="en",
+        ):
+            payload = {
+                "product_id": base_recs[i]["product_id"],
+                "explanation": explanation,
+            }
+            yield f"event: explanation\ndata: {json.dumps(payload)}\n\n"
+        yield "event: done\ndata: {}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/api/recommendations:batch", response_model=BatchRecommendationsResponse)
+def batch_recommendations(request: BatchRecommendationsRequest):
+    """
+    Embedding-based recommendations for many users in one call
+    (nightly email campaigns, cache warm-ups). No LLM explanations.
+    """
+    recs = holder.current.recommend_for_users(
+        request.user_ids,
+        top_n=request.top_n,
+        exclude_ids=request.exclude_ids,
+        exclude_terms=request.exclude_terms,
+        diversity=request.diversity,
+    )
+    return BatchRecommendationsResponse(recommendations=recs)
+
+
+@app.post("/api/cart/addons", response_model=CartAddonsResponse)
+def cart_addons(request: CartAddonsRequest):
+    """
+    Cart-aware suggestions for the current cart (called on every cart change).
+    mode=mean scores against the cart's mean embedding,
+    mode=max against the closest cart item.
+    """
+    addons = holder.current.cart_addons(
+        request.product_ids,
+        top_n=request.top_n,
+        mode=request.mode,
+        exclude_ids=request.exclude_ids,
+        exclude_terms=request.exclude_terms,
+        diversity=request.diversity,
+    )
+    return CartAddonsResponse(addons=addons)
+
+
 @app.delete("/api/users/{user_id}/history", status_code=204)
 def clear_user_history(user_id: str):
     """
@@ -123,24 +312,138 @@ def clear_user_history(user_id: str):
     - acts like 'Reset my profile / delete history' button,
     - after this, user has no purchase history and no personalized recs.
     """
-    recommender.clear_user_history(user_id)
+    holder.current.clear_user_history(user_id)
     # 204 No Content
     return Response(status_code=204)
 
 
+@app.get("/api/users/{user_id}/exclusions", response_model=UserExclusionsResponse)
+def get_user_exclusions(user_id: str):
+    return UserExclusionsResponse(
+        user_id=user_id, product_ids=holder.current.get_user_exclusions(user_id)
+    )
+
+
+@app.post("/api/users/{user_id}/exclusions", response_model=UserExclusionsResponse)
+def add_user_exclusions(user_id: str, request: UserExclusionsRequest):
+    """
+    'Not interested': these products are never recommended to the user
+    again (kept in memory, like the history reset below).
+    """
+    product_ids = holder.current.exclude_for_user(user_id, request.product_ids)
+    return UserExclusionsResponse(user_id=user_id, product_ids=product_ids)
+
+
+@app.delete("/api/users/{user_id}/exclusions", status_code=204)
+def clear_user_exclusions(user_id: str):
+    holder.current.clear_user_exclusions(user_id)
+    return Response(status_code=204)
+
+
+@app.post("/api/events/purchase", status_code=202, response_model=PurchaseEventResponse)
+def purchase_event(event: PurchaseEvent):
+    """
+    Records a purchase: appended to the event log (compacted into the
+    purchase store in the background) and applied to the user's profile
+    right away by reading the log up to it (with any other pending events,
+    so each is applied once); other workers pick it up within
+    PURCHASE_EVENTS_POLL_S.
+    """
+    if event_log is None:
+        raise HTTPException(status_code=404, detail="Purchase events disabled")
+    record = make_event(event.model_dump())
+    if record is None:
+        raise HTTPException(
+            status_code=422, detail="user_id, product_id and a finite ts are required"
+        )
+    updated = event_follower.append(record)
+    return PurchaseEventResponse(accepted=True, profile_updated=updated)
+
+
+@app.post("/api/admin/embeddings/refresh")
+def refresh_embeddings():
+    """
+    Picks up products appended to the embedding store by an incremental
+    build (scripts/build_product_embeddings.py --incremental) without a restart.
+    """
+    return holder.current.refresh_embeddings()
+
+
+@app.post("/api/admin/reload", status_code=202)
+def reload_recommender():
+    """
+    Rebuilds the recommender from data files in the background and swaps
+    it in when ready; requests keep being served by the old snapshot.
+    """
+    started = holder.reload_in_background()
+    return {"started": started, **holder.status()}
+
+
+@app.get("/api/admin/status")
+def admin_status():
+    """
+    Snapshot version, last reload duration and watcher state.
+    """
+    return holder.status()
+
+
+@app.post("/api/admin/profiler/start")
+def profiler_start(interval_ms: float | None = None):
+    """
+    Starts the sampling profiler (PROFILER_ENABLED=true only).
+    """
+    if not settings.profiler_enabled:
+        raise HTTPException(status_code=404, detail="Profiler disabled")
+    interval_ms = interval_ms or settings.profiler_interval_ms
+    if not profiler.start(interval_ms / 1000.0):
+        raise HTTPException(status_code=409, detail="Profiler already running")
+    return {"started": True, "interval_ms": interval_ms}
+
+
+@app.post("/api/admin/profiler/stop", response_class=PlainTextResponse)
+def profiler_stop(limit: int | None = None):
+    """
+    Stops the profiler and returns collapsed stacks (flamegraph.pl / speedscope input).
+    """
+    if not settings.profiler_enabled:
+        raise HTTPException(status_code=404, detail="Profiler disabled")
+    profiler.stop()
+    return PlainTextResponse(profiler.report(limit))
+
+
 @app.get("/api/products/random")
-def random_product_page(top_n: int = 8):
+def random_product_page(
+    top_n: int = Query(default=8, le=1000),
+    backend: str | None = None,
+    exclude_ids: List[str] = Query(default=[]),
+    exclude_terms: List[str] = Query(default=[]),
+    diversity: float | None = Query(default=None, ge=0.0, le=1.0),
+):
     """
     Picks a random product from the catalog and finds
-    'frequently bought together' (similar products in embedding space).
+    'frequently bought together' items: similar products in embedding
+    space or co-purchase neighbours (backend=embedding|copurchase),
+    optionally filtered by product id / description term and diversified
+    (diversity = MMR lambda, embedding backend).
 
     Used on the Product Page view.
     """
+    recommender = holder.current
     product = recommender.get_random_product()
     if not product:
         raise HTTPException(status_code=500, detail="No products available")
 
-    fbt_items = recommender.similar_products(product["product_id"], top_n=top_n)
+    try:
+        fbt_items = recommender.similar_products(
+            product["product_id"],
+            top_n=top_n,
+            backend=backend,
+            exclude_ids=exclude_ids,
+            exclude_terms=exclude_terms,
+            diversity=diversity,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
     return {
         "product": product,
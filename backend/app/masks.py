@@ -0,0 +1,173 @@
+# backend/app/masks.py
+#
+# Candidate masks: one bool per embedding row (True = never recommend),
+# applied to the score block before top-k selection (ann_index.py), so
+# filtering costs one vectorized pass instead of per-item Python checks.
+# Masks compose with a plain OR:
+# - global blocklist: non-product stock codes of OnlineRetail (postage,
+#   fees, manual adjustments, vouchers, ...), plus Settings.product_blocklist
+#   and one product id per line in Settings.product_blocklist_path
+#   (e.g. out-of-stock items),
+# - per-user exclusions (Recommender.exclude_for_user), added to the user's
+#   bought-items exclude list,
+# - query-time filters: product ids and description terms of one request;
+#   term masks are cached.
+
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, List, Sequence
+
+import numpy as np
+
+# StockCodes that are not products (OnlineRetail)
+NON_PRODUCT_STOCK_CODES = (
+    "POST",  # postage
+    "DOT",  # dotcom postage
+    "C2",  # carriage
+    "M",  # manual
+    "m",
+    "D",  # discount
+    "S",  # samples
+    "B",  # adjust bad debt
+    "CRUK",  # CRUK commission
+    "PADS",  # pads to match all cushions
+    "AMAZONFEE",
+    "BANK CHARGES",
+    "ADJUST",
+    "ADJUST2",
+    "TEST001",
+    "TEST002",
+)
+# gift vouchers: gift_0001_10, gift_0001_20, ...
+NON_PRODUCT_PREFIXES = ("gift_",)
+
+
+def read_blocklist(path: str | Path) -> List[str]:
+    """
+    Product ids from a text file, one per line ('#' starts a comment).
+    """
+    path = Path(path)
+    if not path.exists():
+        return []
+    ids = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        line = line.split("#", 1)[0].strip()
+        if line:
+            ids.append(line)
+    return ids
+
+
+class ProductMasks:
+    """
+    Global blocklist mask and cached description-term masks over the rows
+    of the embedding matrix. product_ids / descriptions are the
+    recommender's lists; extend() picks up rows appended by a refresh.
+    """
+
+    def __init__(
+        self,
+        product_ids: List[str],
+        descriptions: List[str],
+        blocklist: Iterable[str] = (),
+        max_cached_terms: int = 256,
+    ):
+        self._product_ids = product_ids
+        self._descriptions = descriptions
+        self.blocklist = set(NON_PRODUCT_STOCK_CODES) | {str(p) for p in blocklist}
+        self.max_cached_terms = max_cached_terms
+
+        self.blocked = np.zeros(0, dtype=bool)
+        self._lowered = np.zeros(0, dtype=str)
+        self._terms: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.extend()
+
+    def __len__(self) -> int:
+        return len(self.blocked)
+
+    def is_blocked(self, product_id: str) -> bool:
+        return product_id in self.blocklist or product_id.startswith(NON_PRODUCT_PREFIXES)
+
+    def extend(self) -> None:
+        """
+        Computes masks for rows added to the catalog since the last call.
+        """
+        n_old, n_rows = len(self.blocked), len(self._product_ids)
+        if n_rows == n_old:
+            return
+        new_ids = self._product_ids[n_old:n_rows]
+        blocked = np.array([self.is_blocked(p) for p in new_ids], dtype=bool)
+        lowered = np.char.lower(np.asarray(self._descriptions[n_old:n_rows], dtype=str))
+        with self._lock:
+            self.blocked = np.concatenate([self.blocked, blocked])
+            self._lowered = np.concatenate([self._lowered, lowered])
+            self._terms.clear()
+
+    def term_mask(self, term: str) -> np.ndarray:
+        """
+        Rows whose description contains term (case-insensitive).
+        """
+        term = term.strip().lower()
+        with self._lock:
+            mask = self._terms.get(term)
+            if mask is not None:
+                self._terms.move_to_end(term)
+                return mask
+        mask = np.char.find(self._lowered, term) >= 0
+        with self._lock:
+            self._terms[term] = mask
+            while len(self._terms) > self.max_cached_terms:
+                self._terms.popitem(last=False)
+        return mask
+
+    def combine(
+        self,
+        exclude_rows: Sequence[int] = (),
+        exclude_terms: Sequence[str] = (),
+    ) -> np.ndarray:
+        """
+        Global blocklist OR query-time filters; the shared global mask is
+        returned as is when there are no filters (do not modify it).
+        """
+        mask = self.blocked
+        exclude_terms = [t for t in exclude_terms if t.strip()]
+        if not len(exclude_rows) and not exclude_terms:
+            return mask
+        mask = mask.copy()
+        mask[np.asarray(exclude_rows, dtype="int64")] = True
+        for term in exclude_terms:
+            mask |= self.term_mask(term)
+        return mask
+
+    def blocks(
+        self,
+        product_id: str,
+        description: str,
+        exclude_ids: Sequence[str] = (),
+        exclude_terms: Sequence[str] = (),
+    ) -> bool:
+        """
+        combine()'s test for one product outside the embedding rows
+        (co-purchase neighbours without an embedding).
+        """
+        lowered = description.lower()
+        return (
+            self.is_blocked(product_id)
+            or product_id in exclude_ids
+            or any(t.strip().lower() in lowered for t in exclude_terms if t.strip())
+        )
+
+    def stats(self) -> Dict[str, int]:
+        return {"blocked_rows": int(self.blocked.sum()), "cached_terms": len(self._terms)}
+
+
+def fit_mask(mask: np.ndarray | None, n_rows: int) -> np.ndarray | None:
+    """
+    mask resized to n_rows (rows it does not cover are allowed).
+    """
+    if mask is None or len(mask) == n_rows:
+        return mask
+    if len(mask) > n_rows:
+        return mask[:n_rows]
+    return np.concatenate([mask, np.zeros(n_rows - len(mask), dtype=bool)])
@@ -0,0 +1,235 @@
+# backend/app/purchase_store.py
+#
+# Purchase histories as CSR arrays instead of Dict[str, List[str]]:
+#
+#   user_ids  (num_users,)      str    user id of every row
+#   indptr    (num_users + 1,)  int64  history of user u is items[indptr[u]:indptr[u + 1]]
+#   items     (nnz,)            int32  indices into item_ids, in purchase order
+#   item_ids  (num_items,)      str    product ids (StockCode)
+#
+# optional columns aligned with items (absent in legacy JSON):
+#   counts         (nnz,)       int32  purchases of the item by the user (invoices)
+#   last_purchase  (nnz,)       uint32 unix time of the latest of those purchases
+#
+# wal_segment: last purchase-event log segment merged into the file
+# (events.py); later segments are replayed on load.
+#
+# Saved as an uncompressed .npz by scripts/build_user_purchases.py;
+# 4 bytes per purchase (12 with counts/timestamps) instead of a Python
+# string in a list.
+
+import json
+from pathlib import Path
+from typing import Dict, Sequence
+
+import numpy as np
+
+
+class PurchaseHistories:
+    def __init__(
+        self,
+        user_ids: np.ndarray,
+        indptr: np.ndarray,
+        items: np.ndarray,
+        item_ids: np.ndarray,
+        counts: np.ndarray | None = None,
+        last_purchase: np.ndarray | None = None,
+        wal_segment: int = 0,
+    ):
+        self.user_ids = user_ids
+        self.indptr = indptr.astype("int64", copy=False)
+        self.items = items.astype("int32", copy=False)
+        self.item_ids = item_ids
+        self.counts = None if counts is None else counts.astype("int32", copy=False)
+        self.last_purchase = (
+            None if last_purchase is None else last_purchase.astype("uint32", copy=False)
+        )
+        self.wal_segment = wal_segment
+
+    def __len__(self) -> int:
+        return len(self.user_ids)
+
+    @property
+    def nnz(self) -> int:
+        return len(self.items)
+
+    @classmethod
+    def load(cls, path: str | Path) -> "PurchaseHistories":
+        data = np.load(path)
+        return cls(
+            data["user_ids"],
+            data["indptr"],
+            data["items"],
+            data["item_ids"],
+            data["counts"] if "counts" in data else None,
+            data["last_purchase"] if "last_purchase" in data else None,
+            int(data["wal_segment"]) if "wal_segment" in data else 0,
+        )
+
+    @classmethod
+    def from_json(cls, path: str | Path) -> "PurchaseHistories":
+        """
+        Legacy user_purchases.json ({user_id: [product_id, ...]}).
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            user_purchases: Dict[str, list] = json.load(f)
+
+        vocab: Dict[str, int] = {}
+        items = [vocab.setdefault(str(pid), len(vocab)) for h in user_purchases.values() for pid in h]
+        indptr = np.zeros(len(user_purchases) + 1, dtype="int64")
+        indptr[1:] = np.cumsum([len(h) for h in user_purchases.values()])
+        return cls(
+            np.array(list(user_purchases.keys()), dtype=str),
+            indptr,
+            np.array(items, dtype="int32"),
+            np.array(list(vocab.keys()), dtype=str),
+        )
+
+    def save(self, path: str | Path) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # write to a temp file and rename, a running server may be watching
+        tmp = path.with_name(path.name + ".tmp.npz")
+        columns = {}
+        if self.counts is not None:
+            columns["counts"] = self.counts
+        if self.last_purchase is not None:
+            columns["last_purchase"] = self.last_purchase
+        np.savez(
+            tmp,
+            user_ids=np.asarray(self.user_ids, dtype=str),
+            indptr=self.indptr,
+            items=self.items,
+            item_ids=np.asarray(self.item_ids, dtype=str),
+            wal_segment=np.int64(self.wal_segment),
+            **columns,
+        )
+        tmp.replace(path)
+
+    def with_events(
+        self,
+        user_ids: Sequence[str],
+        product_ids: Sequence[str],
+        timestamps: Sequence[float],
+    ) -> "PurchaseHistories":
+        """
+        Histories with purchase events folded in, as if the purchase file had
+        been rebuilt: a new (user, item) pair is appended to the user's
+        history, a repeated one gets count + 1 and a later last_purchase.
+        Users stay sorted by id. Vectorized over all purchases.
+        """
+        user_index = {u: i for i, u in enumerate(self.user_ids.tolist())}
+        item_index = {p: i for i, p in enumerate(self.item_ids.tolist())}
+        ev_users = np.array([user_index.setdefault(u, len(user_index)) for u in user_ids])
+        ev_items = np.array([item_index.setdefault(p, len(item_index)) for p in product_ids])
+        n_users, n_items = len(user_index), len(item_index)
+
+        owner = np.concatenate(
+            [np.repeat(np.arange(len(self.user_ids)), np.diff(self.indptr)), ev_users]
+        ).astype("int64")
+        items = np.concatenate([self.items, ev_items]).astype("int64")
+        old_counts = self.counts if self.counts is not None else np.ones(self.nnz, dtype="int32")
+        counts = np.concatenate([old_counts, np.ones(len(ev_users), dtype="int32")])
+        timestamps = np.asarray(timestamps, dtype="uint32")
+        if self.last_purchase is not None:
+            old_last = self.last_purchase
+        else:
+            # legacy histories without dates: treat them as just before the events
+            old_last = np.full(self.nnz, timestamps.min() if len(timestamps) else 0, "uint32")
+        last = np.concatenate([old_last, timestamps])
+
+        # one entry per (user, item), in order of first appearance
+        keys, first, pair = np.unique(owner * n_items + items, return_index=True, return_inverse=True)
+        pair_counts = np.bincount(pair, weights=counts, minlength=len(keys)).astype("int32")
+        pair_last = np.zeros(len(keys), dtype="uint32")
+        np.maximum.at(pair_last, pair, last)
+        by_first = np.argsort(first, kind="stable")
+        keys, pair_counts, pair_last = keys[by_first], pair_counts[by_first], pair_last[by_first]
+
+        all_user_ids = np.asarray(list(user_index.keys()), dtype=str)
+        user_order = np.argsort(all_user_ids, kind="stable")
+        user_rank = np.empty(n_users, dtype="int64")
+        user_rank[user_order] = np.arange(n_users)
+        pair_user = user_rank[keys // n_items]
+        order = np.argsort(pair_user, kind="stable")
+
+        indptr = np.zeros(n_users + 1, dtype="int64")
+        indptr[1:] = np.cumsum(np.bincount(pair_user, minlength=n_users))
+        return PurchaseHistories(
+            all_user_ids[user_order],
+            indptr,
+            (keys % n_items)[order].astype("int32"),
+            np.asarray(list(item_index.keys()), dtype=str),
+            counts=pair_counts[order],
+            last_purchase=pair_last[order],
+            wal_segment=self.wal_segment,
+        )
+
+    def user_last_purchase(self) -> np.ndarray:
+        """
+        Latest purchase time per user (float64 unix seconds, 0 if unknown).
+        """
+        result = np.zeros(len(self.user_ids), dtype="float64")
+        if self.last_purchase is None or not len(self.items):
+            return result
+        lengths = np.diff(self.indptr)
+        nonempty = lengths > 0
+        result[nonempty] = np.maximum.reduceat(
+            self.last_purchase.astype("float64"), self.indptr[:-1][nonempty]
+        )
+        return result
+
+    def weights(self, half_life_days: float = 0.0, frequency_exponent: float = 0.0) -> np.ndarray:
+        """
+        Per-purchase profile weights (float32, aligned with items):
+
+            count ** frequency_exponent * 0.5 ** (age_days / half_life_days)
+
+        age is measured from the user's own latest purchase, so every user's
+        newest item has time weight 1 (directions are scale-free, and old
+        histories do not underflow). 0 disables either factor; histories
+        without counts/timestamps get weight 1.
+        """
+        w = np.ones(len(self.items), dtype="float64")
+        if frequency_exponent and self.counts is not None:
+            w *= np.power(np.maximum(self.counts, 1), frequency_exponent)
+        if half_life_days > 0 and self.last_purchase is not None:
+            latest = np.repeat(self.user_last_purchase(), np.diff(self.indptr))
+            age_days = (latest - self.last_purchase) / 86400.0
+            w *= np.exp2(-age_days / half_life_days)
+        return w.astype("float32")
+
+    def to_rows(
+        self, id_to_index: Dict[str, int], values: np.ndarray | None = None
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Histories re-indexed to embedding rows: (indptr, rows, values), values
+        being the per-purchase `values` (e.g. weights(), default 1) kept in step.
+        Items without an embedding are dropped; purchase order is kept.
+        One dict lookup per distinct item, the rest is vectorized.
+        """
+        vocab_rows = np.array(
+            [id_to_index.get(pid, -1) for pid in self.item_ids.tolist()], dtype="int64"
+        )
+        rows = vocab_rows[self.items] if len(self.items) else np.empty(0, dtype="int64")
+        keep = rows >= 0
+
+        owner = np.repeat(np.arange(len(self.user_ids)), np.diff(self.indptr))
+        indptr = np.zeros(len(self.user_ids) + 1, dtype="int64")
+        indptr[1:] = np.cumsum(np.bincount(owner[keep], minlength=len(self.user_ids)))
+        if values is None:
+            values = np.ones(len(self.items), dtype="float32")
+        return indptr, rows[keep].astype("int32"), values[keep]
+
+
+def load_histories(store_path: str | Path, json_path: str | Path) -> PurchaseHistories:
+    """
+    Binary histories if present, else the legacy JSON (with a warning).
+    """
+    if Path(store_path).exists():
+        return PurchaseHistories.load(store_path)
+    print(
+        f"⚠️ WARNING: purchase store not found at {store_path}, "
+        f"falling back to {json_path}. Re-run scripts/build_user_purchases.py."
+    )
+    return PurchaseHistories.from_json(json_path)
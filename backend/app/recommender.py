@@ -1,83 +1,560 @@
 # backend/app/recommender.py
 
-import json
 import random
-from typing import List, Dict, Any
+import threading
+import time
+from pathlib import Path
+from typing import List, Dict, Any, Sequence
 
 import numpy as np
+from scipy import sparse
 
 from .config import get_settings
+from .ann_index import ExactIndex, IVFIndex, load_index, merge_candidates
+from .copurchase import ItemNeighbours
+from .diversity import mmr_rerank
+from .embedding_store import EmbeddingStore
+from .events import Position, PurchaseEventLog
+from .instrumentation import RECOMMENDER_STAGE_SECONDS, TOPK_TABLE_LOOKUPS
+from .masks import ProductMasks, read_blocklist
+from .purchase_store import PurchaseHistories, load_histories
+from .topk_tables import TopKTables, config_fingerprint, profile_digests
+from .user_interests import UserInterests
+
+SIMILAR_PRODUCTS_BACKENDS = ("embedding", "copurchase")
 
 
 class Recommender:
     """
     Embedding-based recommender:
-    - offline: product_embeddings.json (Cloud.ru embeddings)
-    - online: user embedding = mean of bought items embeddings
-    - ranking: cosine similarity user vs product embeddings
+    - offline: binary embedding store (Cloud.ru embeddings, see embedding_store.py)
+    - online: user embedding = mean of bought items embeddings (optionally
+      recency / frequency weighted, see Settings.profile_*), precomputed for all users at load time and updated incrementally
+    - ranking: cosine similarity user vs product embeddings,
+      exact or approximate (IVF) search, see ann_index.py;
+      optionally several interest vectors per user, merged (user_interests.py);
+      unchanged users / products are served from precomputed top-K tables
+      (topk_tables.py)
+    - candidate masks (masks.py): blocklist, per-user exclusions and
+      per-request filters, applied before top-N selection
+    - optional MMR re-rank of a top-M pool for diverse lists (diversity.py)
+    - similar products: embedding neighbours or co-purchase neighbours
+      from baskets (scripts/build_item_neighbours.py)
     """
 
     def __init__(self, settings=None):
         self.settings = settings or get_settings()
 
-        # user_id -> [product_id, ...]
-        self.user_purchases: Dict[str, List[str]] = {}
+        # purchase histories as loaded (CSR over the purchase file's item ids)
+        self.histories: PurchaseHistories | None = None
 
-        # product_id -> {"product_id": str, "description": str, "embedding": [float, ...]}
-        self.product_data: Dict[str, Dict[str, Any]] = {}
+        # binary embedding store; kept open to pick up appended rows
+        self.store: EmbeddingStore | None = None
 
         # product ids in the same order as rows in embedding_matrix
+        # (a product updated in the store has several rows, the last one is live)
         self.product_ids: List[str] = []
 
-        # embedding matrix of shape (num_products, dim), L2-normalized
+        # product descriptions, same order as product_ids
+        self.descriptions: List[str] = []
+
+        # embedding matrix of shape (num_products, dim), L2-normalized.
+        # np.memmap over the binary store, shared between workers via page cache
         self.embedding_matrix: np.ndarray | None = None
 
-        # mapping product_id -> row index in embedding_matrix
+        # mapping product_id -> live row index in embedding_matrix
         self.id_to_index: Dict[str, int] = {}
 
+        # True for rows that are superseded or deleted, never recommended
+        self.dead_rows: np.ndarray = np.zeros(0, dtype=bool)
+
+        # live, not blocked row indices, for get_random_product
+        self._live_rows: np.ndarray = np.zeros(0, dtype="int64")
+
+        # global blocklist mask + description term masks over the rows
+        self.masks: ProductMasks | None = None
+
+        # user_id -> product ids never recommended to the user (in memory)
+        self._user_exclusions: Dict[str, set] = {}
+
+        # nearest-neighbour search over embedding_matrix (Settings.ann_backend)
+        self.index: ExactIndex | IVFIndex | None = None
+
+        # co-purchase neighbours from baskets, None if not built
+        self.item_neighbours: ItemNeighbours | None = None
+
+        # user ids by row, and user_id -> row index in user_sums / user_counts
+        self.user_ids: List[str] = []
+        self.user_to_index: Dict[str, int] = {}
+
+        # running sum of bought items embeddings per user, shape (capacity, dim);
+        # only the first len(user_to_index) rows are used
+        self.user_sums: np.ndarray | None = None
+
+        # number of bought items (with embeddings) per user, shape (capacity,)
+        self.user_counts: np.ndarray | None = None
+
+        # (matrix, counts, last): sparse (num_users x num_products)
+        # profile weights of bought items, built at load time, with the
+        # purchase count and latest purchase time of each entry (aligned with
+        # its data), so repeat purchases re-weight an item as a rebuild of
+        # the purchase store would. Row indices are the users' histories
+        # (embedding rows, purchase order). Never modified in place: updates
+        # swap in a new tuple, so lock-free readers see one consistent set.
+        self._purchases: tuple[sparse.csr_matrix, np.ndarray, np.ndarray] | None = None
+
+        # user row -> bought item indices, for users changed after load
+        self._bought_overrides: Dict[int, np.ndarray] = {}
+        # user row -> profile weights of those items (same order)
+        self._override_weights: Dict[int, np.ndarray] = {}
+        # user row -> purchase counts / latest purchase times of those items
+        self._override_counts: Dict[int, np.ndarray] = {}
+        self._override_last: Dict[int, np.ndarray] = {}
+
+        # latest purchase time per user row (unix seconds), for time-decayed
+        # profiles (Settings.profile_half_life_days); same capacity as user_sums
+        self.user_last_time: np.ndarray | None = None
+
+        # multi-interest profiles (Settings.multi_interest_merge), None if off;
+        # user row -> row in interests.interests, -1 if the user has none
+        self.interests: UserInterests | None = None
+        self._interest_rows: np.ndarray = np.zeros(0, dtype="int64")
+
+        # precomputed top-K tables, None if not built / disabled;
+        # user row -> row in topk_tables.user_items, -1 if the user has none
+        self.topk_tables: TopKTables | None = None
+        self._user_table_rows: np.ndarray = np.zeros(0, dtype="int64")
+
+        # purchase-event log position applied to this snapshot (events.py)
+        self.event_position: Position = (1, 0)
+        # events read with the purchase store, applied once profiles are built
+        self._pending_events: List[Dict[str, Any]] = []
+
+        # guards incremental updates of user_sums / user_counts / histories
+        self._lock = threading.Lock()
+
         self._load_data()
+        self._build_user_matrix()
+        self._load_interests()
+        self._load_topk_tables()
+        self._replay_events()
 
     def _load_data(self) -> None:
-        # user purchases
-        with open(self.settings.user_purchases_path, "r", encoding="utf-8") as f:
-            self.user_purchases = json.load(f)
+        # user purchases (CSR arrays) and the events logged after them
+        self._load_purchases()
 
         # product embeddings + descriptions
-        with open(self.settings.product_embeddings_path, "r", encoding="utf-8") as f:
-            self.product_data = json.load(f)
+        store_path = self.settings.product_embeddings_store_path
+        if EmbeddingStore.exists(store_path):
+            store = EmbeddingStore(store_path)
+        else:
+            print(
+                f"⚠️ WARNING: embedding store not found at {store_path}, "
+                f"falling back to {self.settings.product_embeddings_path}. "
+                "Run scripts/convert_embeddings.py for fast startup."
+            )
+            store = EmbeddingStore.from_json(self.settings.product_embeddings_path)
+
+        self.store = store
+        self.product_ids = store.product_ids
+        self.descriptions = store.descriptions
+        self.embedding_matrix = store.matrix
 
-        self.product_ids = list(self.product_data.keys())
+        # product_id -> live index
+        self.id_to_index = store.live_rows()
+        self.dead_rows = np.ones(len(self.product_ids), dtype=bool)
+        self.dead_rows[list(self.id_to_index.values())] = False
 
-        # build embedding matrix
-        embs = [self.product_data[pid]["embedding"] for pid in self.product_ids]
-        emb_arr = np.array(embs, dtype="float32")
+        self.masks = ProductMasks(
+            self.product_ids,
+            self.descriptions,
+            self.settings.product_blocklist
+            + read_blocklist(self.settings.product_blocklist_path),
+        )
+        self._live_rows = np.flatnonzero(~self.dead_rows & ~self.masks.blocked)
 
-        # normalize so cosine similarity = dot product
-        norms = np.linalg.norm(emb_arr, axis=1, keepdims=True)
-        norms = np.clip(norms, 1e-8, None)
-        self.embedding_matrix = emb_arr / norms
+        self.index = load_index(self.settings, self.embedding_matrix)
+        self.index.update(self.embedding_matrix, np.flatnonzero(self.dead_rows))
 
-        # product_id -> index
-        self.id_to_index = {pid: idx for idx, pid in enumerate(self.product_ids)}
+        neighbours_path = Path(self.settings.item_neighbours_path)
+        if neighbours_path.exists():
+            self.item_neighbours = ItemNeighbours(neighbours_path)
+            print(f"Loaded co-purchase neighbours for {len(self.item_neighbours.item_ids)} items")
 
         print(
-            f"Loaded {len(self.product_ids)} products, "
-            f"{len(self.user_purchases)} users with purchases"
+            f"Loaded {len(self.id_to_index)} products, "
+            f"{len(self.histories)} users with purchases"
         )
 
+    def _build_user_matrix(self) -> None:
+        """
+        Computes (weighted) sums of bought items embeddings for all users at once:
+        (num_users x num_products) sparse purchase matrix @ embedding_matrix.
+        Matrix values are the profile weights (recency / frequency, see
+        PurchaseHistories.weights), 1 for a plain mean.
+        """
+        self.user_ids = self.histories.user_ids.tolist()
+        self.user_to_index = {uid: i for i, uid in enumerate(self.user_ids)}
+
+        if self.histories.last_purchase is not None:
+            self.user_last_time = self.histories.user_last_purchase()
+            last = self.histories.last_purchase
+        else:
+            # no timestamps: live purchases are aged from load time
+            self.user_last_time = np.full(len(self.user_ids), time.time(), dtype="float64")
+            last = np.repeat(self.user_last_time, np.diff(self.histories.indptr))
+        counts = self.histories.counts
+        if counts is None:
+            counts = np.ones(len(self.histories.items), dtype="int32")
+
+        weights = self.histories.weights(
+            self.settings.profile_half_life_days, self.settings.profile_frequency_exponent
+        )
+        # weights, counts and times re-indexed together
+        indptr, indices, values = self.histories.to_rows(
+            self.id_to_index, np.column_stack([weights, counts, last]).astype("float64")
+        )
+        purchases = sparse.csr_matrix(
+            (values[:, 0].astype("float32"), indices, indptr),
+            shape=(len(self.user_ids), len(self.product_ids)),
+        )
+
+        # only rows somebody bought are read: a sparse @ memmap product would
+        # page in the whole float32 matrix (scored from quantized codes if set)
+        bought = np.unique(indices)
+        self.user_sums = np.asarray(
+            purchases[:, bought] @ np.asarray(self.embedding_matrix[bought]), dtype="float32"
+        )
+        self.user_counts = np.diff(purchases.indptr).astype("float32")
+        self._purchases = (purchases, values[:, 1].astype("int32"), values[:, 2])
+        self._bought_overrides = {}
+        self._override_weights = {}
+        self._override_counts = {}
+        self._override_last = {}
+
+    def _load_interests(self) -> None:
+        mode = self.settings.multi_interest_merge
+        if mode == "off":
+            return
+        if mode not in ("max", "round_robin"):
+            print(f"⚠️ WARNING: unknown multi_interest_merge={mode!r}, using one vector per user")
+            return
+
+        path = Path(self.settings.user_interests_path)
+        if not path.exists():
+            print(
+                f"⚠️ WARNING: user interests not found at {path}, using one vector per user. "
+                "Run scripts/build_user_interests.py to build them."
+            )
+            return
+
+        interests = UserInterests(path)
+        if interests.interests.shape[2] != self.user_sums.shape[1]:
+            print(f"⚠️ WARNING: user interests at {path} have a different dim, ignored")
+            return
+
+        self.interests = interests
+        self._interest_rows = np.array(
+            [interests.id_to_row.get(uid, -1) for uid in self.user_ids], dtype="int64"
+        )
+        print(f"Loaded up to {interests.k} interests for {len(interests.user_ids)} users ({mode})")
+
+    def _load_topk_tables(self) -> None:
+        if not self.settings.topk_tables_enabled:
+            return
+        path = Path(self.settings.topk_tables_path)
+        if not path.exists():
+            return
+
+        tables = TopKTables(path)
+        if tables.config != config_fingerprint(self.settings):
+            print(
+                f"⚠️ WARNING: top-K tables at {path} were built with other ranking settings "
+                f"({tables.config}), ignored. Re-run scripts/build_topk_tables.py."
+            )
+            return
+        if tables.num_rows > len(self.product_ids):
+            print(f"⚠️ WARNING: top-K tables at {path} are newer than the embedding store, ignored")
+            return
+
+        # entries whose inputs changed between the build and this load
+        self._user_table_rows = np.array(
+            [tables.user_index.get(uid, -1) for uid in self.user_ids], dtype="int64"
+        )
+        known = np.flatnonzero(self._user_table_rows >= 0)
+        table_rows = self._user_table_rows[known]
+        purchases = self._purchases[0]
+        digests = profile_digests(purchases.indptr, purchases.indices, purchases.data)
+        tables.user_stale[table_rows] |= tables.user_digests[table_rows] != digests[known]
+        live = np.array(
+            [self.id_to_index.get(pid, -1) for pid in tables.product_ids.tolist()], dtype="int64"
+        )
+        tables.product_stale |= live != tables.product_rows
+        tables.mark_dead(self.dead_rows)
+
+        self.topk_tables = tables
+        stats = tables.stats()
+        print(
+            f"Loaded top-{tables.k} tables: {stats['users'] - stats['users_stale']} users, "
+            f"{stats['products'] - stats['products_stale']} products valid"
+        )
+
+    def _load_purchases(self) -> None:
+        """
+        Reads the purchase store and the log events newer than it under the
+        compaction lock: a compaction in between would merge segments the
+        loaded store lacks and delete them before they are read.
+        """
+        path = Path(self.settings.purchase_events_path)
+        if not self.settings.purchase_events_enabled or not path.exists():
+            self.histories = load_histories(
+                self.settings.user_purchases_store_path, self.settings.user_purchases_path
+            )
+            self.event_position = (self.histories.wal_segment + 1, 0)
+            return
+        log = PurchaseEventLog(path)
+        with log.compaction_lock():
+            self.histories = load_histories(
+                self.settings.user_purchases_store_path, self.settings.user_purchases_path
+            )
+            self._pending_events, self.event_position = log.read_since(
+                (self.histories.wal_segment + 1, 0)
+            )
+
+    def _replay_events(self) -> None:
+        """
+        Applies purchase events logged after the store was last compacted.
+        """
+        events, self._pending_events = self._pending_events, []
+        if events:
+            applied = sum(self.apply_purchase_events(events))
+            print(f"Replayed {len(events)} purchase events ({applied} new purchases)")
+
+    def _mark_users_stale(self, rows: np.ndarray) -> None:
+        """
+        Table entries of these user rows no longer match their profiles.
+        """
+        if self.topk_tables is None:
+            return
+        rows = rows[rows < len(self._user_table_rows)]
+        table_rows = self._user_table_rows[rows]
+        self.topk_tables.user_stale[table_rows[table_rows >= 0]] = True
+
+    def refresh_embeddings(self) -> Dict[str, int]:
+        """
+        Picks up rows appended to the embedding store (incremental build)
+        without a full reload:
+        - new products become recommendable,
+        - changed products switch to their new row; users who bought them
+          get their sums shifted by (new - old) vector,
+        - tombstoned products are hidden.
+        """
+        with self._lock:
+            n_old = len(self.product_ids)
+            added = self.store.refresh()
+            if not added:
+                return {"new_rows": 0, "added": 0, "updated": 0, "deleted": 0}
+
+            n_rows = len(self.product_ids)
+            matrix = self.store.matrix
+
+            dead = np.zeros(n_rows, dtype=bool)
+            dead[:n_old] = self.dead_rows
+            old_rows: List[int] = []
+            new_rows: List[int] = []  # -1 = product deleted
+            stats = {"new_rows": added, "added": 0, "updated": 0, "deleted": 0}
+
+            for row in range(n_old, n_rows):
+                pid = self.product_ids[row]
+                prev = self.id_to_index.get(pid)
+                if prev is not None:
+                    dead[prev] = True
+                if self.store.deleted[row]:
+                    dead[row] = True
+                    if prev is not None:
+                        del self.id_to_index[pid]
+                        old_rows.append(prev)
+                        new_rows.append(-1)
+                        stats["deleted"] += 1
+                    continue
+
+                self.id_to_index[pid] = row
+                if prev is None:
+                    stats["added"] += 1
+                else:
+                    old_rows.append(prev)
+                    new_rows.append(row)
+                    stats["updated"] += 1
+
+            pm, counts, last = self._purchases
+            # a new matrix object over the same arrays (resize() would
+            # change the one readers hold)
+            pm = sparse.csr_matrix((pm.data, pm.indices, pm.indptr), shape=(pm.shape[0], n_rows))
+            self._purchases = (pm, counts, last)
+
+            if old_rows:
+                self._move_purchased_rows(matrix, np.array(old_rows), np.array(new_rows))
+
+            self.embedding_matrix = matrix
+            self.dead_rows = dead
+            self.masks.extend()
+            self._live_rows = np.flatnonzero(~dead & ~self.masks.blocked)
+            self.index.update(matrix, np.flatnonzero(dead))
+
+            if self.topk_tables is not None:
+                # lists with a superseded / deleted item, and changed products;
+                # new products only enter the tables on the next build
+                self.topk_tables.mark_dead(dead)
+                for pid in self.product_ids[n_old:]:
+                    t = self.topk_tables.product_index.get(pid)
+                    if t is not None:
+                        self.topk_tables.product_stale[t] = True
+
+        print(f"Embedding store refreshed: {stats}")
+        return stats
+
+    def _move_purchased_rows(
+        self, matrix: np.ndarray, old_rows: np.ndarray, new_rows: np.ndarray
+    ) -> None:
+        """
+        Re-points purchases of old_rows to new_rows (-1 = drop the purchase)
+        and shifts user sums/counts accordingly, as if histories were
+        rebuilt from scratch against the refreshed store.
+        """
+        pm, counts, last = self._purchases
+        n_users = pm.shape[0]
+        kept = new_rows >= 0
+
+        # (new - old) for moved products, (-old) for deleted ones
+        delta = -np.asarray(matrix[old_rows], dtype="float32")
+        delta[kept] += np.asarray(matrix[new_rows[kept]], dtype="float32")
+
+        # matrix values are profile weights: sums move by weight * delta
+        hits = pm[:, old_rows]
+        user_delta = np.asarray(hits @ delta, dtype="float32")
+        count_delta = -hits[:, ~kept].getnnz(axis=1).astype("float32")
+        self._mark_users_stale(np.flatnonzero(hits.getnnz(axis=1)))
+
+        remap = np.arange(pm.shape[1], dtype="int32")
+        remap[old_rows[kept]] = new_rows[kept]
+        indptr, indices, data = pm.indptr, remap[pm.indices], pm.data
+        if not kept.all():
+            dropped = np.zeros(pm.shape[1], dtype=bool)
+            dropped[old_rows[~kept]] = True
+            keep = ~dropped[indices]
+            indptr = np.concatenate([[0], np.cumsum(keep)])[indptr].astype(indptr.dtype)
+            indices, data = indices[keep], data[keep]
+            counts, last = counts[keep], last[keep]
+        # built aside and swapped in one assignment: readers don't take the lock
+        self._purchases = (
+            sparse.csr_matrix((data, indices, indptr), shape=pm.shape),
+            counts,
+            last,
+        )
+
+        # histories changed after load are authoritative for their users
+        position = {int(old): i for i, old in enumerate(old_rows)}
+        for user_row, bought in list(self._bought_overrides.items()):
+            if user_row < n_users:
+                user_delta[user_row] = 0.0
+                count_delta[user_row] = 0.0
+            weights = self._override_weights[user_row]
+            touched = np.isin(bought, old_rows)
+            if not touched.any():
+                continue
+            hit = np.array([position[j] for j in bought[touched].tolist()])
+            self.user_sums[user_row] += (delta[hit] * weights[touched][:, None]).sum(axis=0)
+            self.user_counts[user_row] -= float((~kept[hit]).sum())
+            survives = ~np.isin(bought, old_rows[~kept])
+            self._bought_overrides[user_row] = remap[bought][survives].astype("int32")
+            self._override_weights[user_row] = weights[survives]
+            self._override_counts[user_row] = self._override_counts[user_row][survives]
+            self._override_last[user_row] = self._override_last[user_row][survives]
+
+        self.user_sums[:n_users] += user_delta
+        self.user_counts[:n_users] += count_delta
+
+    def _bought_indices(self, row: int) -> np.ndarray:
+        """
+        Indices of items bought by the user in the given row.
+        """
+        override = self._bought_overrides.get(row)
+        if override is not None:
+            return override
+        m = self._purchases[0]
+        if row >= m.shape[0]:
+            return np.empty(0, dtype="int32")
+        return m.indices[m.indptr[row] : m.indptr[row + 1]]
+
+    def _bought_weights(self, row: int) -> np.ndarray:
+        """
+        Profile weights of _bought_indices(row), same order.
+        """
+        override = self._override_weights.get(row)
+        if override is not None:
+            return override
+        m = self._purchases[0]
+        if row >= m.shape[0]:
+            return np.empty(0, dtype="float32")
+        return m.data[m.indptr[row] : m.indptr[row + 1]]
+
+    def _bought_stats(self, row: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Purchase counts and latest purchase times of _bought_indices(row).
+        """
+        if row in self._override_counts:
+            return self._override_counts[row], self._override_last[row]
+        m, counts, last = self._purchases
+        if row >= m.shape[0]:
+            return np.empty(0, dtype="int32"), np.empty(0, dtype="float64")
+        start, end = m.indptr[row], m.indptr[row + 1]
+        return counts[start:end], last[start:end]
+
+    def _ensure_user_row(self, user_id: str) -> int:
+        """
+        Returns the row of user_id in user_sums, appending a zero row
+        (with amortized growth) for a previously unknown user.
+        """
+        row = self.user_to_index.get(user_id)
+        if row is not None:
+            return row
+
+        row = len(self.user_to_index)
+        if row >= len(self.user_sums):
+            capacity = max(2 * len(self.user_sums), 16)
+            sums = np.zeros((capacity, self.user_sums.shape[1]), dtype="float32")
+            sums[:row] = self.user_sums[:row]
+            counts = np.zeros(capacity, dtype="float32")
+            counts[:row] = self.user_counts[:row]
+            last_time = np.zeros(capacity, dtype="float64")
+            last_time[:row] = self.user_last_time[:row]
+            self.user_sums, self.user_counts = sums, counts
+            self.user_last_time = last_time
+
+        self.user_to_index[user_id] = row
+        self.user_ids.append(user_id)
+        return row
+
     # --- helper methods ---
 
     def get_all_users_with_purchases(self) -> List[str]:
-        return [u for u, items in self.user_purchases.items() if items]
+        rows = np.flatnonzero(self.user_counts[: len(self.user_ids)] > 0)
+        return [self.user_ids[r] for r in rows]
 
     def get_user_items(self, user_id: str) -> List[str]:
-        return self.user_purchases.get(str(user_id), [])
+        """
+        Product ids the user bought, in purchase order.
+        """
+        row = self.user_to_index.get(str(user_id))
+        if row is None:
+            return []
+        return [self.product_ids[j] for j in self._bought_indices(row)]
 
     def get_product_description(self, product_id: str) -> str | None:
-        data = self.product_data.get(product_id)
-        if not data:
+        idx = self.id_to_index.get(product_id)
+        if idx is None:
             return None
-        return data.get("description")
+        return self.descriptions[idx]
 
     def get_bought_descriptions(self, user_id: str, limit: int = 20) -> List[str]:
         """
@@ -85,9 +562,12 @@ class Recommender:
         - 'Previous purchases' block
         - LLM explanations.
         """
+        row = self.user_to_index.get(str(user_id))
+        if row is None:
+            return []
         result: List[str] = []
-        for pid in self.get_user_items(user_id):
-            desc = self.get_product_description(pid)
+        for j in self._bought_indices(row):
+            desc = self.descriptions[j]
             if desc:
                 result.append(desc)
             if len(result) >= limit:
@@ -98,35 +578,172 @@ class Recommender:
         """
         Clears purchase history for a given user in memory.
 
-        In this demo, we don't rewrite JSON on disk — we simply
+        In this demo, we don't rewrite the purchase store on disk — we simply
         remove the in-memory history so that:
         - user embedding collapses (no more personalized recs),
         - user disappears from 'has purchases' list.
         """
         user_id = str(user_id)
-        if user_id in self.user_purchases:
-            self.user_purchases[user_id] = []
+        with self._lock:
+            row = self.user_to_index.get(user_id)
+            if row is not None:
+                self.user_sums[row] = 0.0
+                self.user_counts[row] = 0.0
+                self._bought_overrides[row] = np.empty(0, dtype="int32")
+                self._override_weights[row] = np.empty(0, dtype="float32")
+                self._override_counts[row] = np.empty(0, dtype="int32")
+                self._override_last[row] = np.empty(0, dtype="float64")
+                self._mark_users_stale(np.array([row]))
 
-    def _build_user_embedding(self, user_id: str) -> np.ndarray | None:
+    def get_user_exclusions(self, user_id: str) -> List[str]:
+        return sorted(self._user_exclusions.get(str(user_id), ()))
+
+    def exclude_for_user(self, user_id: str, product_ids: Sequence[str]) -> List[str]:
+        """
+        Products never recommended to this user ('Not interested').
+        Kept in memory, like clear_user_history. Returns all exclusions.
+        """
+        with self._lock:
+            excluded = self._user_exclusions.setdefault(str(user_id), set())
+            excluded.update(str(pid) for pid in product_ids)
+        return self.get_user_exclusions(user_id)
+
+    def clear_user_exclusions(self, user_id: str) -> None:
+        with self._lock:
+            self._user_exclusions.pop(str(user_id), None)
+
+    def _exclusion_rows(self, user_id: str) -> np.ndarray:
+        excluded = self._user_exclusions.get(user_id)
+        if not excluded:
+            return np.empty(0, dtype="int32")
+        return np.array(
+            [self.id_to_index[pid] for pid in excluded if pid in self.id_to_index], dtype="int32"
+        )
+
+    def _request_mask(
+        self, exclude_ids: Sequence[str] = (), exclude_terms: Sequence[str] = ()
+    ) -> np.ndarray:
         """
-        User embedding = mean of embeddings of all purchased items.
+        Global blocklist combined with one request's filters.
         """
-        bought_ids = self.get_user_items(user_id)
-        if not bought_ids:
+        rows = [self.id_to_index[pid] for pid in exclude_ids if pid in self.id_to_index]
+        return self.masks.combine(rows, exclude_terms)
+
+    def _diversity_lambda(self, endpoint: str, diversity: float | None) -> float | None:
+        """
+        MMR lambda of a request: the explicit value, else Settings.diversity_lambda
+        if endpoint is in Settings.diversity_endpoints; None = plain top-N.
+        """
+        if diversity is None and endpoint in self.settings.diversity_endpoints:
+            diversity = self.settings.diversity_lambda
+        if diversity is None or diversity >= 1.0:
             return None
+        return max(0.0, float(diversity))
 
-        vectors = []
-        for pid in bought_ids:
-            pdata = self.product_data.get(pid)
-            if not pdata:
-                continue
-            vectors.append(pdata["embedding"])
+    def _pool_size(self, top_n: int, lam: float | None) -> int:
+        """
+        Candidates to retrieve: top_n, or the MMR pool when re-ranking.
+        """
+        return top_n if lam is None else max(top_n, self.settings.diversity_pool)
 
-        if not vectors:
+    def _diversify(
+        self, idx: np.ndarray, scores: np.ndarray, top_n: int, lam: float | None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        if lam is None:
+            return idx, scores
+        with RECOMMENDER_STAGE_SECONDS.time(stage="mmr"):
+            return mmr_rerank(self.embedding_matrix, idx, scores, top_n, lam)
+
+    def add_purchase(
+        self, user_id: str, product_id: str, timestamp: float | None = None
+    ) -> bool:
+        """
+        Adds a purchase to the user's in-memory history and updates the
+        precomputed user embedding in O(dim), to what a rebuild of the
+        purchase store with this purchase would give (see
+        PurchaseHistories.with_events / weights): a new item is appended,
+        a repeated one gets count + 1 and a later purchase time, and its
+        weight count ** frequency_exponent * decay is updated in place.
+        Products without an embedding are ignored, as at load time.
+        Returns True if the profile changed.
+
+        With time decay, a purchase newer than the user's latest one first
+        decays the whole running sum by 0.5 ** (elapsed / half-life) — the
+        same result as re-weighting every item.
+        """
+        user_id = str(user_id)
+        timestamp = time.time() if timestamp is None else float(timestamp)
+        with self._lock:
+            idx = self.id_to_index.get(product_id)
+            if idx is None:
+                return False
+
+            row = self._ensure_user_row(user_id)
+            bought = self._bought_indices(row)
+            weights = self._bought_weights(row)
+            counts, last = self._bought_stats(row)
+
+            half_life_s = self.settings.profile_half_life_days * 86400.0
+            if half_life_s > 0 and timestamp > self.user_last_time[row]:
+                decay = float(np.exp2(-(timestamp - self.user_last_time[row]) / half_life_s))
+                self.user_sums[row] *= decay
+                weights = weights * decay
+            self.user_last_time[row] = max(self.user_last_time[row], timestamp)
+
+            pos = np.flatnonzero(bought == idx)
+            is_new = not len(pos)
+            if is_new:
+                bought = np.append(bought, np.int32(idx)).astype("int32")
+                weights = np.append(weights, np.float32(0.0)).astype("float32")
+                counts = np.append(counts, np.int32(0)).astype("int32")
+                last = np.append(last, timestamp)
+                pos = len(bought) - 1
+            else:
+                pos = int(pos[0])
+                bought, weights = bought.copy(), weights.copy()
+                counts, last = counts.copy(), last.copy()
+            counts[pos] += 1
+            last[pos] = max(last[pos], timestamp)
+
+            weight = 1.0
+            if self.settings.profile_frequency_exponent:
+                weight = float(counts[pos]) ** self.settings.profile_frequency_exponent
+            if half_life_s > 0:
+                weight *= float(np.exp2(-(self.user_last_time[row] - last[pos]) / half_life_s))
+            changed = is_new or weight != float(weights[pos])
+            self.user_sums[row] += (weight - float(weights[pos])) * self.embedding_matrix[idx]
+            weights[pos] = weight
+            if is_new:
+                self.user_counts[row] += 1.0
+
+            self._bought_overrides[row] = bought
+            self._override_weights[row] = weights
+            self._override_counts[row] = counts
+            self._override_last[row] = last
+            if changed:
+                self._mark_users_stale(np.array([row]))
+            return changed
+
+    def apply_purchase_events(self, events: List[Dict[str, Any]]) -> List[bool]:
+        """
+        add_purchase for {"user_id", "product_id", "ts"} log events;
+        returns whether each changed a profile. Every event must be applied
+        once (EventFollower tracks the log position).
+        """
+        return [self.add_purchase(e["user_id"], e["product_id"], e.get("ts")) for e in events]
+
+    def _build_user_embedding(self, user_id: str) -> np.ndarray | None:
+        """
+        User embedding = (weighted) mean of embeddings of all purchased items.
+
+        Mean and sum point the same way, so after L2 normalization
+        the precomputed running sum is enough — one row lookup.
+        """
+        row = self.user_to_index.get(str(user_id))
+        if row is None or self.user_counts[row] == 0:
             return None
 
-        arr = np.array(vectors, dtype="float32")
-        user_vec = arr.mean(axis=0)
+        user_vec = self.user_sums[row]
 
         norm = np.linalg.norm(user_vec)
         if norm < 1e-8:
@@ -134,72 +751,447 @@ class Recommender:
 
         return user_vec / norm
 
-    # --- main recommendation method (user-based) ---
+    # --- main recommendation methods (user-based) ---
 
-    def recommend_for_user(self, user_id: str, top_n: int = 12) -> List[Dict[str, Any]]:
+    def recommend_for_user(
+        self,
+        user_id: str,
+        top_n: int = 12,
+        exclude_ids: Sequence[str] = (),
+        exclude_terms: Sequence[str] = (),
+        diversity: float | None = None,
+    ) -> List[Dict[str, Any]]:
         """
         Returns top-N recommendations for a user using cosine similarity
         between user embedding and product embeddings.
         """
-        if self.embedding_matrix is None:
-            return []
+        return self.recommend_for_users(
+            [user_id],
+            top_n=top_n,
+            exclude_ids=exclude_ids,
+            exclude_terms=exclude_terms,
+            diversity=diversity,
+        ).get(str(user_id), [])
 
-        user_vec = self._build_user_embedding(user_id)
-        if user_vec is None:
-            return []
+    def recommend_for_users(
+        self,
+        user_ids: List[str],
+        top_n: int = 12,
+        exclude_ids: Sequence[str] = (),
+        exclude_terms: Sequence[str] = (),
+        diversity: float | None = None,
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Batched version of recommend_for_user (email campaigns, cache warm-ups).
+
+        Users with a valid precomputed entry (top_n <= table K) are a table
+        lookup. The rest are scored in blocks with one matmul per block (or
+        one IVF probe per block), bought / excluded items are masked from the
+        sparse purchase mask, blocklisted and filtered items (exclude_ids,
+        description terms exclude_terms) by the candidate mask, and top-N is
+        picked with argpartition across the whole block. With diversity
+        (MMR lambda, default per Settings.diversity_endpoints) the top
+        Settings.diversity_pool are re-ranked by MMR. Users without history
+        get an empty list.
+        """
+        lam = self._diversity_lambda("recommendations", diversity)
+        # result blocks are (users x top_n): never larger than the catalog
+        top_n = min(top_n, len(self.product_ids))
+        with RECOMMENDER_STAGE_SECONDS.time(stage="total"):
+            return self._recommend_for_users(user_ids, top_n, exclude_ids, exclude_terms, lam)
+
+    def _recommend_for_users(
+        self,
+        user_ids: List[str],
+        top_n: int,
+        exclude_ids: Sequence[str] = (),
+        exclude_terms: Sequence[str] = (),
+        lam: float | None = None,
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        results: Dict[str, List[Dict[str, Any]]] = {str(u): [] for u in user_ids}
+        if self.embedding_matrix is None or top_n <= 0:
+            return results
 
-        bought = set(self.get_user_items(user_id))
+        # users with a non-empty profile, with their rows in user_sums
+        active = [
+            (uid, self.user_to_index[uid])
+            for uid in results
+            if uid in self.user_to_index and self.user_counts[self.user_to_index[uid]] > 0
+        ]
+
+        mask = self._request_mask(exclude_ids, exclude_terms)
+        if self.topk_tables is not None:
+            active = self._recommend_from_tables(active, top_n, results, mask, lam)
+
+        block_size = max(1, self.settings.recommend_batch_size)
+        for start in range(0, len(active), block_size):
+            block = active[start : start + block_size]
+            rows = np.array([row for _, row in block], dtype="int64")
+
+            t0 = time.perf_counter()
+            user_vecs = self.user_sums[rows]
+            norms = np.linalg.norm(user_vecs, axis=1, keepdims=True)
+            user_vecs = user_vecs / np.clip(norms, 1e-8, None)
+
+            # do not recommend already bought or excluded items
+            bought = [self._bought_indices(row) for row in rows]
+            for i, (uid, _) in enumerate(block):
+                if uid in self._user_exclusions:
+                    bought[i] = np.concatenate([bought[i], self._exclusion_rows(uid)])
+            RECOMMENDER_STAGE_SECONDS.observe(time.perf_counter() - t0, stage="user_vector")
+
+            # score / topk stages are recorded by the index
+            top_idx, top_scores = self._search_users(
+                rows, user_vecs, bought, self._pool_size(top_n, lam), mask
+            )
+            top_idx, top_scores = self._diversify(top_idx, top_scores, top_n, lam)
 
-        # cosine similarities: (num_products,)
-        sims = self.embedding_matrix @ user_vec
+            t0 = time.perf_counter()
+            for (uid, _), idx_row, score_row in zip(block, top_idx, top_scores):
+                results[uid] = [
+                    {
+                        "product_id": self.product_ids[j],
+                        "description": self.descriptions[j],
+                        "score": float(score),
+                    }
+                    for j, score in zip(idx_row, score_row)
+                    if np.isfinite(score)
+                ]
+            RECOMMENDER_STAGE_SECONDS.observe(time.perf_counter() - t0, stage="format")
 
-        # sort indices by similarity descending
-        idx_sorted = np.argsort(sims)[::-1]
+        return results
 
-        recs: List[Dict[str, Any]] = []
-        for idx in idx_sorted:
-            pid = self.product_ids[idx]
-            if pid in bought:
-                continue  # do not recommend already bought items
+    def _recommend_from_tables(
+        self,
+        active: List[tuple],
+        top_n: int,
+        results: Dict[str, List[Dict[str, Any]]],
+        mask: np.ndarray,
+        lam: float | None = None,
+    ) -> List[tuple]:
+        """
+        Fills results for users with a valid table entry; returns the
+        (user_id, row) pairs that still need live scoring.
+        """
+        tables = self.topk_tables
+        if (
+            self._pool_size(top_n, lam) > tables.k
+            or tables.expired(self.settings.topk_tables_max_age_s)
+        ):
+            TOPK_TABLE_LOOKUPS.inc(len(active), table="user", result="miss")
+            return active
 
-            pdata = self.product_data.get(pid)
-            if not pdata:
+        t0 = time.perf_counter()
+        misses: List[tuple] = []
+        n_stale = n_filtered = 0
+        for uid, row in active:
+            t = self._user_table_rows[row] if row < len(self._user_table_rows) else -1
+            if t < 0 or tables.user_stale[t]:
+                n_stale += t >= 0
+                misses.append((uid, row))
                 continue
+            recs = self._table_entries(
+                tables.user_items[t],
+                tables.user_scores[t],
+                top_n,
+                mask,
+                self._exclusion_rows(uid),
+                lam,
+            )
+            if recs is None:
+                n_filtered += 1
+                misses.append((uid, row))
+                continue
+            results[uid] = recs
+        RECOMMENDER_STAGE_SECONDS.observe(time.perf_counter() - t0, stage="table")
 
-            recs.append(
-                {
-                    "product_id": pid,
-                    "description": pdata.get("description", ""),
-                    "score": float(sims[idx]),
-                }
+        TOPK_TABLE_LOOKUPS.inc(len(active) - len(misses), table="user", result="hit")
+        TOPK_TABLE_LOOKUPS.inc(n_stale, table="user", result="stale")
+        TOPK_TABLE_LOOKUPS.inc(n_filtered, table="user", result="filtered")
+        TOPK_TABLE_LOOKUPS.inc(len(misses) - n_stale - n_filtered, table="user", result="miss")
+        return misses
+
+    def _table_entries(
+        self,
+        items: np.ndarray,
+        scores: np.ndarray,
+        top_n: int,
+        mask: np.ndarray,
+        excluded: np.ndarray,
+        lam: float | None = None,
+    ) -> List[Dict[str, Any]] | None:
+        """
+        First top_n entries (MMR pool with lam) of a table list that pass the
+        mask and are not in excluded; None if the masks leave fewer than that
+        of a full list (the next best items are not in the table, score live).
+        """
+        pool = self._pool_size(top_n, lam)
+        valid = items >= 0
+        keep = valid.copy()
+        keep[valid] = ~mask[items[valid]]
+        if len(excluded):
+            keep &= ~np.isin(items, excluded)
+        keep = np.flatnonzero(keep)[:pool]
+        if len(keep) < pool and valid.all():
+            return None
+        items, scores = items[keep], scores[keep].astype("float32")
+        if lam is not None:
+            idx, sc = self._diversify(items[None, :], scores[None, :], top_n, lam)
+            items, scores = idx[0][idx[0] >= 0], sc[0][idx[0] >= 0]
+        return [
+            {
+                "product_id": self.product_ids[j],
+                "description": self.descriptions[j],
+                "score": float(score),
+            }
+            for j, score in zip(items.tolist(), scores.tolist())
+        ]
+
+    def _multi_interest_mask(self, rows: np.ndarray) -> np.ndarray:
+        """
+        Users served from their interest vectors: present in the interests
+        file, with 2+ interests, and not changed since load (their interests
+        would be stale, the running sum is not).
+        """
+        mask = np.zeros(len(rows), dtype=bool)
+        if self.interests is None:
+            return mask
+        inside = rows < len(self._interest_rows)
+        irows = np.full(len(rows), -1, dtype="int64")
+        irows[inside] = self._interest_rows[rows[inside]]
+        mask = irows >= 0
+        mask[mask] = self.interests.n_interests[irows[mask]] >= 2
+        for i in np.flatnonzero(mask):
+            if int(rows[i]) in self._bought_overrides:
+                mask[i] = False
+        return mask
+
+    def _search_users(
+        self,
+        rows: np.ndarray,
+        user_vecs: np.ndarray,
+        bought: List[np.ndarray],
+        top_n: int,
+        mask: np.ndarray | None = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Top-N per user row: one search for single-vector users and one for all
+        interest vectors of multi-interest users, whose per-interest lists are
+        merged by max score or round-robin (biggest interest first).
+        """
+        top_idx = np.full((len(rows), top_n), -1, dtype="int64")
+        top_scores = np.full((len(rows), top_n), -np.inf, dtype="float32")
+        multi = self._multi_interest_mask(rows)
+
+        single = np.flatnonzero(~multi)
+        if len(single):
+            idx, scores = self.index.search(
+                user_vecs[single], top_n, exclude=[bought[i] for i in single], mask=mask
             )
+            top_idx[single, : idx.shape[1]] = idx
+            top_scores[single, : idx.shape[1]] = scores
 
-            if len(recs) >= top_n:
-                break
+        sel = np.flatnonzero(multi)
+        if len(sel):
+            irows = self._interest_rows[rows[sel]]
+            n_int = self.interests.n_interests[irows]
+            owner = np.repeat(np.arange(len(sel)), n_int)
+            rank = np.arange(len(owner)) - np.repeat(np.cumsum(n_int) - n_int, n_int)
+            queries = self.interests.interests[irows[owner], rank]
 
-        return recs
+            # all interests of the block in one matmul / probe
+            idx, scores = self.index.search(
+                queries, top_n, exclude=[bought[sel[o]] for o in owner], mask=mask
+            )
+
+            t0 = time.perf_counter()
+            if self.settings.multi_interest_merge == "max":
+                priority = -scores
+            else:
+                # rank 0 of every interest, then rank 1, ...
+                priority = (
+                    np.arange(idx.shape[1])[None, :] * self.interests.k + rank[:, None]
+                ).astype("float32")
+            merged_idx, merged_scores = merge_candidates(
+                np.repeat(owner, idx.shape[1]),
+                idx.ravel(),
+                scores.ravel(),
+                priority.ravel(),
+                len(sel),
+                top_n,
+            )
+            top_idx[sel] = merged_idx
+            top_scores[sel] = merged_scores
+            RECOMMENDER_STAGE_SECONDS.observe(time.perf_counter() - t0, stage="merge")
+
+        return top_idx, top_scores
+
+    # --- cart-aware suggestions (Cart Add-ons) ---
+
+    def cart_addons(
+        self,
+        product_ids: List[str],
+        top_n: int = 8,
+        mode: str = "mean",
+        exclude_ids: Sequence[str] = (),
+        exclude_terms: Sequence[str] = (),
+        diversity: float | None = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Top-N add-ons for a whole cart in one vectorized pass; cart items,
+        blocklisted and filtered items are excluded, optionally MMR re-ranked.
+
+        mode:
+        - "mean": one query vector = normalized sum of the cart items' embeddings,
+        - "max": each candidate scored by its best similarity to any cart item
+          (one search for all anchors, merged by max).
+        """
+        if self.embedding_matrix is None or top_n <= 0:
+            return []
+        top_n = min(top_n, len(self.product_ids))
+
+        rows = np.array(
+            sorted({self.id_to_index[pid] for pid in product_ids if pid in self.id_to_index}),
+            dtype="int64",
+        )
+        if not len(rows):
+            return []
+
+        mask = self._request_mask(exclude_ids, exclude_terms)
+        lam = self._diversity_lambda("cart", diversity)
+        pool = self._pool_size(top_n, lam)
+        anchors = np.asarray(self.embedding_matrix[rows])
+        if mode == "max":
+            # a candidate in the global max-sim top-N is in the top-N of the
+            # anchor it is closest to, so per-anchor top-N lists are enough
+            top_idx, top_scores = self.index.search(
+                anchors, pool, exclude=[rows] * len(rows), mask=mask
+            )
+
+            # best score per candidate
+            merged_idx, merged_scores = merge_candidates(
+                np.zeros(top_idx.size, dtype="int64"),
+                top_idx.ravel(),
+                top_scores.ravel(),
+                -top_scores.ravel(),
+                1,
+                pool,
+            )
+            top_idx, top_scores = self._diversify(merged_idx, merged_scores, top_n, lam)
+            top_idx, top_scores = top_idx[0], top_scores[0]
+        else:
+            query = anchors.sum(axis=0)
+            query = query / max(float(np.linalg.norm(query)), 1e-8)
+            top_idx, top_scores = self.index.search(
+                query[None, :], pool, exclude=[rows], mask=mask
+            )
+            top_idx, top_scores = self._diversify(top_idx, top_scores, top_n, lam)
+            top_idx, top_scores = top_idx[0], top_scores[0]
+
+        return [
+            {
+                "product_id": self.product_ids[j],
+                "description": self.descriptions[j],
+                "score": float(score),
+            }
+            for j, score in zip(top_idx, top_scores)
+            if j >= 0
+        ]
 
     # --- item-based similarity for Product Page (Frequently Bought Together) ---
 
     def get_random_product(self) -> Dict[str, Any] | None:
         """
-        Returns a random product from the catalog (only those with embeddings).
+        Returns a random product from the catalog (only those with embeddings,
+        blocklisted ones excluded).
         """
-        if not self.product_ids:
+        if not len(self._live_rows):
             return None
 
-        pid = random.choice(self.product_ids)
-        pdata = self.product_data.get(pid, {})
+        idx = int(random.choice(self._live_rows))
         return {
-            "product_id": pid,
-            "description": pdata.get("description", "").strip(),
+            "product_id": self.product_ids[idx],
+            "description": self.descriptions[idx].strip(),
         }
 
-    def similar_products(self, product_id: str, top_n: int = 8) -> List[Dict[str, Any]]:
+    def similar_products(
+        self,
+        product_id: str,
+        top_n: int = 8,
+        backend: str | None = None,
+        exclude_ids: Sequence[str] = (),
+        exclude_terms: Sequence[str] = (),
+        diversity: float | None = None,
+    ) -> List[Dict[str, Any]]:
         """
-        Finds top-N most similar products by cosine similarity in embedding space.
-        Used for the 'Frequently bought together' block on the Product Page.
+        Top-N products for the 'Frequently bought together' block on the Product Page.
+
+        backend (default Settings.similar_products_backend, ValueError if unknown):
+        - "embedding": cosine similarity in embedding space,
+        - "copurchase": items most often bought in the same baskets;
+          topped up from embeddings when the item has few co-purchases.
+        Blocklisted and filtered items (exclude_ids, exclude_terms) are skipped;
+        embedding neighbours are MMR re-ranked with diversity (see recommend_for_users).
         """
+        if top_n <= 0:
+            top_n = 8
+        top_n = min(top_n, len(self.product_ids))
+        backend = backend or self.settings.similar_products_backend
+        if backend not in SIMILAR_PRODUCTS_BACKENDS:
+            raise ValueError(
+                f"unknown similar products backend {backend!r}, "
+                f"expected one of {', '.join(SIMILAR_PRODUCTS_BACKENDS)}"
+            )
+        mask = self._request_mask(exclude_ids, exclude_terms)
+
+        if backend == "copurchase" and self.item_neighbours is not None:
+            results = self._copurchase_products(
+                product_id, top_n, mask, exclude_ids, exclude_terms
+            )
+            if len(results) < top_n:
+                seen = {r["product_id"] for r in results}
+                for rec in self._embedding_similar_products(
+                    product_id, top_n + len(results), mask
+                ):
+                    if rec["product_id"] not in seen:
+                        results.append(rec)
+                    if len(results) >= top_n:
+                        break
+            return results
+
+        lam = self._diversity_lambda("similar", diversity)
+        return self._embedding_similar_products(product_id, top_n, mask, lam)
+
+    def _copurchase_products(
+        self,
+        product_id: str,
+        top_n: int,
+        mask: np.ndarray,
+        exclude_ids: Sequence[str] = (),
+        exclude_terms: Sequence[str] = (),
+    ) -> List[Dict[str, Any]]:
+        neighbours = self.item_neighbours
+        results: List[Dict[str, Any]] = []
+        # whole neighbour list (top-K of the build), masked items skipped
+        for pid, score in neighbours.neighbours(product_id, len(neighbours.item_ids)):
+            row = self.id_to_index.get(pid)
+            if row is not None:
+                if mask[row]:
+                    continue
+                desc = self.descriptions[row]
+            else:
+                # not in the embedding catalog — fall back to the basket data description
+                desc = neighbours.descriptions[neighbours.id_to_index[pid]]
+                if self.masks.blocks(pid, desc, exclude_ids, exclude_terms):
+                    continue
+            results.append({"product_id": pid, "description": desc, "score": score})
+            if len(results) >= top_n:
+                break
+        return results
+
+    def _embedding_similar_products(
+        self, product_id: str, top_n: int, mask: np.ndarray, lam: float | None = None
+    ) -> List[Dict[str, Any]]:
         if self.embedding_matrix is None:
             return []
 
@@ -207,26 +1199,61 @@ class Recommender:
         if idx is None:
             return []
 
-        anchor_vec = self.embedding_matrix[idx]  # [dim]
-        sims = self.embedding_matrix @ anchor_vec  # [num_products]
-        sims[idx] = -1e9  # do not recommend the same item
-
-        if top_n <= 0:
-            top_n = 8
-        top_n = min(top_n, len(self.product_ids) - 1)
+        cached = self._similar_from_tables(product_id, top_n, mask, lam)
+        if cached is not None:
+            return cached
 
-        top_idx = np.argpartition(-sims, top_n)[:top_n]
-        top_idx = top_idx[np.argsort(-sims[top_idx])]
+        anchor_vec = np.asarray(self.embedding_matrix[idx])  # [dim]
+        top_idx, top_scores = self.index.search(
+            anchor_vec[None, :],
+            self._pool_size(top_n, lam),
+            exclude=[np.array([idx])],  # do not recommend the same item
+            mask=mask,
+        )
+        top_idx, top_scores = self._diversify(top_idx, top_scores, top_n, lam)
+        top_idx, sims = top_idx[0], top_scores[0]
 
         results: List[Dict[str, Any]] = []
-        for j in top_idx:
-            pid = self.product_ids[j]
-            pdata = self.product_data.get(pid, {})
+        for j, score in zip(top_idx, sims):
+            if j < 0:
+                continue
             results.append(
                 {
-                    "product_id": pid,
-                    "description": pdata.get("description", ""),
-                    "score": float(sims[j]),
+                    "product_id": self.product_ids[j],
+                    "description": self.descriptions[j],
+                    "score": float(score),
                 }
             )
         return results
+
+    def _similar_from_tables(
+        self, product_id: str, top_n: int, mask: np.ndarray, lam: float | None = None
+    ) -> List[Dict[str, Any]] | None:
+        """
+        Precomputed neighbours of product_id, None if there is no valid entry.
+        """
+        tables = self.topk_tables
+        if tables is None:
+            return None
+        t = tables.product_index.get(product_id)
+        if (
+            t is None
+            or self._pool_size(top_n, lam) > tables.k
+            or tables.expired(self.settings.topk_tables_max_age_s)
+        ):
+            TOPK_TABLE_LOOKUPS.inc(table="product", result="miss")
+            return None
+        if tables.product_stale[t]:
+            TOPK_TABLE_LOOKUPS.inc(table="product", result="stale")
+            return None
+
+        recs = self._table_entries(
+            tables.product_items[t],
+            tables.product_scores[t],
+            top_n,
+            mask,
+            np.empty(0, dtype="int32"),
+            lam,
+        )
+        TOPK_TABLE_LOOKUPS.inc(table="product", result="hit" if recs is not None else "filtered")
+        return recs
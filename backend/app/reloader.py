@@ -0,0 +1,200 @@
+# backend/app/reloader.py
+
+import os
+import signal
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+from .ann_index import QUANTIZED_FILES
+from .config import get_settings
+from .recommender import Recommender
+
+# pre-fork serving (serve.py): the parent's holder. A holder created in a
+# forked worker adopts its snapshot (memory shared copy-on-write) and leaves
+# reloads and file watching to the parent
+_parent_holder: "RecommenderHolder | None" = None
+
+
+def share_with_workers(holder: "RecommenderHolder") -> None:
+    global _parent_holder
+    _parent_holder = holder
+
+
+class RecommenderHolder:
+    """
+    Holds the current Recommender snapshot and swaps in a new one atomically.
+
+    A reload builds a fresh Recommender in a background thread while the old
+    one keeps serving; the swap is a single attribute assignment. Request
+    handlers read `holder.current` once and use that snapshot until they
+    finish, so in-flight requests never see a half-built model.
+    """
+
+    def __init__(self, factory: Callable[[], Recommender] | None = None):
+        self.settings = get_settings()
+        self._factory = factory or (lambda: Recommender(self.settings))
+        self._reload_lock = threading.Lock()
+        self._watcher: threading.Thread | None = None
+        self._stop = threading.Event()
+        # data files fingerprint: last acted on / changed, waiting to settle
+        self._seen: tuple | None = None
+        self._pending: tuple | None = None
+
+        self.version = 0
+        self.last_reload_s = 0.0
+        self.loaded_at = 0.0
+        self.last_error: str | None = None
+        self.reloading = False
+
+        self.pid = os.getpid()
+        # pid of the serve.py parent that reloads for this worker, None if standalone
+        self.supervisor_pid: int | None = None
+
+        self.current: Recommender | None = None
+        parent = _parent_holder
+        if parent is not None and parent.pid != self.pid:
+            self.supervisor_pid = parent.pid
+            self.current = parent.current
+            self.version = parent.version
+            self.loaded_at = parent.loaded_at
+            self.last_reload_s = parent.last_reload_s
+            return
+        t0 = time.perf_counter()
+        self._swapped(self._factory(), time.perf_counter() - t0)
+
+    def _swapped(self, recommender: Recommender, duration_s: float) -> None:
+        self.current = recommender
+        self.version += 1
+        self.loaded_at = time.time()
+        self.last_reload_s = duration_s
+
+    def reload(self) -> bool:
+        """
+        Builds a new snapshot and swaps it in. Returns False if another
+        reload is already running. On failure the old snapshot stays.
+        """
+        if not self._reload_lock.acquire(blocking=False):
+            return False
+        self.reloading = True
+        try:
+            t0 = time.perf_counter()
+            recommender = self._factory()
+            self._swapped(recommender, time.perf_counter() - t0)
+            self.last_error = None
+            print(f"Recommender reloaded: version {self.version} in {self.last_reload_s:.2f}s")
+        except Exception as e:
+            self.last_error = f"{type(e).__name__}: {e}"
+            print(f"Recommender reload failed, keeping version {self.version}: {e}")
+        finally:
+            self.reloading = False
+            self._reload_lock.release()
+        return True
+
+    def reload_in_background(self) -> bool:
+        """
+        Starts reload() in a daemon thread. Returns False if one is running.
+        In a serve.py worker asks the parent instead, which loads the new
+        snapshot once and replaces all workers.
+        """
+        if self.supervisor_pid is not None:
+            os.kill(self.supervisor_pid, signal.SIGHUP)
+            return True
+        if self.reloading:
+            return False
+        threading.Thread(target=self.reload, name="recommender-reload", daemon=True).start()
+        return True
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "loaded_at": self.loaded_at,
+            "last_reload_s": round(self.last_reload_s, 4),
+            "reloading": self.reloading,
+            "last_error": self.last_error,
+            "watching": self._watcher is not None and self._watcher.is_alive(),
+            "pid": self.pid,
+            "supervisor_pid": self.supervisor_pid,
+            "topk_tables": (
+                self.current.topk_tables.stats()
+                if self.current is not None and self.current.topk_tables is not None
+                else None
+            ),
+            "masks": self.current.masks.stats() if self.current is not None else None,
+        }
+
+    # --- file watcher ---
+
+    def _watched_paths(self) -> List[Path]:
+        store = Path(self.settings.product_embeddings_store_path)
+        return [
+            Path(self.settings.user_purchases_path),
+            Path(self.settings.user_purchases_store_path),
+            Path(self.settings.product_embeddings_path),
+            store / "meta.json",
+            store / "rows.jsonl",
+            *(store / name for name in QUANTIZED_FILES.values()),
+            Path(self.settings.ann_index_path),
+            Path(self.settings.item_neighbours_path),
+            Path(self.settings.user_interests_path),
+            Path(self.settings.topk_tables_path),
+            Path(self.settings.product_blocklist_path),
+        ]
+
+    def _fingerprint(self) -> tuple:
+        result = []
+        for path in self._watched_paths():
+            try:
+                st = path.stat()
+                result.append((st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                result.append(None)
+        return tuple(result)
+
+    def files_changed(self) -> bool:
+        """
+        One poll of the data files: True once a change has stayed the same
+        for one more poll. The first call only records the current state.
+        """
+        current = self._fingerprint()
+        if self._seen is None:
+            self._seen = current
+            return False
+        if current == self._seen:
+            self._pending = None
+            return False
+        if current != self._pending:
+            self._pending = current  # changed, wait until it settles
+            return False
+        self._seen = current
+        self._pending = None
+        return True
+
+    def start_watcher(self, interval_s: float) -> None:
+        """
+        Polls data files every interval_s seconds and reloads when one changes.
+        A change is acted on only once it stays the same for one more poll,
+        so a file that is still being written is not loaded half-way.
+        In a serve.py worker the parent watches instead.
+        """
+        if self._watcher is not None or self.supervisor_pid is not None:
+            return
+
+        def _watch() -> None:
+            self._seen = None
+            self.files_changed()
+            while not self._stop.wait(interval_s):
+                if self.files_changed():
+                    print("Data files changed, reloading recommender...")
+                    self.reload()
+
+        self._stop.clear()
+        self._watcher = threading.Thread(target=_watch, name="recommender-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self) -> None:
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join(timeout=5)
+            self._watcher = None
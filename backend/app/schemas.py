@@ -1,5 +1,5 @@
-from typing import List
-from pydantic import BaseModel
+from typing import Dict, List, Literal
+from pydantic import BaseModel, Field
 
 
 class ProductExplanation(BaseModel):
@@ -18,3 +18,58 @@ class UserRecommendationsResponse(BaseModel):
 
 class UserListResponse(BaseModel):
     users: List[str]
+
+
+class ProductScore(BaseModel):
+    product_id: str
+    description: str
+    score: float
+
+
+class BatchRecommendationsRequest(BaseModel):
+    user_ids: List[str] = Field(..., max_length=10000)
+    top_n: int = Field(default=12, le=1000)
+    # query-time filters: product ids / description terms never returned
+    exclude_ids: List[str] = Field(default_factory=list, max_length=10000)
+    exclude_terms: List[str] = Field(default_factory=list, max_length=50)
+    # MMR lambda (1 = plain top-N); None = Settings.diversity_endpoints default
+    diversity: float | None = Field(default=None, ge=0.0, le=1.0)
+
+
+class BatchRecommendationsResponse(BaseModel):
+    recommendations: Dict[str, List[ProductScore]]
+
+
+class CartAddonsRequest(BaseModel):
+    product_ids: List[str] = Field(..., max_length=500)
+    top_n: int = Field(default=8, le=1000)
+    mode: Literal["mean", "max"] = "mean"
+    exclude_ids: List[str] = Field(default_factory=list, max_length=10000)
+    exclude_terms: List[str] = Field(default_factory=list, max_length=50)
+    diversity: float | None = Field(default=None, ge=0.0, le=1.0)
+
+
+class CartAddonsResponse(BaseModel):
+    addons: List[ProductScore]
+
+
+class UserExclusionsRequest(BaseModel):
+    product_ids: List[str] = Field(..., max_length=10000)
+
+
+class UserExclusionsResponse(BaseModel):
+    user_id: str
+    product_ids: List[str]
+
+
+class PurchaseEvent(BaseModel):
+    user_id: str
+    product_id: str
+    # unix seconds; server time if omitted
+    ts: float | None = None
+
+
+class PurchaseEventResponse(BaseModel):
+    accepted: bool
+    # False if the product has no embedding or the user already bought it
+    profile_updated: bool
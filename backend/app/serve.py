@@ -0,0 +1,255 @@
+# backend/app/serve.py
+#
+# Pre-fork serving mode:
+#
+#   python -m backend.app.serve --workers 4 [--host 0.0.0.0] [--port 8000] [--blas-threads 1]
+#
+# `uvicorn --workers N` imports the app, and so builds a Recommender, in
+# every worker: RSS grows N-fold. Here the parent process loads the snapshot
+# once and forks the workers. Its arrays (user sums, purchase CSR, interest
+# vectors, IVF lists, top-K tables) are shared copy-on-write and the embedding
+# matrix and its quantized codes are np.memmaps over the page cache anyway; a
+# worker only copies the pages it writes (user rows changed by purchase
+# events). Every worker runs its own uvicorn server (event loop, LLM client,
+# explanation cache connection, metrics) on the socket bound by the parent,
+# so N requests are scored on N cores despite the GIL.
+#
+# BLAS threads are capped per worker (OpenBLAS / MKL / OpenMP env variables,
+# default cpu_count // workers) before numpy is imported, so N workers do not
+# run N x cpu_count BLAS threads on cpu_count cores.
+#
+# The parent also follows the purchase event log on its snapshot (without
+# compacting), like a worker does: compaction deletes merged segments, so a
+# worker forked later from a stale snapshot would miss their events.
+#
+# Otherwise the parent only supervises: it restarts workers that exit, and on SIGHUP
+# (sent by POST /api/admin/reload in any worker, or on data file changes with
+# RELOAD_WATCH=true) loads a new snapshot, forks a new set of workers and
+# gracefully stops the old ones. SIGTERM / SIGINT stop everything.
+
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+import traceback
+from typing import Dict
+
+from .config import get_settings
+
+BLAS_THREAD_VARS = (
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+)
+
+# секунд на завершение запросов старым воркером перед SIGKILL
+GRACEFUL_TIMEOUT_S = 30.0
+# период цикла супервизора, секунд
+POLL_S = 0.5
+
+
+def cap_blas_threads(threads: int) -> None:
+    """
+    Caps BLAS / OpenMP thread pools of this process and its children;
+    only takes effect if numpy has not been imported yet.
+    """
+    if "numpy" in sys.modules:
+        print("⚠️ WARNING: numpy is already imported, the BLAS thread cap may not apply")
+    for var in BLAS_THREAD_VARS:
+        os.environ[var] = str(threads)
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(sock: socket.socket, log_level: str) -> None:
+    """
+    Worker process body: serves the app on the inherited socket. The app
+    (backend.app.main) is imported here, after the fork, so clients, caches
+    and metrics are per worker while the snapshot is the parent's.
+    """
+    import uvicorn
+
+    for sig in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, signal.SIG_DFL)
+    config = uvicorn.Config("backend.app.main:app", log_level=log_level)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+class Supervisor:
+    def __init__(
+        self,
+        holder,
+        sock: socket.socket,
+        workers: int,
+        log_level: str = "info",
+        follower=None,
+    ):
+        self.holder = holder
+        self.sock = sock
+        self.workers = workers
+        self.log_level = log_level
+        # EventFollower of the parent's snapshot (polled here), None if events are off
+        self.follower = follower
+        self.settings = get_settings()
+        # worker pid -> snapshot version it serves
+        self.children: Dict[int, int] = {}
+        # old workers being stopped: pid -> SIGKILL deadline
+        self.stopping: Dict[int, float] = {}
+        self._reload_requested = False
+        self._stop_requested = False
+
+    def _spawn(self) -> None:
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                _run_worker(self.sock, self.log_level)
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            finally:
+                os._exit(code)
+        self.children[pid] = self.holder.version
+
+    def _reap(self) -> None:
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            version = self.children.pop(pid, None)
+            expected = self.stopping.pop(pid, None) is not None or self._stop_requested
+            if version is not None and not expected:
+                print(f"⚠️ WARNING: worker {pid} exited with status {status}, restarting")
+
+    def _stop_workers(self, pids, timeout_s: float) -> None:
+        for pid in pids:
+            self.stopping[pid] = time.monotonic() + timeout_s
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def _kill_overdue(self) -> None:
+        now = time.monotonic()
+        for pid, deadline in list(self.stopping.items()):
+            if now >= deadline:
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+
+    def _reload(self) -> None:
+        """
+        New snapshot in the parent (old workers keep serving meanwhile),
+        then a new set of workers forked from it replaces the old one.
+        """
+        version = self.holder.version
+        gc.unfreeze()
+        self.holder.reload()
+        gc.collect()
+        gc.freeze()
+        if self.holder.version == version:
+            return  # failed, the old snapshot stays
+        old = [pid for pid, v in self.children.items() if v != self.holder.version]
+        for _ in range(self.workers):
+            self._spawn()
+        self._stop_workers(old, GRACEFUL_TIMEOUT_S)
+
+    def run(self) -> None:
+        signal.signal(signal.SIGHUP, lambda *_: setattr(self, "_reload_requested", True))
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, lambda *_: setattr(self, "_stop_requested", True))
+
+        # objects of the snapshot are never scanned by the parent's GC again:
+        # collections would write to their headers and un-share the pages
+        gc.collect()
+        gc.freeze()
+
+        watch = self.settings.reload_watch
+        next_check = time.monotonic()
+        print(f"Serving with {self.workers} workers (pid {os.getpid()})")
+        while not self._stop_requested:
+            self._reap()
+            self._kill_overdue()
+            if self.follower is not None:
+                try:
+                    self.follower.poll()
+                except Exception as e:
+                    print(f"⚠️ WARNING: purchase event follower: {type(e).__name__}: {e}")
+            if watch and time.monotonic() >= next_check:
+                next_check = time.monotonic() + self.settings.reload_watch_interval_s
+                if self.holder.files_changed():
+                    print("Data files changed, reloading recommender...")
+                    self._reload_requested = True
+            if self._reload_requested:
+                self._reload_requested = False
+                self._reload()
+            current = sum(v == self.holder.version for v in self.children.values())
+            for _ in range(self.workers - current):
+                self._spawn()
+            time.sleep(POLL_S)
+
+        self._stop_workers(list(self.children), GRACEFUL_TIMEOUT_S)
+        while self.children:
+            self._reap()
+            self._kill_overdue()
+            time.sleep(0.1)
+
+
+def main():
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Pre-fork API server sharing one recommender")
+    parser.add_argument("--host", default=settings.api_host)
+    parser.add_argument("--port", type=int, default=settings.api_port)
+    parser.add_argument("--workers", type=int, default=settings.serve_workers)
+    parser.add_argument("--blas-threads", type=int, default=settings.serve_blas_threads)
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    cpus = os.cpu_count() or 1
+    workers = args.workers or cpus
+    cap_blas_threads(args.blas_threads or max(1, cpus // workers))
+
+    # numpy (and everything that scores) only from here on; the server
+    # libraries are imported before forking too, so their modules are shared
+    import fastapi  # noqa: F401
+    import openai  # noqa: F401
+    import uvicorn  # noqa: F401
+
+    from .events import EventFollower, PurchaseEventLog
+    from .reloader import RecommenderHolder, share_with_workers
+
+    sock = bind_socket(args.host, args.port)
+    holder = RecommenderHolder()
+    share_with_workers(holder)
+    follower = None
+    if settings.purchase_events_enabled:
+        follower = EventFollower(
+            PurchaseEventLog(settings.purchase_events_path),
+            lambda: holder.current,
+            poll_s=POLL_S,
+            compact_interval_s=0,  # workers compact
+            store_path=settings.user_purchases_store_path,
+            json_path=settings.user_purchases_path,
+        )
+    Supervisor(holder, sock, workers, args.log_level, follower).run()
+
+
+if __name__ == "__main__":
+    main()
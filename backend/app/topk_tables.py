@@ -0,0 +1,139 @@
+# backend/app/topk_tables.py
+#
+# Precomputed top-K tables (scripts/build_topk_tables.py):
+#
+#   user_ids        (U,)    str      users, in purchase store order
+#   user_items      (U, K)  int32    recommended embedding rows, best first, -1 = padding
+#   user_scores     (U, K)  float16
+#   user_digests    (U,)    uint64   digest of the profile at build time (change -> stale)
+#   product_ids     (P,)    str      live products at build time
+#   product_rows    (P,)    int32    their embedding rows at build time (change -> stale)
+#   product_items   (P, K)  int32    similar products (embedding rows), -1 = padding
+#   product_scores  (P, K)  float16
+#   built_at, num_rows, config       build time, store rows, ranking settings fingerprint
+#
+# Entries are marked stale in memory when the user's history or the
+# product changes, or when a listed item is deleted/superseded; stale or
+# unknown entries are scored live.
+
+import hashlib
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+import numpy as np
+
+from .masks import read_blocklist
+
+
+def config_fingerprint(settings) -> str:
+    """
+    Settings that change the ranking; a table built with others is not used.
+    The blocklist (setting + file) enters as a hash of its sorted ids.
+    """
+    blocklist = sorted(
+        set(settings.product_blocklist) | set(read_blocklist(settings.product_blocklist_path))
+    )
+    return json.dumps(
+        {
+            "profile_half_life_days": settings.profile_half_life_days,
+            "profile_frequency_exponent": settings.profile_frequency_exponent,
+            "multi_interest_merge": settings.multi_interest_merge,
+            "ann_backend": settings.ann_backend,
+            "ann_nprobe": settings.ann_nprobe,
+            "embedding_quantization": settings.embedding_quantization,
+            "quantization_rerank": settings.quantization_rerank,
+            "blocklist": hashlib.sha1("\n".join(blocklist).encode("utf-8")).hexdigest()[:16],
+        },
+        sort_keys=True,
+    )
+
+
+def profile_digests(indptr: np.ndarray, rows: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """
+    Per user of a CSR profile (embedding rows + float32 weights): a 64-bit
+    digest of its entries, independent of their order. Any change to a
+    bought item or its weight changes it (up to hash collisions).
+    """
+    x = (rows.astype("uint64") << np.uint64(32)) | (
+        np.asarray(weights, dtype="float32").view("uint32").astype("uint64")
+    )
+    # splitmix64 finalizer per entry, then per-user sums (mod 2**64)
+    x ^= x >> np.uint64(30)
+    x *= np.uint64(0xBF58476D1CE4E5B9)
+    x ^= x >> np.uint64(27)
+    x *= np.uint64(0x94D049BB133111EB)
+    x ^= x >> np.uint64(31)
+    totals = np.concatenate([np.zeros(1, dtype="uint64"), np.cumsum(x, dtype="uint64")])
+    return totals[indptr[1:]] - totals[indptr[:-1]]
+
+
+def _lists_dead_rows(items: np.ndarray, dead: np.ndarray) -> np.ndarray:
+    """
+    Per table row: does the list contain a row marked in `dead`?
+    """
+    valid = (items >= 0) & (items < len(dead))
+    hit = np.zeros(items.shape, dtype=bool)
+    hit[valid] = dead[items[valid]]
+    return hit.any(axis=1)
+
+
+class TopKTables:
+    def __init__(self, path: str | Path):
+        data = np.load(path)
+        self.user_ids = data["user_ids"]
+        self.user_items = data["user_items"]
+        self.user_scores = data["user_scores"]
+        # older tables lack digests (and fail the config check)
+        self.user_digests = (
+            data["user_digests"]
+            if "user_digests" in data.files
+            else np.zeros(len(self.user_ids), dtype="uint64")
+        )
+        self.product_ids = data["product_ids"]
+        self.product_rows = data["product_rows"]
+        self.product_items = data["product_items"]
+        self.product_scores = data["product_scores"]
+        self.built_at = float(data["built_at"])
+        self.num_rows = int(data["num_rows"])
+        self.config = str(data["config"])
+
+        self.user_index: Dict[str, int] = {u: i for i, u in enumerate(self.user_ids.tolist())}
+        self.product_index: Dict[str, int] = {
+            p: i for i, p in enumerate(self.product_ids.tolist())
+        }
+        self.user_stale = np.zeros(len(self.user_ids), dtype=bool)
+        self.product_stale = np.zeros(len(self.product_ids), dtype=bool)
+
+    @property
+    def k(self) -> int:
+        return self.user_items.shape[1]
+
+    def expired(self, max_age_s: float) -> bool:
+        return max_age_s > 0 and time.time() - self.built_at > max_age_s
+
+    def mark_dead(self, dead_rows: np.ndarray) -> None:
+        """
+        Lists that contain a deleted / superseded row go stale.
+        """
+        self.user_stale |= _lists_dead_rows(self.user_items, dead_rows)
+        self.product_stale |= _lists_dead_rows(self.product_items, dead_rows)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "k": self.k,
+            "built_at": self.built_at,
+            "users": len(self.user_ids),
+            "users_stale": int(self.user_stale.sum()),
+            "products": len(self.product_ids),
+            "products_stale": int(self.product_stale.sum()),
+        }
+
+    @staticmethod
+    def save(path: str | Path, **arrays: Any) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp.npz")
+        np.savez(tmp, **arrays)
+        tmp.replace(path)
@@ -0,0 +1,158 @@
+# backend/app/user_interests.py
+#
+# Multi-interest user profiles: each user's purchased-item embeddings are
+# clustered into up to K "interest" vectors (scripts/build_user_interests.py).
+# Stored as a fixed-size (num_users, K, dim) tensor:
+#
+#   user_ids     (num_users,)        str
+#   interests    (num_users, K, dim) float32  L2-normalized, biggest interest first
+#   weights      (num_users, K)      float32  share of the user's (weighted) purchases
+#   n_interests  (num_users,)        int8     valid interests per user (rest are zeros)
+
+from pathlib import Path
+from typing import Dict
+
+import numpy as np
+
+
+def batched_interest_kmeans(
+    matrix: np.ndarray,
+    indptr: np.ndarray,
+    items: np.ndarray,
+    weights: np.ndarray,
+    k: int = 4,
+    items_per_interest: int = 5,
+    max_items: int = 256,
+    n_iter: int = 10,
+    batch_rows: int = 16384,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Weighted spherical k-means run for all users at once.
+
+    Users are bucketed by history length (next power of two), each bucket is
+    padded into a (batch, L, dim) tensor, and every Lloyd step is two batched
+    matmuls: (batch, L, dim) @ (batch, dim, K) for assignment and
+    (batch, K, L) @ (batch, L, dim) for the centroid sums. batch * L <=
+    batch_rows bounds the memory. A user gets min(k, n_items // items_per_interest)
+    interests (at least 1); histories are capped at their last max_items items.
+
+    Returns (interests (U, k, dim), weights (U, k), n_interests (U,)).
+    """
+    n_users = len(indptr) - 1
+    dim = matrix.shape[1]
+    start = np.maximum(indptr[:-1], indptr[1:] - max_items)
+    used = (indptr[1:] - start).astype("int64")
+    n_int = np.minimum(k, np.maximum(1, used // items_per_interest))
+    n_int[used == 0] = 0
+
+    interests = np.zeros((n_users, k, dim), dtype="float32")
+    interest_weights = np.zeros((n_users, k), dtype="float32")
+
+    active = np.flatnonzero(used > 0)
+    bucket = np.ceil(np.log2(used[active])).astype("int64")
+    for b in np.unique(bucket):
+        users = active[bucket == b]
+        length = int(used[users].max())
+        per_batch = max(1, batch_rows // length)
+        for s in range(0, len(users), per_batch):
+            batch = users[s : s + per_batch]
+            c, w = _kmeans_batch(
+                matrix, items, weights, start[batch], used[batch], n_int[batch], k, length, n_iter
+            )
+            interests[batch] = c
+            interest_weights[batch] = w
+
+    return interests, interest_weights, n_int.astype("int8")
+
+
+def _kmeans_batch(
+    matrix: np.ndarray,
+    items: np.ndarray,
+    weights: np.ndarray,
+    start: np.ndarray,
+    used: np.ndarray,
+    n_int: np.ndarray,
+    k: int,
+    length: int,
+    n_iter: int,
+) -> tuple[np.ndarray, np.ndarray]:
+    b = len(start)
+    offsets = np.arange(length)
+    valid = offsets[None, :] < used[:, None]  # (b, L)
+    pos = np.where(valid, start[:, None] + offsets[None, :], 0)
+
+    x = np.asarray(matrix[items[pos].ravel()], dtype="float32").reshape(b, length, -1)
+    x[~valid] = 0.0
+    w = np.where(valid, weights[pos], 0.0).astype("float32")  # (b, L)
+
+    # init: items spread evenly over the history (different periods ~ different interests)
+    slots = np.arange(k)
+    interest_valid = slots[None, :] < n_int[:, None]  # (b, k)
+    init = (slots[None, :] * used[:, None]) // np.maximum(n_int[:, None], 1)
+    init = np.where(interest_valid, init, 0)
+    centroids = np.take_along_axis(x, init[:, :, None], axis=1)  # (b, k, dim)
+    centroids[~interest_valid] = 0.0
+
+    rows = np.arange(b)[:, None]
+
+    def weighted_assignment(centroids: np.ndarray) -> np.ndarray:
+        # (b, L, k): each item's weight in the column of its nearest interest
+        sims = x @ centroids.transpose(0, 2, 1)
+        sims[~np.broadcast_to(interest_valid[:, None, :], sims.shape)] = -np.inf
+        onehot = np.zeros((b, length, k), dtype="float32")
+        onehot[rows, offsets[None, :], np.argmax(sims, axis=2)] = w
+        return onehot
+
+    for _ in range(n_iter):
+        sums = weighted_assignment(centroids).transpose(0, 2, 1) @ x  # (b, k, dim)
+        norms = np.linalg.norm(sums, axis=2, keepdims=True)
+        # an interest that lost all its items keeps its previous centroid
+        centroids = np.where(norms > 1e-8, sums / np.maximum(norms, 1e-8), centroids)
+
+    # shares of the final centroids (n_iter=0: of the initial ones)
+    mass = weighted_assignment(centroids).sum(axis=1)  # (b, k)
+    mass = mass / np.maximum(mass.sum(axis=1, keepdims=True), 1e-8)
+
+    # biggest interest first (round-robin merge order)
+    order = np.argsort(-np.where(interest_valid, mass, -1.0), axis=1, kind="stable")
+    centroids = np.take_along_axis(centroids, order[:, :, None], axis=1)
+    mass = np.take_along_axis(mass, order, axis=1)
+    return centroids, mass
+
+
+class UserInterests:
+    """
+    Precomputed interest tensor, loaded fully into memory.
+    """
+
+    def __init__(self, path: str | Path):
+        data = np.load(path)
+        self.user_ids = data["user_ids"]
+        self.interests = np.ascontiguousarray(data["interests"], dtype="float32")
+        self.weights = data["weights"]
+        self.n_interests = data["n_interests"].astype("int64")
+        self.id_to_row: Dict[str, int] = {u: i for i, u in enumerate(self.user_ids.tolist())}
+
+    @property
+    def k(self) -> int:
+        return self.interests.shape[1]
+
+    @staticmethod
+    def save(
+        path: str | Path,
+        user_ids: np.ndarray,
+        interests: np.ndarray,
+        weights: np.ndarray,
+        n_interests: np.ndarray,
+    ) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp.npz")
+        np.savez(
+            tmp,
+            user_ids=np.asarray(user_ids, dtype=str),
+            interests=interests.astype("float32"),
+            weights=weights.astype("float32"),
+            n_interests=n_interests.astype("int8"),
+        )
+        tmp.replace(path)
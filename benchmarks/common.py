@@ -0,0 +1,57 @@
+# benchmarks/common.py
+
+import resource
+import subprocess
+from typing import Dict, Sequence
+
+import numpy as np
+
+
+def summarize(latencies_s: Sequence[float], wall_s: float | None = None) -> Dict[str, float]:
+    """
+    Latency percentiles in milliseconds (+ requests per second if wall_s given).
+    """
+    ms = np.asarray(latencies_s, dtype="float64") * 1000.0
+    if not len(ms):
+        return {"count": 0}
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    result = {
+        "count": int(len(ms)),
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "max_ms": round(float(ms.max()), 3),
+    }
+    if wall_s:
+        result["rps"] = round(len(ms) / wall_s, 1)
+    return result
+
+
+def rss_mb() -> float:
+    """
+    Current resident set size of this process (Linux), peak RSS elsewhere.
+    """
+    try:
+        with open("/proc/self/statm", "r") as f:
+            pages = int(f.read().split()[1])
+        return round(pages * resource.getpagesize() / 2**20, 1)
+    except OSError:
+        return peak_rss_mb()
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
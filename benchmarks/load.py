@@ -0,0 +1,125 @@
+# benchmarks/load.py
+#
+# In-process load test of the FastAPI app: httpx.AsyncClient over an ASGI
+# transport (no sockets, one event loop), LLM calls answered by a stub.
+
+import asyncio
+import time
+from types import SimpleNamespace
+from typing import Dict, List, Tuple
+
+import httpx
+import numpy as np
+
+from .common import rss_mb, summarize
+
+
+class _StubCompletions:
+    """
+    Stands in for AsyncOpenAI.chat.completions: sleeps `delay_s` and
+    returns a fixed explanation, so LLM latency is controlled and free.
+    """
+
+    def __init__(self, delay_s: float):
+        self.delay_s = delay_s
+
+    async def create(self, **kwargs):
+        await asyncio.sleep(self.delay_s)
+        message = SimpleNamespace(content="Stub explanation for benchmarking.")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def install_llm_stub(delay_s: float) -> None:
+    from backend.app import llm_client
+
+    llm_client.async_client = SimpleNamespace(
+        chat=SimpleNamespace(completions=_StubCompletions(delay_s))
+    )
+
+
+async def fire_requests(
+    client: httpx.AsyncClient,
+    urls: List[str],
+    concurrency: int,
+) -> Tuple[List[float], int, float]:
+    """
+    GETs urls with `concurrency` requests in flight;
+    returns (latencies in seconds, errors, wall time).
+    """
+    latencies: List[float] = []
+    errors = 0
+    queue = iter(urls)
+
+    async def worker() -> None:
+        nonlocal errors
+        for url in queue:
+            t = time.perf_counter()
+            response = await client.get(url)
+            latencies.append(time.perf_counter() - t)
+            if response.status_code >= 400:
+                errors += 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - t0
+
+
+def print_result(name: str, r: Dict) -> None:
+    print(
+        f"  {name:28s} {r['rps']:8.1f} rps  p50 {r['p50_ms']:8.2f} ms  "
+        f"p95 {r['p95_ms']:8.2f} ms  p99 {r['p99_ms']:8.2f} ms  errors {r['errors']}"
+    )
+
+
+async def _run_all(app, scenarios: Dict[str, List[str]], concurrency: int) -> Dict[str, Dict]:
+    transport = httpx.ASGITransport(app=app)
+    results = {}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name, urls in scenarios.items():
+            # warm-up outside the measurement
+            for url in urls[: min(10, len(urls))]:
+                await client.get(url)
+            latencies, errors, wall = await fire_requests(client, urls, concurrency)
+            results[name] = {**summarize(latencies, wall), "errors": errors, "rss_mb": rss_mb()}
+            print_result(name, results[name])
+    return results
+
+
+def build_scenarios(
+    user_ids: List[str],
+    requests_per_scenario: int = 1000,
+    top_n: int = 12,
+    seed: int = 0,
+) -> Dict[str, List[str]]:
+    """
+    Request URLs per endpoint, random users / offsets.
+    """
+    rng = np.random.default_rng(seed)
+    users = [user_ids[i] for i in rng.integers(0, len(user_ids), requests_per_scenario)]
+    n = requests_per_scenario
+    return {
+        "recommendations": [
+            f"/api/users/{u}/recommendations?top_n={top_n}&explain=false" for u in users
+        ],
+        "recommendations+llm": [
+            f"/api/users/{u}/recommendations?top_n={top_n}&explain=true" for u in users
+        ],
+        "products/random": ["/api/products/random?top_n=8"] * n,
+        "users": [f"/api/users?limit=50&offset={int(o)}" for o in rng.integers(0, len(user_ids), n)],
+    }
+
+
+def run_load(
+    app,
+    user_ids: List[str],
+    requests_per_scenario: int = 1000,
+    concurrency: int = 32,
+    top_n: int = 12,
+    seed: int = 0,
+) -> Dict[str, Dict]:
+    """
+    Fires requests_per_scenario requests per endpoint with `concurrency`
+    clients in flight and reports latency percentiles, RPS and RSS.
+    """
+    scenarios = build_scenarios(user_ids, requests_per_scenario, top_n, seed)
+    return asyncio.run(_run_all(app, scenarios, concurrency))
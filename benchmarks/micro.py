@@ -0,0 +1,77 @@
+# benchmarks/micro.py
+#
+# Microbenchmarks of Recommender methods, called directly (no HTTP).
+
+import time
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+from backend.app.recommender import Recommender
+
+from .common import summarize
+
+
+def _time_calls(fn: Callable[[Any], Any], args: List[Any], warmup: int = 5) -> Dict[str, float]:
+    for a in args[:warmup]:
+        fn(a)
+    latencies = []
+    t0 = time.perf_counter()
+    for a in args:
+        t = time.perf_counter()
+        fn(a)
+        latencies.append(time.perf_counter() - t)
+    return summarize(latencies, time.perf_counter() - t0)
+
+
+def run_micro(
+    recommender: Recommender,
+    n_calls: int = 500,
+    top_n: int = 12,
+    batch_users: int = 1000,
+    seed: int = 0,
+) -> Dict[str, Dict[str, float]]:
+    """
+    Latency of the hot Recommender methods on random users / products.
+    """
+    rng = np.random.default_rng(seed)
+    users = recommender.get_all_users_with_purchases()
+    products = [recommender.product_ids[r] for r in recommender.id_to_index.values()]
+
+    sample_users = [users[i] for i in rng.integers(0, len(users), n_calls)]
+    sample_products = [products[i] for i in rng.integers(0, len(products), n_calls)]
+    carts = [
+        [products[i] for i in rng.integers(0, len(products), 5)] for _ in range(n_calls)
+    ]
+    batches = [
+        [users[i] for i in rng.integers(0, len(users), batch_users)]
+        for _ in range(max(3, n_calls // 100))
+    ]
+
+    results = {
+        "build_user_embedding": _time_calls(recommender._build_user_embedding, sample_users),
+        "recommend_for_user": _time_calls(
+            lambda u: recommender.recommend_for_user(u, top_n), sample_users
+        ),
+        "recommend_for_user[mmr]": _time_calls(
+            lambda u: recommender.recommend_for_user(u, top_n, diversity=0.7), sample_users
+        ),
+        f"recommend_for_users[{batch_users}]": _time_calls(
+            lambda b: recommender.recommend_for_users(b, top_n), batches, warmup=1
+        ),
+        "similar_products": _time_calls(
+            lambda p: recommender.similar_products(p, top_n=8), sample_products
+        ),
+        "cart_addons[5]": _time_calls(
+            lambda c: recommender.cart_addons(c, top_n=8), carts
+        ),
+        "get_random_product": _time_calls(
+            lambda _: recommender.get_random_product(), sample_products
+        ),
+        "get_bought_descriptions": _time_calls(
+            recommender.get_bought_descriptions, sample_users
+        ),
+    }
+    for name, stats in results.items():
+        print(f"  {name:32s} p50 {stats['p50_ms']:8.3f} ms  p99 {stats['p99_ms']:8.3f} ms")
+    return results
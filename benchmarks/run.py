@@ -0,0 +1,112 @@
+# benchmarks/run.py
+#
+# Latency / throughput benchmark of the recommender and the serving API.
+#
+#   python -m benchmarks.run --items 100000 --users 20000 --concurrency 32
+#
+# Generates (or reuses) a synthetic dataset, runs Recommender microbenchmarks
+# and an in-process load test with a stubbed LLM, prints a summary and saves
+# JSON to benchmarks/results/ so runs can be compared across commits.
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from .common import git_commit, peak_rss_mb, rss_mb
+from .synthetic import generate, settings_env
+
+RESULTS_DIR = Path("benchmarks/results")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recommender / API benchmark suite")
+    parser.add_argument("--items", type=int, default=10_000)
+    parser.add_argument("--users", type=int, default=5_000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--mean-history", type=int, default=20)
+    parser.add_argument(
+        "--data-dir",
+        type=Path,
+        default=None,
+        help="synthetic data location (default: /tmp/rec_bench/<items>x<dim>); reused if present",
+    )
+    parser.add_argument("--micro-calls", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=1000, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--llm-delay-ms", type=float, default=50.0)
+    parser.add_argument("--ann-backend", choices=["exact", "ivf"], default="exact")
+    parser.add_argument("--skip-load", action="store_true")
+    parser.add_argument("--output", type=Path, default=None)
+    args = parser.parse_args()
+
+    data_dir = args.data_dir or Path(f"/tmp/rec_bench/{args.items}x{args.dim}-{args.users}u")
+    if not (data_dir / "user_purchases.npz").exists():
+        generate(data_dir, args.items, args.users, args.dim, args.mean_history)
+
+    # Settings are read once at import: point them at the synthetic data first
+    os.environ.update(settings_env(data_dir, args.ann_backend))
+    os.environ.setdefault("API_KEY", "benchmark")
+
+    rss_before = rss_mb()
+    t0 = time.perf_counter()
+    from backend.app.main import app, holder
+
+    load_s = time.perf_counter() - t0
+    recommender = holder.current
+    print(f"Recommender loaded in {load_s:.2f}s, RSS {rss_mb()} MB")
+
+    from .micro import run_micro
+
+    print("Microbenchmarks:")
+    micro = run_micro(recommender, n_calls=args.micro_calls)
+
+    load = None
+    if not args.skip_load:
+        from .load import install_llm_stub, run_load
+
+        install_llm_stub(args.llm_delay_ms / 1000.0)
+        print(f"Load test ({args.concurrency} concurrent clients):")
+        load = run_load(
+            app,
+            recommender.get_all_users_with_purchases(),
+            requests_per_scenario=args.requests,
+            concurrency=args.concurrency,
+        )
+
+    result = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version.split()[0],
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "config": {k: str(v) if isinstance(v, Path) else v for k, v in vars(args).items()},
+        "load_recommender_s": round(load_s, 3),
+        "memory_mb": {
+            "rss_before_load": rss_before,
+            "rss_after_load": rss_mb(),
+            "peak_rss": peak_rss_mb(),
+        },
+        "micro": micro,
+        "load": load,
+    }
+
+    output = args.output or RESULTS_DIR / (
+        f"{time.strftime('%Y%m%d-%H%M%S')}-{result['meta']['commit'] or 'nogit'}"
+        f"-{args.items}x{args.dim}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, indent=2) + "\n", encoding="utf-8")
+    print(f"Results saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
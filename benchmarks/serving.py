@@ -0,0 +1,210 @@
+# benchmarks/serving.py
+#
+# Throughput / memory of the serving modes over real sockets:
+#
+#   python -m benchmarks.serving --items 100000 --users 20000 --workers 4
+#
+# starts, one after another on the same synthetic data:
+#   uvicorn               one process (baseline)
+#   uvicorn --workers N   a Recommender per worker
+#   serve --workers N     python -m backend.app.serve: one Recommender in the
+#                         parent shared with forked workers, BLAS threads capped
+# and load-tests each with several client processes (the client is Python
+# too and would otherwise be the bottleneck). Reports RPS / latency per
+# endpoint and RSS / PSS summed over the server's process tree (PSS counts
+# shared pages once). Saves JSON to benchmarks/results/.
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import httpx
+import numpy as np
+
+from .common import git_commit, summarize
+from .load import build_scenarios, fire_requests, print_result
+from .synthetic import generate, settings_env
+
+RESULTS_DIR = Path("benchmarks/results")
+PORT = 8791
+# сколько ждать старта сервера, секунд
+STARTUP_TIMEOUT_S = 600.0
+
+
+def _process_tree(pid: int) -> List[int]:
+    pids = [pid]
+    for p in pids:
+        try:
+            with open(f"/proc/{p}/task/{p}/children") as f:
+                pids.extend(int(c) for c in f.read().split())
+        except OSError:
+            pass
+    return pids
+
+
+def tree_memory_mb(pid: int) -> Dict[str, float]:
+    """
+    RSS and PSS (Linux smaps_rollup) summed over pid and its descendants.
+    """
+    totals = {"rss_mb": 0.0, "pss_mb": 0.0}
+    for p in _process_tree(pid):
+        try:
+            with open(f"/proc/{p}/smaps_rollup") as f:
+                for line in f:
+                    key, value = line.split()[:2]
+                    if key in ("Rss:", "Pss:"):
+                        totals[key.lower()[:-1] + "_mb"] += int(value) / 1024
+        except OSError:
+            pass
+    return {k: round(v, 1) for k, v in totals.items()}
+
+
+def _wait_ready(base_url: str, workers: int, proc: subprocess.Popen) -> float:
+    """
+    Waits until `workers` distinct worker pids answered (fresh connections).
+    """
+    t0 = time.perf_counter()
+    seen = set()
+    while time.perf_counter() - t0 < STARTUP_TIMEOUT_S:
+        if proc.poll() is not None:
+            raise RuntimeError(f"server exited with code {proc.returncode}")
+        try:
+            with httpx.Client(base_url=base_url, timeout=5.0) as client:
+                seen.add(client.get("/api/admin/status").json()["pid"])
+        except httpx.HTTPError:
+            time.sleep(0.5)
+            continue
+        if len(seen) >= workers:
+            return time.perf_counter() - t0
+    raise RuntimeError("server did not start in time")
+
+
+def _client_process(args) -> tuple:
+    base_url, urls, concurrency = args
+
+    async def run():
+        limits = httpx.Limits(max_connections=concurrency)
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60.0) as client:
+            return await fire_requests(client, urls, concurrency)
+
+    return asyncio.run(run())
+
+
+def _load(base_url: str, scenarios: Dict[str, List[str]], clients: int, concurrency: int) -> Dict:
+    results = {}
+    with multiprocessing.get_context("spawn").Pool(clients) as pool:
+        for name, urls in scenarios.items():
+            pool.map(_client_process, [(base_url, urls[:20], 1)] * clients)  # warm-up
+            shards = [
+                (base_url, urls[i::clients], max(1, concurrency // clients))
+                for i in range(clients)
+            ]
+            t0 = time.perf_counter()
+            parts = pool.map(_client_process, shards)
+            wall = time.perf_counter() - t0
+            latencies = [lat for part in parts for lat in part[0]]
+            results[name] = {**summarize(latencies, wall), "errors": sum(p[1] for p in parts)}
+            print_result(name, results[name])
+    return results
+
+
+def run_mode(name: str, cmd: List[str], workers: int, env: Dict[str, str], args) -> Dict:
+    base_url = f"http://127.0.0.1:{PORT}"
+    print(f"{name}: {' '.join(cmd)}")
+    proc = subprocess.Popen(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        startup_s = _wait_ready(base_url, workers, proc)
+        memory_idle = tree_memory_mb(proc.pid)
+        with httpx.Client(base_url=base_url) as client:
+            user_ids = client.get("/api/users", params={"limit": 10**9}).json()["users"]
+        scenarios = build_scenarios(user_ids, args.requests)
+        scenarios = {k: scenarios[k] for k in ("recommendations", "products/random")}
+        load = _load(base_url, scenarios, args.clients, args.concurrency)
+        memory = tree_memory_mb(proc.pid)
+        print(
+            f"  memory: RSS {memory['rss_mb']:.0f} MB, PSS {memory['pss_mb']:.0f} MB "
+            f"(idle PSS {memory_idle['pss_mb']:.0f} MB), started in {startup_s:.1f}s"
+        )
+        return {
+            "cmd": " ".join(cmd[1:]),
+            "workers": workers,
+            "startup_s": round(startup_s, 2),
+            "memory_idle": memory_idle,
+            "memory_after_load": memory,
+            "load": load,
+        }
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Single-process vs multi-process serving")
+    parser.add_argument("--items", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=20_000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--mean-history", type=int, default=20)
+    parser.add_argument("--data-dir", type=Path, default=None)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--requests", type=int, default=2000, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--clients", type=int, default=2, help="load generator processes")
+    parser.add_argument("--output", type=Path, default=None)
+    args = parser.parse_args()
+
+    data_dir = args.data_dir or Path(f"/tmp/rec_bench/{args.items}x{args.dim}-{args.users}u")
+    if not (data_dir / "user_purchases.npz").exists():
+        generate(data_dir, args.items, args.users, args.dim, args.mean_history)
+
+    env = {**os.environ, **settings_env(data_dir)}
+    env.setdefault("API_KEY", "benchmark")
+    # the benchmark writes no purchase events, skip the follower threads
+    env["PURCHASE_EVENTS_ENABLED"] = "false"
+    port = ["--port", str(PORT), "--log-level", "warning"]
+    uvicorn = [sys.executable, "-m", "uvicorn", "backend.app.main:app", *port]
+    n = args.workers
+    modes = {
+        "uvicorn": (uvicorn, 1),
+        f"uvicorn --workers {n}": ([*uvicorn, "--workers", str(n)], n),
+        f"serve --workers {n}": (
+            [sys.executable, "-m", "backend.app.serve", "--workers", str(n), *port],
+            n,
+        ),
+    }
+    results = {name: run_mode(name, cmd, w, env, args) for name, (cmd, w) in modes.items()}
+
+    result = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version.split()[0],
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "config": {k: str(v) if isinstance(v, Path) else v for k, v in vars(args).items()},
+        "modes": results,
+    }
+    output = args.output or RESULTS_DIR / (
+        f"{time.strftime('%Y%m%d-%H%M%S')}-{result['meta']['commit'] or 'nogit'}"
+        f"-serving-{args.items}x{args.dim}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, indent=2) + "\n", encoding="utf-8")
+    print(f"Results saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
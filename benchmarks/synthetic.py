@@ -0,0 +1,115 @@
+# benchmarks/synthetic.py
+#
+# Synthetic catalog + purchase histories in the same on-disk formats the
+# server reads (binary embedding store, user_purchases.npz), at any scale.
+
+import time
+from pathlib import Path
+from typing import Dict
+
+import numpy as np
+
+from backend.app.embedding_store import EmbeddingStoreWriter
+from backend.app.purchase_store import PurchaseHistories
+
+# rows written to the store per append (bounds peak memory at 1M items)
+CHUNK_SIZE = 65536
+
+
+def generate(
+    out_dir: str | Path,
+    n_items: int = 10_000,
+    n_users: int = 5_000,
+    dim: int = 256,
+    mean_history: int = 20,
+    seed: int = 0,
+) -> Dict[str, str]:
+    """
+    Writes <out_dir>/product_embeddings (store) and <out_dir>/user_purchases.npz.
+
+    Items are clustered (a few thousand random centres + noise) so nearest
+    neighbours are meaningful; item popularity is Zipf-like and every user
+    buys mostly inside a handful of clusters, like real baskets.
+    Returns the paths as strings.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    store_path = out_dir / "product_embeddings"
+    purchases_path = out_dir / "user_purchases.npz"
+    rng = np.random.default_rng(seed)
+    t0 = time.perf_counter()
+
+    n_clusters = max(1, int(np.sqrt(n_items)))
+    centres = rng.standard_normal((n_clusters, dim)).astype("float32")
+    cluster_of = rng.integers(0, n_clusters, n_items)
+
+    product_ids = np.array([f"P{i:07d}" for i in range(n_items)])
+    with EmbeddingStoreWriter(store_path, dim=dim, model="synthetic") as writer:
+        for start in range(0, n_items, CHUNK_SIZE):
+            stop = min(start + CHUNK_SIZE, n_items)
+            clusters = cluster_of[start:stop]
+            vectors = centres[clusters] + 0.5 * rng.standard_normal(
+                (stop - start, dim)
+            ).astype("float32")
+            descriptions = [
+                f"SYNTHETIC PRODUCT {i} GROUP {c}" for i, c in zip(range(start, stop), clusters)
+            ]
+            writer.append(list(product_ids[start:stop]), descriptions, vectors)
+
+    # Zipf-like popularity, sampled per cluster so users stay "on topic"
+    popularity = 1.0 / np.arange(1, n_items + 1) ** 0.8
+    popularity = popularity[rng.permutation(n_items)]
+    order = np.argsort(cluster_of, kind="stable")
+    cluster_start = np.zeros(n_clusters + 1, dtype="int64")
+    cluster_start[1:] = np.cumsum(np.bincount(cluster_of, minlength=n_clusters))
+    cluster_weight = np.bincount(cluster_of, weights=popularity, minlength=n_clusters)
+    cluster_weight /= cluster_weight.sum()
+
+    lengths = np.maximum(1, rng.geometric(1.0 / mean_history, n_users))
+    histories = []
+    for length in lengths:
+        interests = rng.choice(n_clusters, size=min(3, n_clusters), replace=False, p=cluster_weight)
+        picks = []
+        for c in rng.choice(interests, size=length):
+            members = order[cluster_start[c] : cluster_start[c + 1]]
+            if len(members):
+                p = popularity[members] / popularity[members].sum()
+                picks.append(int(members[rng.choice(len(members), p=p)]))
+        # histories hold unique items, in purchase order
+        histories.append(list(dict.fromkeys(picks)))
+
+    indptr = np.zeros(n_users + 1, dtype="int64")
+    indptr[1:] = np.cumsum([len(h) for h in histories])
+    PurchaseHistories(
+        np.array([f"U{u:07d}" for u in range(n_users)]),
+        indptr,
+        np.array([i for h in histories for i in h], dtype="int32"),
+        product_ids,
+    ).save(purchases_path)
+
+    print(
+        f"Synthetic data: {n_items} items x {dim}d, {n_users} users "
+        f"({int(lengths.sum())} purchases) in {out_dir} ({time.perf_counter() - t0:.1f}s)"
+    )
+    return {"store_path": str(store_path), "user_purchases_path": str(purchases_path)}
+
+
+def settings_env(data_dir: str | Path, ann_backend: str = "exact") -> Dict[str, str]:
+    """
+    Environment that points Settings at a generated dataset (no LLM cache,
+    no file watching, no co-purchase data).
+    """
+    data_dir = Path(data_dir)
+    return {
+        "USER_PURCHASES_STORE_PATH": str(data_dir / "user_purchases.npz"),
+        "USER_PURCHASES_PATH": str(data_dir / "missing.json"),
+        "PRODUCT_EMBEDDINGS_STORE_PATH": str(data_dir / "product_embeddings"),
+        "PRODUCT_EMBEDDINGS_PATH": str(data_dir / "missing.json"),
+        "ITEM_NEIGHBOURS_PATH": str(data_dir / "missing.npz"),
+        "ANN_BACKEND": ann_backend,
+        "ANN_INDEX_PATH": str(data_dir / "ann_ivf.npz"),
+        "TOPK_TABLES_PATH": str(data_dir / "topk_tables.npz"),
+        "PURCHASE_EVENTS_PATH": str(data_dir / "purchase_events"),
+        "EXPLANATION_CACHE_ENABLED": "false",
+        "RELOAD_WATCH": "false",
+    }
@@ -11,6 +11,10 @@ let isLoadingUsers = false;
 let hasMoreUsers = true;
 let currentUserId = null;
 let currentView = "home";
+let explanationStream = null;
+
+const NO_EXPLANATION_TEXT = "No explanation from the model.";
+const PENDING_EXPLANATION_TEXT = "Generating explanation…";
 
 document.addEventListener("DOMContentLoaded", () => {
   setupUserDropdown();
@@ -243,14 +247,16 @@ async function selectUser(userId) {
 async function loadRecommendationsForUser(userId) {
   setStatus(`Loading recommendations for customer ${userId}…`);
   try {
+    // recommendations come back immediately, explanations are streamed after
     const url = `${API_BASE_URL}/api/users/${encodeURIComponent(
       userId
-    )}/recommendations?top_n=12`;
+    )}/recommendations?top_n=12&explain=false`;
     const resp = await fetch(url);
     if (!resp.ok) throw new Error(`Recommendations HTTP ${resp.status}`);
     const data = await resp.json();
     renderRecommendations(data);
     setStatus("");
+    streamExplanations(userId);
   } catch (err) {
     console.error(err);
     setStatus(
@@ -260,6 +266,56 @@ async function loadRecommendationsForUser(userId) {
   }
 }
 
+/* --- LLM explanations (Server-Sent Events) --- */
+
+function streamExplanations(userId) {
+  if (explanationStream) {
+    explanationStream.close();
+    explanationStream = null;
+  }
+
+  const url = `${API_BASE_URL}/api/users/${encodeURIComponent(
+    userId
+  )}/explanations/stream?top_n=12`;
+  const stream = new EventSource(url);
+  explanationStream = stream;
+
+  const finish = () => {
+    stream.close();
+    if (explanationStream === stream) explanationStream = null;
+    // whatever did not arrive (timeouts, errors) gets the fallback text
+    document
+      .querySelectorAll('.tooltip-text[data-pending="true"]')
+      .forEach((el) => setExplanation(el, ""));
+  };
+
+  stream.addEventListener("explanation", (e) => {
+    if (userId !== currentUserId) return;
+    const data = JSON.parse(e.data);
+    document
+      .querySelectorAll(
+        `.tooltip-text[data-product-id="${CSS.escape(data.product_id)}"]`
+      )
+      .forEach((el) => setExplanation(el, data.explanation));
+  });
+  stream.addEventListener("done", finish);
+  stream.onerror = finish;
+}
+
+function setExplanation(el, text) {
+  el.textContent = text || NO_EXPLANATION_TEXT;
+  el.dataset.pending = "false";
+}
+
+function explanationAttrs(item) {
+  const pending = !item.explanation;
+  return `data-product-id="${escapeHtml(item.product_id)}" data-pending="${pending}"`;
+}
+
+function explanationText(item) {
+  return escapeHtml(item.explanation || PENDING_EXPLANATION_TEXT);
+}
+
 function renderRecommendations(data) {
   const boughtDescriptions = data.bought_descriptions || [];
   const recs = data.recommendations || [];
@@ -319,9 +375,7 @@ function renderProductGrid(containerId, items, badgeLabel) {
     card.className = "product-card";
 
     const title = escapeHtml(item.description || item.product_id);
-    const explanation = escapeHtml(
-      item.explanation || "No explanation from the model."
-    );
+    const explanation = explanationText(item);
     const score =
       typeof item.score === "number" ? item.score.toFixed(3) : "";
 
@@ -338,7 +392,7 @@ function renderProductGrid(containerId, items, badgeLabel) {
         <div class="tooltip">
           <span>Why recommended?</span>
           <span class="tooltip-icon">?</span>
-          <span class="tooltip-text">${explanation}</span>
+          <span class="tooltip-text" ${explanationAttrs(item)}>${explanation}</span>
         </div>
       </div>
     `;
@@ -382,16 +436,14 @@ function renderCart(boughtDescriptions, cartRecs) {
         const div = document.createElement("div");
         div.className = "rec-card";
         const title = escapeHtml(item.description || item.product_id);
-        const explanation = escapeHtml(
-          item.explanation || "No explanation from the model."
-        );
+        const explanation = explanationText(item);
         div.innerHTML = `
           <h4>${title}</h4>
           <p>Product ID: ${escapeHtml(item.product_id)}</p>
           <div class="tooltip" style="margin-top:0.4rem;">
             <span>Why recommended?</span>
             <span class="tooltip-icon">?</span>
-            <span class="tooltip-text">${explanation}</span>
+            <span class="tooltip-text" ${explanationAttrs(item)}>${explanation}</span>
           </div>
         `;
         recsContainer.appendChild(div);
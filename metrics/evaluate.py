@@ -0,0 +1,388 @@
+# metrics/evaluate.py
+#
+# Offline evaluation of the embedding recommender over the full user set.
+#
+#   python -m metrics.evaluate --k 5 10 20 --split last --workers 4 --output eval.json
+#
+# - train/test splits are index arrays (CSR over embedding rows),
+# - users are scored in GEMM blocks (optionally across a process pool),
+# - Recall / NDCG / MAP / HitRate / coverage at every K in one pass,
+# - --retrieval ivf evaluates the approximate index (built over the live rows)
+#   and its recall vs exact,
+# - --quantization float16|int8 scores a compressed matrix (re-ranked in float32,
+#   --rerank) and reports measured RSS and recall vs exact float32,
+# - --interests K --merge max|round_robin evaluates multi-interest profiles
+#   (clustered from the train split only).
+
+import argparse
+import json
+import multiprocessing as mp
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+from scipy import sparse
+
+from backend.app.ann_index import ExactIndex, IVFIndex, QuantizedMatrix, merge_candidates
+from backend.app.embedding_store import EmbeddingStore
+from backend.app.purchase_store import load_histories
+from backend.app.user_interests import batched_interest_kmeans
+from benchmarks.common import peak_rss_mb, rss_mb
+
+DATA_DIR = Path("backend/data")
+
+# state shared with forked workers (copy-on-write, never pickled)
+_STATE: Dict[str, object] = {}
+
+
+def load_embeddings(store_path: Path, json_path: Path) -> tuple[np.ndarray, Dict[str, int]]:
+    """
+    (L2-normalized matrix of live products, product_id -> row).
+    """
+    if EmbeddingStore.exists(store_path):
+        store = EmbeddingStore(store_path)
+    else:
+        store = EmbeddingStore.from_json(json_path)
+    live = store.live_rows()
+    rows = np.array(list(live.values()), dtype="int64")
+    matrix = np.asarray(store.matrix[rows], dtype="float32")
+    return matrix, {pid: i for i, pid in enumerate(live.keys())}
+
+
+def split_users(
+    indptr: np.ndarray,
+    items: np.ndarray,
+    n_items: int,
+    split: str = "last",
+    test_fraction: float = 0.2,
+    seed: int = 0,
+    weights: np.ndarray | None = None,
+) -> tuple[sparse.csr_matrix, sparse.csr_matrix]:
+    """
+    Train/test CSR matrices (users x items) for users with >= 2 items,
+    from histories as CSR arrays (indptr, items in purchase order).
+
+    split="last":   the last purchased item is the test item (as in the old metrics script),
+    split="random": a random test_fraction of each history (at least one item).
+    weights (aligned with items) become the train values, i.e. profile weights.
+    """
+    rng = np.random.default_rng(seed)
+    lengths = np.diff(indptr)
+    users = np.flatnonzero(lengths >= 2)
+
+    owner_all = np.repeat(np.arange(len(lengths)), lengths)
+    flat = items[lengths[owner_all] >= 2]
+    if weights is None:
+        weights = np.ones(len(items), dtype="float32")
+    flat_weights = weights[lengths[owner_all] >= 2]
+    lens = lengths[users]
+    owner = np.repeat(np.arange(len(users)), lens)
+    pos = np.arange(len(flat)) - np.repeat(np.cumsum(lens) - lens, lens)
+
+    if split == "last":
+        is_test = pos == np.repeat(lens - 1, lens)
+    elif split == "random":
+        n_test = np.maximum(1, np.round(lens * test_fraction)).astype("int64")
+        n_test = np.minimum(n_test, lens - 1)
+        # random rank inside each user's history: sort by (owner, random key)
+        order = np.lexsort((rng.random(len(flat)), owner))
+        rank = np.empty(len(flat), dtype="int64")
+        rank[order] = pos
+        is_test = rank < np.repeat(n_test, lens)
+    else:
+        raise ValueError(f"unknown split {split!r}")
+
+    def _csr(mask: np.ndarray, values: np.ndarray) -> sparse.csr_matrix:
+        return sparse.csr_matrix(
+            (values[mask], (owner[mask], flat[mask])), shape=(len(users), n_items)
+        )
+
+    test = _csr(is_test, np.ones(len(flat), dtype="float32"))
+    test.data[:] = 1.0  # relevance is binary
+    return _csr(~is_test, flat_weights), test
+
+
+def _evaluate_block(start: int, stop: int) -> Dict[str, np.ndarray]:
+    """
+    Metric sums for users [start, stop): one GEMM (or IVF probe) per block.
+    """
+    matrix = _STATE["matrix"]
+    train = _STATE["train"]
+    test = _STATE["test"]
+    ks: List[int] = _STATE["ks"]
+    index = _STATE["index"]
+    exact = _STATE["exact"]
+    max_k = max(ks)
+
+    train_b = train[start:stop]
+    test_b = test[start:stop]
+    n = stop - start
+
+    user_vecs = np.asarray(train_b @ matrix, dtype="float32")
+    user_vecs /= np.clip(np.linalg.norm(user_vecs, axis=1, keepdims=True), 1e-8, None)
+
+    exclude = np.split(train_b.indices, train_b.indptr[1:-1])
+    top_idx, _ = index.search(user_vecs, max_k, exclude=exclude)
+    if _STATE.get("interests") is not None:
+        top_idx = _multi_interest_search(start, stop, index, exclude, top_idx, max_k)
+
+    # relevance of every recommended slot: (n, max_k) 0/1
+    safe_idx = np.where(top_idx >= 0, top_idx, 0)
+    rel = np.asarray(test_b[np.arange(n)[:, None], safe_idx].todense(), dtype="float32")
+    rel[top_idx < 0] = 0.0
+
+    n_test = np.diff(test_b.indptr).astype("float32")
+    discounts = 1.0 / np.log2(np.arange(2, max_k + 2))
+    cum_hits = np.cumsum(rel, axis=1)
+    precision_at = cum_hits / np.arange(1, max_k + 1)
+
+    out: Dict[str, np.ndarray] = {"users": np.array(n, dtype="float64")}
+    for k in ks:
+        hits = cum_hits[:, k - 1]
+        dcg = (rel[:, :k] * discounts[:k]).sum(axis=1)
+        ideal = np.cumsum(discounts[:k])[np.minimum(n_test, k).astype("int64") - 1]
+        ap = (precision_at[:, :k] * rel[:, :k]).sum(axis=1) / np.minimum(n_test, k)
+
+        out[f"recall@{k}"] = (hits / n_test).sum()
+        out[f"hit_rate@{k}"] = (hits > 0).sum().astype("float64")
+        out[f"ndcg@{k}"] = (dcg / ideal).sum()
+        out[f"map@{k}"] = ap.sum()
+
+        covered = np.zeros(len(matrix), dtype=bool)
+        covered[top_idx[:, :k][top_idx[:, :k] >= 0]] = True
+        out[f"covered@{k}"] = covered
+
+    if exact is not None:
+        # approximate index / quantized scores: overlap of top-K with exact float32 top-K
+        true_idx, _ = exact.search(user_vecs, max_k, exclude=exclude)
+        for k in ks:
+            overlap = sum(
+                len(np.intersect1d(a[a >= 0], t[t >= 0]))
+                for a, t in zip(top_idx[:, :k], true_idx[:, :k])
+            )
+            out[f"ann_recall@{k}"] = np.array(overlap / k, dtype="float64")
+
+    return out
+
+
+def _multi_interest_search(
+    start: int,
+    stop: int,
+    index,
+    exclude: List[np.ndarray],
+    top_idx: np.ndarray,
+    k: int,
+) -> np.ndarray:
+    """
+    Replaces the lists of users with 2+ interests by merged per-interest
+    lists, as Recommender._search_users does.
+    """
+    interests, n_int_all, merge = _STATE["interests"], _STATE["n_interests"], _STATE["merge"]
+    n_int = n_int_all[start:stop].astype("int64")
+    sel = np.flatnonzero(n_int >= 2)
+    if not len(sel):
+        return top_idx
+
+    n_int = n_int[sel]
+    owner = np.repeat(np.arange(len(sel)), n_int)
+    rank = np.arange(len(owner)) - np.repeat(np.cumsum(n_int) - n_int, n_int)
+    queries = interests[start + sel[owner], rank]
+    idx, scores = index.search(queries, k, exclude=[exclude[sel[o]] for o in owner])
+
+    if merge == "max":
+        priority = -scores
+    else:
+        priority = (np.arange(idx.shape[1])[None, :] * interests.shape[1] + rank[:, None]).astype(
+            "float32"
+        )
+    merged, _ = merge_candidates(
+        np.repeat(owner, idx.shape[1]), idx.ravel(), scores.ravel(), priority.ravel(), len(sel), k
+    )
+    top_idx = top_idx.copy()
+    top_idx[sel] = merged
+    return top_idx
+
+
+def evaluate(
+    ks: List[int],
+    split: str = "last",
+    test_fraction: float = 0.2,
+    seed: int = 0,
+    half_life_days: float = 0.0,
+    frequency_exponent: float = 0.0,
+    max_users: int | None = None,
+    interests: int = 0,
+    merge: str = "max",
+    batch_size: int = 512,
+    workers: int = 1,
+    retrieval: str = "exact",
+    nprobe: int = 8,
+    quantization: str = "none",
+    rerank: int = 4,
+    store_path: Path = DATA_DIR / "product_embeddings",
+    json_path: Path = DATA_DIR / "product_embeddings.json",
+    purchases_path: Path = DATA_DIR / "user_purchases.npz",
+    purchases_json_path: Path = DATA_DIR / "user_purchases.json",
+) -> Dict[str, object]:
+    t0 = time.perf_counter()
+    matrix, id_to_index = load_embeddings(store_path, json_path)
+    histories = load_histories(purchases_path, purchases_json_path)
+    indptr, items, weights = histories.to_rows(
+        id_to_index, histories.weights(half_life_days, frequency_exponent)
+    )
+    train, test = split_users(indptr, items, len(matrix), split, test_fraction, seed, weights)
+    if max_users is not None:
+        train, test = train[:max_users], test[:max_users]
+    load_s = time.perf_counter() - t0
+
+    quantized = None
+    if quantization != "none":
+        # the matrix holds live rows only, so codes are built here, not read from the store
+        quantized = QuantizedMatrix.from_matrix(matrix, quantization)
+
+    exact = ExactIndex(matrix)
+    if retrieval == "ivf":
+        # built over this matrix: a saved index lists store rows, and the
+        # matrix here has live rows only
+        index = IVFIndex.build(matrix, nprobe=nprobe)
+        index.quantized, index.rerank = quantized, rerank
+    elif quantized is not None:
+        index = ExactIndex(matrix, quantized=quantized, rerank=rerank)
+    else:
+        index, exact = exact, None
+
+    _STATE.update(
+        matrix=matrix, train=train, test=test, ks=sorted(ks), index=index, exact=exact,
+        interests=None,
+    )
+    if interests > 0:
+        # clustered from train purchases only, no test leakage
+        user_interests, _, n_interests = batched_interest_kmeans(
+            matrix, train.indptr, train.indices, train.data, k=interests
+        )
+        _STATE.update(interests=user_interests, n_interests=n_interests, merge=merge)
+
+    n_users = train.shape[0]
+    blocks = [(s, min(s + batch_size, n_users)) for s in range(0, n_users, batch_size)]
+
+    rss_load = rss_mb()
+    t1 = time.perf_counter()
+    if workers > 1:
+        # fork: workers inherit _STATE without pickling the matrices
+        with mp.get_context("fork").Pool(workers) as pool:
+            parts = pool.starmap(_evaluate_block, blocks)
+    else:
+        parts = [_evaluate_block(s, e) for s, e in blocks]
+    eval_s = time.perf_counter() - t1
+
+    totals: Dict[str, np.ndarray] = {}
+    for part in parts:
+        for key, value in part.items():
+            if key.startswith("covered@"):
+                totals[key] = totals[key] | value if key in totals else value
+            else:
+                totals[key] = totals.get(key, 0.0) + value
+
+    users = float(totals.get("users", 0.0)) or 1.0
+    metrics: Dict[str, float] = {}
+    for key, value in totals.items():
+        if key == "users":
+            continue
+        if key.startswith("covered@"):
+            metrics["coverage@" + key.split("@")[1]] = float(value.sum()) / len(matrix)
+        else:
+            metrics[key] = float(value) / users
+
+    return {
+        "config": {
+            "ks": sorted(ks),
+            "split": split,
+            "test_fraction": test_fraction if split == "random" else None,
+            "seed": seed,
+            "half_life_days": half_life_days,
+            "frequency_exponent": frequency_exponent,
+            "interests": interests,
+            "merge": merge if interests > 0 else None,
+            "retrieval": retrieval,
+            "nprobe": nprobe if retrieval == "ivf" else None,
+            "quantization": quantization,
+            "rerank": rerank if quantization != "none" else None,
+            "batch_size": batch_size,
+            "workers": workers,
+        },
+        "users_evaluated": int(totals.get("users", 0)),
+        "num_items": len(matrix),
+        # the float32 matrix is still needed for profiles and re-rank, so the
+        # quantized codes add to it: measured RSS of this process (not pool workers)
+        "memory_mb": {
+            "float32_matrix": round(matrix.nbytes / 2**20, 2),
+            "quantized_codes": round(quantized.nbytes / 2**20, 2) if quantized is not None else None,
+            "rss_after_load": rss_load,
+            "rss_after_evaluate": rss_mb(),
+            "peak_rss": peak_rss_mb(),
+        },
+        "metrics": dict(
+            sorted(metrics.items(), key=lambda kv: (kv[0].split("@")[0], int(kv[0].split("@")[1])))
+        ),
+        "timing_s": {"load": round(load_s, 3), "evaluate": round(eval_s, 3)},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline evaluation of the recommender")
+    parser.add_argument("--k", type=int, nargs="+", default=[5, 10, 20])
+    parser.add_argument("--split", choices=["last", "random"], default="last")
+    parser.add_argument("--test-fraction", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--half-life-days", type=float, default=0.0, help="profile time decay, 0 = off"
+    )
+    parser.add_argument(
+        "--frequency-exponent", type=float, default=0.0, help="profile count weight, 0 = off"
+    )
+    parser.add_argument("--max-users", type=int, default=None)
+    parser.add_argument(
+        "--interests", type=int, default=0, help="multi-interest profiles with up to K vectors"
+    )
+    parser.add_argument("--merge", choices=["max", "round_robin"], default="max")
+    parser.add_argument("--batch-size", type=int, default=512)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--retrieval", choices=["exact", "ivf"], default="exact")
+    parser.add_argument("--nprobe", type=int, default=8)
+    parser.add_argument(
+        "--quantization", choices=["none", "float16", "int8"], default="none"
+    )
+    parser.add_argument(
+        "--rerank", type=int, default=4, help="float32 re-rank of top-K * N candidates, 0 = off"
+    )
+    parser.add_argument("--output", type=Path, default=None, help="write JSON result here")
+    args = parser.parse_args()
+
+    result = evaluate(
+        ks=args.k,
+        split=args.split,
+        test_fraction=args.test_fraction,
+        seed=args.seed,
+        half_life_days=args.half_life_days,
+        frequency_exponent=args.frequency_exponent,
+        max_users=args.max_users,
+        interests=args.interests,
+        merge=args.merge,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        retrieval=args.retrieval,
+        nprobe=args.nprobe,
+        quantization=args.quantization,
+        rerank=args.rerank,
+    )
+
+    text = json.dumps(result, indent=2)
+    print(text)
+    if args.output is not None:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(text + "\n", encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+# scripts/build_ann_index.py
+
+import time
+from pathlib import Path
+
+from backend.app.ann_index import IVFIndex
+from backend.app.embedding_store import EmbeddingStore
+
+STORE_PATH = Path("backend/data/product_embeddings")
+OUT_PATH = Path("backend/data/ann_ivf.npz")
+
+# число ячеек IVF; None = 4 * sqrt(N)
+NLIST = None
+KMEANS_ITERS = 20
+
+
+def main():
+    if not EmbeddingStore.exists(STORE_PATH):
+        raise FileNotFoundError(
+            f"Embedding store not found at {STORE_PATH} "
+            "(run scripts/convert_embeddings.py first)"
+        )
+
+    store = EmbeddingStore(STORE_PATH)
+    print(f"Building IVF index over {len(store)} products (dim={store.dim})...")
+
+    t0 = time.perf_counter()
+    index = IVFIndex.build(store.matrix, nlist=NLIST, n_iter=KMEANS_ITERS)
+    index.save(OUT_PATH)
+
+    sizes = index.list_offsets[1:] - index.list_offsets[:-1]
+    print(
+        f"Saved IVF index (nlist={index.nlist}, "
+        f"list size min/mean/max={sizes.min()}/{sizes.mean():.1f}/{sizes.max()}) "
+        f"to {OUT_PATH.resolve()} in {time.perf_counter() - t0:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
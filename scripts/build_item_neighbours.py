@@ -0,0 +1,112 @@
+# scripts/build_item_neighbours.py
+#
+# "Frequently Bought Together" neighbours from baskets:
+# invoice x item sparse matrix X, co-occurrence C = X^T X computed in row
+# blocks, top-K neighbours per item kept and saved as CSR arrays (.npz).
+
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from scripts.ingest_transactions import load_transactions
+
+OUT_PATH = Path("backend/data/item_neighbours.npz")
+
+# соседей на товар
+TOP_K = 50
+# товаров в одном блоке X^T X (ограничивает пиковую память)
+BLOCK_SIZE = 2048
+# минимум совместных покупок, чтобы считать пару соседями
+MIN_COUNT = 2
+# cosine: c_ij / sqrt(n_i * n_j) — не даёт популярным товарам забить весь топ
+NORMALIZE = True
+
+
+def top_k_per_row(
+    rows: np.ndarray, cols: np.ndarray, vals: np.ndarray, n_rows: int, k: int
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Keeps the k largest values of every row of a COO block, without a Python
+    loop: one lexsort by (row, -value), then rank inside the row < k.
+    Returns (rows, cols, vals) sorted by row, best first inside a row.
+    """
+    order = np.lexsort((-vals, rows))
+    rows, cols, vals = rows[order], cols[order], vals[order]
+
+    row_start = np.zeros(n_rows + 1, dtype="int64")
+    row_start[1:] = np.cumsum(np.bincount(rows, minlength=n_rows))
+    rank = np.arange(len(rows)) - row_start[rows]
+    keep = rank < k
+    return rows[keep], cols[keep], vals[keep]
+
+
+def main():
+    # очищенные транзакции (отмены и неположительное количество уже убраны)
+    tx = load_transactions()
+
+    t0 = time.perf_counter()
+    # items that occur in baskets, in first appearance order
+    item_idx, item_codes = pd.factorize(tx.stock)
+    item_ids = tx.stock_ids[item_codes]
+
+    # binary invoice x item matrix (duplicates inside an invoice collapse to 1)
+    x = sparse.csr_matrix(
+        (np.ones(len(tx), dtype="float32"), (tx.invoice, item_idx)),
+        shape=(len(tx.invoice_ids), len(item_ids)),
+    )
+    x.sum_duplicates()
+    x.data[:] = 1.0
+    xt = x.T.tocsr()
+
+    item_counts = np.asarray(x.sum(axis=0), dtype="float32").ravel()
+    print(f"Baskets: {x.shape[0]}, items: {x.shape[1]}, nnz: {x.nnz}")
+
+    all_rows, all_cols, all_vals = [], [], []
+    for start in range(0, x.shape[1], BLOCK_SIZE):
+        stop = min(start + BLOCK_SIZE, x.shape[1])
+        # (block, num_items) co-occurrence counts
+        co = (xt[start:stop] @ x).tocoo()
+
+        # no self-pairs, no rare pairs
+        keep = (co.row + start != co.col) & (co.data >= MIN_COUNT)
+        rows, cols, vals = co.row[keep], co.col[keep], co.data[keep].astype("float32")
+        if NORMALIZE:
+            vals = vals / np.sqrt(item_counts[rows + start] * item_counts[cols])
+
+        rows, cols, vals = top_k_per_row(rows, cols, vals, stop - start, TOP_K)
+        all_rows.append(rows + start)
+        all_cols.append(cols)
+        all_vals.append(vals)
+        print(f"  items {start}-{stop}: {len(rows)} neighbours kept")
+
+    # blocks come in row order and are sorted inside, so CSR arrays are a concat
+    rows = np.concatenate(all_rows)
+    indptr = np.zeros(len(item_ids) + 1, dtype="int64")
+    indptr[1:] = np.cumsum(np.bincount(rows, minlength=len(item_ids)))
+    indices = np.concatenate(all_cols).astype("int32")
+    scores = np.concatenate(all_vals).astype("float32")
+
+    # write aside and rename: a running server may be reading the old file
+    OUT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp = OUT_PATH.with_name(OUT_PATH.name + ".tmp.npz")
+    np.savez(
+        tmp,
+        item_ids=np.asarray(item_ids, dtype=str),
+        descriptions=tx.stock_descriptions[item_codes],
+        indptr=indptr,
+        indices=indices,
+        scores=scores,
+    )
+    tmp.replace(OUT_PATH)
+
+    print(
+        f"Saved {len(indices)} item neighbours (top-{TOP_K}) "
+        f"to {OUT_PATH.resolve()} in {time.perf_counter() - t0:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
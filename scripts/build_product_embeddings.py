@@ -1,95 +1,237 @@
 # scripts/build_product_embeddings.py
-
+#
+# Batched, parallel and resumable embedding builder:
+# - many descriptions per embeddings request,
+# - a pool of workers behind an adaptive (AIMD) rate limiter with retry/backoff,
+# - every finished batch is appended (and fsync'ed) to the binary store,
+#   so a crashed run resumes where it stopped,
+# - identical descriptions are embedded once,
+# - --incremental: re-embeds only products whose description changed
+#   (by content hash) and tombstones products gone from the CSV;
+#   a running server picks the delta up via POST /api/admin/embeddings/refresh.
+
+import argparse
 import os
-import json
+import random
+import threading
 import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
+from typing import Dict, List
 
-import pandas as pd
+import numpy as np
 from openai import OpenAI
 from dotenv import load_dotenv
 
+from backend.app.embedding_store import EmbeddingStore, EmbeddingStoreWriter, content_hash
+from scripts.ingest_transactions import load_transactions
+
 load_dotenv()
 
 API_KEY = os.environ.get("API_KEY")
-if not API_KEY:
-    raise RuntimeError("API_KEY is not set in environment")
 
-BASE_URL = "https://foundation-models.api.cloud.ru/v1"
+BASE_URL = os.environ.get(
+    "FOUNDATION_MODELS_BASE_URL", "https://foundation-models.api.cloud.ru/v1"
+)
 EMBEDDING_MODEL = "Qwen/Qwen3-Embedding-0.6B"
 
-# !!! путь к датасету: оставь тот, который у тебя реально есть
-CSV_PATH = Path("backend/data/OnlineRetail.csv")
-OUT_PATH = Path("backend/data/product_embeddings.json")
-
-# задержка между запросами, чтобы не спамить API
-REQUEST_SLEEP = 0.2  # секунды
-
-
-def main():
-    client = OpenAI(
-        api_key=API_KEY,
-        base_url=BASE_URL,
-    )
-
-    if not CSV_PATH.exists():
-        raise FileNotFoundError(f"Dataset not found at {CSV_PATH}")
-
-    print(f"Loading dataset from {CSV_PATH}...")
-    df = pd.read_csv(CSV_PATH, encoding="latin1")
-
-    # Берём уникальные товары: product_id + description
-    df = df[["StockCode", "Description"]].dropna()
-    df = df.drop_duplicates(subset=["StockCode"])
-    df = df.rename(columns={"StockCode": "product_id"})
-
-    products = []
-    for _, row in df.iterrows():
-        pid = str(row["product_id"])
-        desc = str(row["Description"]).strip()
-        if not desc:
-            continue
-        products.append({"product_id": pid, "description": desc})
-
-    print(f"Unique products to embed: {len(products)}")
-
-    result: dict[str, dict] = {}
-
-    for i, p in enumerate(products, start=1):
-        pid = p["product_id"]
-        desc = p["description"]
-
-        print(f"[{i}/{len(products)}] Embedding product {pid!r}")
-
+STORE_PATH = Path("backend/data/product_embeddings")
+
+# описаний в одном запросе к API
+BATCH_SIZE = 64
+# параллельных запросов
+MAX_WORKERS = 4
+# стартовый / минимальный / максимальный темп, запросов в секунду
+INITIAL_RATE = 4.0
+MIN_RATE = 0.5
+MAX_RATE = 20.0
+MAX_RETRIES = 6
+
+
+class AdaptiveRateLimiter:
+    """
+    Spaces requests to at most `rate` per second, shared by all workers.
+    AIMD: every success raises the rate a little, every failure
+    (429, timeouts, 5xx) halves it.
+    """
+
+    def __init__(self, rate: float, min_rate: float, max_rate: float):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self._next_slot = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + 1.0 / self.rate
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+    def on_success(self) -> None:
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + 0.1)
+
+    def on_failure(self) -> None:
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+
+
+def load_products() -> Dict[str, str]:
+    """
+    product_id -> description (first non-empty description per StockCode),
+    from the shared transactions cache.
+    """
+    return load_transactions().catalog()
+
+
+def embed_batch(
+    client: OpenAI,
+    limiter: AdaptiveRateLimiter,
+    texts: List[str],
+) -> np.ndarray:
+    """
+    One embeddings request for a batch of texts, with exponential backoff.
+    """
+    for attempt in range(MAX_RETRIES):
+        limiter.acquire()
         try:
-            response = client.embeddings.create(
-                model=EMBEDDING_MODEL,
-                input=[desc],  # один текст = один запрос
-            )
-            emb = response.data[0].embedding
+            response = client.embeddings.create(model=EMBEDDING_MODEL, input=texts)
+            limiter.on_success()
+            data = sorted(response.data, key=lambda d: d.index)
+            return np.array([d.embedding for d in data], dtype="float32")
         except Exception as e:
-            # Логируем ошибку, но не падаем
-            print(f"  -> error for product {pid}: {e}")
-            continue
-
-        result[pid] = {
-            "product_id": pid,
-            "description": desc,
-            "embedding": emb,
-        }
+            limiter.on_failure()
+            if attempt == MAX_RETRIES - 1:
+                raise
+            backoff = min(60.0, 2**attempt) * (0.5 + random.random())
+            print(f"  -> batch error ({e}), retry {attempt + 1} in {backoff:.1f}s")
+            time.sleep(backoff)
+
+    raise RuntimeError("unreachable")
+
+
+def main(incremental: bool = False):
+    if not API_KEY:
+        raise RuntimeError("API_KEY is not set in environment")
+
+    client = OpenAI(api_key=API_KEY, base_url=BASE_URL, max_retries=0)
+    products = load_products()
+    print(f"Unique products: {len(products)}")
+
+    # resume: skip product_ids already in the store,
+    # reuse vectors of descriptions already embedded
+    live: Dict[str, int] = {}
+    known_vectors: Dict[str, np.ndarray] = {}
+    dim: int | None = None
+    store: EmbeddingStore | None = None
+    if EmbeddingStore.exists(STORE_PATH):
+        store = EmbeddingStore(STORE_PATH)
+        dim = store.dim
+        live = store.live_rows()
+        for row in live.values():
+            known_vectors.setdefault(store.descriptions[row], store.matrix[row])
+        print(f"Resuming: {len(live)} products already in {STORE_PATH}")
+
+    # description -> [product_id, ...]  (dedup of identical texts)
+    pending: Dict[str, List[str]] = defaultdict(list)
+    changed = 0
+    for pid, desc in products.items():
+        row = live.get(pid)
+        if row is None:
+            pending[desc].append(pid)
+        elif incremental and store.hashes[row] != content_hash(desc):
+            pending[desc].append(pid)
+            changed += 1
+
+    if incremental:
+        removed = [pid for pid in live if pid not in products]
+        print(f"Incremental: {changed} changed, {len(removed)} removed products")
+        if removed:
+            with EmbeddingStoreWriter(STORE_PATH, dim=dim, model=EMBEDDING_MODEL) as writer:
+                writer.delete(removed)
+
+    # descriptions we already have vectors for — written without API calls
+    reused = [desc for desc in pending if desc in known_vectors]
+    texts = [desc for desc in pending if desc not in known_vectors]
+    print(
+        f"Products to embed: {sum(len(v) for v in pending.values())} "
+        f"({len(texts)} unique descriptions, {len(reused)} reused)"
+    )
 
-        # Чуть притормозим между запросами
-        time.sleep(REQUEST_SLEEP)
+    if reused:
+        with EmbeddingStoreWriter(STORE_PATH, dim=dim, model=EMBEDDING_MODEL) as writer:
+            for desc in reused:
+                pids = pending[desc]
+                vectors = np.tile(known_vectors[desc], (len(pids), 1))
+                writer.append(pids, [desc] * len(pids), vectors)
+
+    if not texts:
+        print("Nothing to embed.")
+        return
+
+    batches = [texts[i : i + BATCH_SIZE] for i in range(0, len(texts), BATCH_SIZE)]
+    limiter = AdaptiveRateLimiter(INITIAL_RATE, MIN_RATE, MAX_RATE)
+
+    writer: EmbeddingStoreWriter | None = None
+    written = failed = 0
+    t0 = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        futures = {pool.submit(embed_batch, client, limiter, batch): batch for batch in batches}
+
+        # results are written from this thread only — the writer is not thread-safe
+        for i, future in enumerate(as_completed(futures), start=1):
+            batch = futures[future]
+            try:
+                vectors = future.result()
+            except Exception as e:
+                # Логируем ошибку, но не падаем — при перезапуске батч доберётся
+                failed += len(batch)
+                print(f"  -> batch failed permanently: {e}")
+                continue
+
+            if writer is None:
+                writer = EmbeddingStoreWriter(
+                    STORE_PATH, dim=vectors.shape[1], model=EMBEDDING_MODEL
+                )
+
+            pids: List[str] = []
+            descs: List[str] = []
+            rows: List[np.ndarray] = []
+            for desc, vec in zip(batch, vectors):
+                for pid in pending[desc]:
+                    pids.append(pid)
+                    descs.append(desc)
+                    rows.append(vec)
+            writer.append(pids, descs, np.stack(rows))
+            written += len(pids)
+
+            elapsed = time.perf_counter() - t0
+            print(
+                f"[{i}/{len(batches)}] +{len(pids)} products "
+                f"({written / elapsed:.1f}/s, rate limit {limiter.rate:.1f} req/s)"
+            )
 
-    OUT_PATH.parent.mkdir(parents=True, exist_ok=True)
-    with OUT_PATH.open("w", encoding="utf-8") as f:
-        json.dump(result, f)
+    if writer is not None:
+        writer.close()
 
     print(
-        f"Saved product embeddings for {len(result)} products "
-        f"to {OUT_PATH.resolve()}"
+        f"Saved embeddings for {written} products to {STORE_PATH.resolve()}"
+        + (f", {failed} failed (re-run to retry)" if failed else "")
     )
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Build product embeddings into the binary store")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="re-embed changed descriptions and tombstone products missing from the CSV",
+    )
+    args = parser.parse_args()
+    main(incremental=args.incremental)
@@ -0,0 +1,86 @@
+# scripts/build_topk_tables.py
+#
+# Precomputes top-K recommendations for every user with purchases and
+# top-K similar products for every live product, with the serving code
+# (same profiles, interest merge and ANN backend as the running settings),
+# and saves them as int32 / float16 tables. The server answers known,
+# unchanged users / products from the tables and scores the rest live.
+
+import time
+from pathlib import Path
+
+import numpy as np
+
+from backend.app.config import get_settings
+from backend.app.recommender import Recommender
+from backend.app.topk_tables import TopKTables, config_fingerprint, profile_digests
+
+OUT_PATH = Path(get_settings().topk_tables_path)
+
+# длина списков в таблице (запросы с top_n > TOP_K считаются онлайн)
+TOP_K = 50
+
+
+def _to_table(idx: np.ndarray, scores: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    scores = np.where(idx >= 0, scores, 0.0)
+    return idx.astype("int32"), scores.astype("float16")
+
+
+def main():
+    settings = get_settings().model_copy(update={"topk_tables_enabled": False})
+    rec = Recommender(settings)
+    block = max(1, settings.recommend_batch_size)
+    t0 = time.perf_counter()
+
+    # users: same vectors / bought masks / blocklist / merge as _recommend_for_users
+    n_users = len(rec.user_ids)
+    purchases = rec._purchases[0]
+    user_digests = profile_digests(purchases.indptr, purchases.indices, purchases.data)
+    user_items = np.full((n_users, TOP_K), -1, dtype="int32")
+    user_scores = np.zeros((n_users, TOP_K), dtype="float16")
+    active = np.flatnonzero(rec.user_counts[:n_users] > 0)
+    for start in range(0, len(active), block):
+        rows = active[start : start + block]
+        vecs = rec.user_sums[rows]
+        vecs = vecs / np.clip(np.linalg.norm(vecs, axis=1, keepdims=True), 1e-8, None)
+        bought = [rec._bought_indices(row) for row in rows]
+        idx, scores = rec._search_users(rows, vecs, bought, TOP_K, rec.masks.blocked)
+        user_items[rows], user_scores[rows] = _to_table(idx, scores)
+    print(f"Users: {len(active)} in {time.perf_counter() - t0:.1f}s")
+
+    # products: neighbours of every live, not blocked row, the row itself excluded
+    t1 = time.perf_counter()
+    product_rows = rec._live_rows.astype("int32")
+    product_items = np.full((len(product_rows), TOP_K), -1, dtype="int32")
+    product_scores = np.zeros((len(product_rows), TOP_K), dtype="float16")
+    for start in range(0, len(product_rows), block):
+        rows = product_rows[start : start + block]
+        queries = np.asarray(rec.embedding_matrix[rows], dtype="float32")
+        idx, scores = rec.index.search(
+            queries, TOP_K, exclude=[np.array([r]) for r in rows], mask=rec.masks.blocked
+        )
+        product_items[start : start + len(rows)], product_scores[start : start + len(rows)] = (
+            _to_table(idx, scores)
+        )
+    print(f"Products: {len(product_rows)} in {time.perf_counter() - t1:.1f}s")
+
+    TopKTables.save(
+        OUT_PATH,
+        user_ids=np.asarray(rec.user_ids, dtype=str),
+        user_items=user_items,
+        user_scores=user_scores,
+        user_digests=user_digests,
+        product_ids=np.asarray([rec.product_ids[r] for r in product_rows.tolist()], dtype=str),
+        product_rows=product_rows,
+        product_items=product_items,
+        product_scores=product_scores,
+        built_at=np.float64(time.time()),
+        num_rows=np.int64(len(rec.product_ids)),
+        config=np.str_(config_fingerprint(settings)),
+    )
+    size_mb = OUT_PATH.stat().st_size / 2**20
+    print(f"Saved top-{TOP_K} tables ({size_mb:.1f} MB) to {OUT_PATH.resolve()}")
+
+
+if __name__ == "__main__":
+    main()
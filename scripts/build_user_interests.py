@@ -0,0 +1,72 @@
+# scripts/build_user_interests.py
+#
+# Multi-interest user profiles: clusters every user's purchased-item
+# embeddings into up to NUM_INTERESTS interest vectors (batched weighted
+# spherical k-means over all users) and saves a fixed-size tensor.
+# Served when MULTI_INTEREST_MERGE=max|round_robin.
+
+import time
+from pathlib import Path
+
+from backend.app.config import get_settings
+from backend.app.embedding_store import EmbeddingStore
+from backend.app.purchase_store import load_histories
+from backend.app.user_interests import UserInterests, batched_interest_kmeans
+
+STORE_PATH = Path("backend/data/product_embeddings")
+PURCHASES_PATH = Path("backend/data/user_purchases.npz")
+PURCHASES_JSON_PATH = Path("backend/data/user_purchases.json")
+OUT_PATH = Path("backend/data/user_interests.npz")
+
+# интересов на пользователя (размер тензора: users x K x dim)
+NUM_INTERESTS = 4
+# минимум покупок на один интерес: 12 покупок -> 2 интереса
+ITEMS_PER_INTEREST = 5
+# учитываем только последние покупки
+MAX_ITEMS = 256
+KMEANS_ITERS = 10
+
+
+def main():
+    if not EmbeddingStore.exists(STORE_PATH):
+        raise FileNotFoundError(
+            f"Embedding store not found at {STORE_PATH} "
+            "(run scripts/convert_embeddings.py first)"
+        )
+
+    settings = get_settings()
+    store = EmbeddingStore(STORE_PATH)
+    histories = load_histories(PURCHASES_PATH, PURCHASES_JSON_PATH)
+
+    # same per-purchase weights as the single-vector profile
+    weights = histories.weights(
+        settings.profile_half_life_days, settings.profile_frequency_exponent
+    )
+    indptr, items, weights = histories.to_rows(store.live_rows(), weights)
+    print(
+        f"Clustering {len(histories)} users ({len(items)} purchases) "
+        f"into up to {NUM_INTERESTS} interests..."
+    )
+
+    t0 = time.perf_counter()
+    interests, interest_weights, n_interests = batched_interest_kmeans(
+        store.matrix,
+        indptr,
+        items,
+        weights,
+        k=NUM_INTERESTS,
+        items_per_interest=ITEMS_PER_INTEREST,
+        max_items=MAX_ITEMS,
+        n_iter=KMEANS_ITERS,
+    )
+    UserInterests.save(OUT_PATH, histories.user_ids, interests, interest_weights, n_interests)
+
+    counts = [int((n_interests == i).sum()) for i in range(NUM_INTERESTS + 1)]
+    print(
+        f"Saved interests (users by interest count {counts}) "
+        f"to {OUT_PATH.resolve()} in {time.perf_counter() - t0:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,52 +1,61 @@
 # backend/scripts/build_user_purchases.py
 
-import json
 from pathlib import Path
 
-import pandas as pd
+import numpy as np
 
-CSV_PATH = Path("backend/data/OnlineRetail.csv")            # при необходимости поменяй путь
-OUT_PATH = Path("backend/data/user_purchases.json")
+from backend.app.purchase_store import PurchaseHistories
+from scripts.ingest_transactions import load_transactions
 
+OUT_PATH = Path("backend/data/user_purchases.npz")
 
-def main():
-    if not CSV_PATH.exists():
-        raise FileNotFoundError(f"Dataset not found at {CSV_PATH}")
-
-    print(f"Loading dataset from {CSV_PATH}...")
-    df = pd.read_csv(CSV_PATH, encoding="latin1")
-
-    # Берём нужные колонки
-    df = df[["CustomerID", "StockCode", "Quantity", "InvoiceNo"]]
-
-    # Фильтруем: только валидные CustomerID/StockCode
-    df = df.dropna(subset=["CustomerID", "StockCode"])
-
-    # Убираем отменённые/возвратные инвойсы (InvoiceNo, начинающийся с 'C')
-    df["InvoiceNo"] = df["InvoiceNo"].astype(str)
-    df = df[~df["InvoiceNo"].str.startswith("C")]
 
-    # Только положительное количество
-    df = df[df["Quantity"] > 0]
-
-    # Приводим к строкам
-    df["CustomerID"] = df["CustomerID"].astype(int).astype(str)
-    df["StockCode"] = df["StockCode"].astype(str)
-
-    # Делаем список уникальных товаров на пользователя
-    df = df.drop_duplicates(subset=["CustomerID", "StockCode"])
-
-    user_purchases = (
-        df.groupby("CustomerID")["StockCode"].apply(list).to_dict()
+def main():
+    # очищенные транзакции (отмены и неположительное количество уже убраны)
+    tx = load_transactions()
+
+    # только строки с CustomerID
+    has_user = tx.customer >= 0
+    user, item = tx.customer[has_user].astype("int64"), tx.stock[has_user].astype("int64")
+    invoice, ts = tx.invoice[has_user].astype("int64"), tx.ts[has_user]
+
+    # Одна строка на (пользователь, товар) в порядке первой покупки:
+    # число инвойсов и время последней покупки
+    pair_key = user * len(tx.stock_ids) + item
+    keys, first, pair = np.unique(pair_key, return_index=True, return_inverse=True)
+    pair_invoices = np.unique(pair * len(tx.invoice_ids) + invoice)
+    counts = np.bincount(pair_invoices // len(tx.invoice_ids), minlength=len(keys))
+    last_purchase = np.zeros(len(keys), dtype="uint32")
+    np.maximum.at(last_purchase, pair, ts)
+
+    by_first = np.argsort(first, kind="stable")
+    pair_user = (keys // len(tx.stock_ids))[by_first]
+    pair_item = (keys % len(tx.stock_ids))[by_first]
+
+    # CSR: users sorted by id, items in purchase (file) order inside a user
+    used_users, user_codes = np.unique(pair_user, return_inverse=True)
+    user_ids = tx.customer_ids[used_users]
+    user_rank = np.argsort(np.argsort(user_ids, kind="stable"))
+    user_codes = user_rank[user_codes]
+    used_items, item_codes = np.unique(pair_item, return_inverse=True)
+    order = np.argsort(user_codes, kind="stable")
+
+    indptr = np.zeros(len(user_ids) + 1, dtype="int64")
+    indptr[1:] = np.cumsum(np.bincount(user_codes, minlength=len(user_ids)))
+
+    histories = PurchaseHistories(
+        np.sort(user_ids),
+        indptr,
+        item_codes[order].astype("int32"),
+        tx.stock_ids[used_items],
+        counts=counts[by_first][order].astype("int32"),
+        last_purchase=last_purchase[by_first][order],
     )
-
-    OUT_PATH.parent.mkdir(parents=True, exist_ok=True)
-    with OUT_PATH.open("w", encoding="utf-8") as f:
-        json.dump(user_purchases, f)
+    histories.save(OUT_PATH)
 
     print(
         f"Saved user purchases to {OUT_PATH.resolve()} "
-        f"(users: {len(user_purchases)})"
+        f"(users: {len(histories)}, purchases: {histories.nnz})"
     )
 
 
@@ -0,0 +1,103 @@
+# scripts/convert_embeddings.py
+#
+#   python -m scripts.convert_embeddings [--quantize int8]    # JSON -> binary store
+#   python -m scripts.convert_embeddings --quantize-only int8 # codes for an existing store
+#
+# --quantize writes the compressed codes scored with EMBEDDING_QUANTIZATION
+# (vectors.i8 + scales.f32 or vectors.f16) next to vectors.f32; the server
+# memory-maps them instead of quantizing the matrix in every worker.
+
+import argparse
+import json
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+from backend.app.ann_index import QUANTIZED_FILES, QuantizedMatrix
+from backend.app.embedding_store import EmbeddingStore, EmbeddingStoreWriter
+
+JSON_PATH = Path("backend/data/product_embeddings.json")
+STORE_PATH = Path("backend/data/product_embeddings")
+EMBEDDING_MODEL = "Qwen/Qwen3-Embedding-0.6B"
+
+# сколько строк писать за раз
+CHUNK_SIZE = 1024
+
+
+def quantize(mode: str) -> None:
+    store = EmbeddingStore(STORE_PATH)
+    QuantizedMatrix.write(STORE_PATH, store.matrix, mode)
+    quantized = QuantizedMatrix.open(STORE_PATH, mode, store.dim)
+    print(
+        f"Saved {mode} codes for {len(quantized)} rows ({quantized.nbytes / 2**20:.1f} MB "
+        f"vs {store.matrix.nbytes / 2**20:.1f} MB float32) to {STORE_PATH.resolve()}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert / quantize product embeddings")
+    parser.add_argument(
+        "--quantize",
+        nargs="*",
+        choices=list(QUANTIZED_FILES),
+        default=[],
+        help="also write quantized codes for EMBEDDING_QUANTIZATION",
+    )
+    parser.add_argument(
+        "--quantize-only",
+        nargs="+",
+        choices=list(QUANTIZED_FILES),
+        default=None,
+        help="only (re)write codes of the existing store",
+    )
+    args = parser.parse_args()
+
+    if args.quantize_only:
+        if not EmbeddingStore.exists(STORE_PATH):
+            raise FileNotFoundError(f"Embedding store not found at {STORE_PATH}")
+        for mode in args.quantize_only:
+            quantize(mode)
+        return
+
+    if not JSON_PATH.exists():
+        raise FileNotFoundError(f"Embeddings JSON not found at {JSON_PATH}")
+
+    print(f"Loading embeddings from {JSON_PATH}...")
+    with JSON_PATH.open("r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    items = list(data.items())
+    if not items:
+        raise RuntimeError("No embeddings in JSON file")
+    dim = len(items[0][1]["embedding"])
+
+    # пишем во временную папку и подменяем целиком, чтобы не оставить полупустой store
+    tmp_path = STORE_PATH.with_name(STORE_PATH.name + ".tmp")
+    if tmp_path.exists():
+        shutil.rmtree(tmp_path)
+
+    with EmbeddingStoreWriter(tmp_path, dim=dim, model=EMBEDDING_MODEL) as writer:
+        for start in range(0, len(items), CHUNK_SIZE):
+            chunk = items[start : start + CHUNK_SIZE]
+            writer.append(
+                [str(pid) for pid, _ in chunk],
+                [p.get("description", "") for _, p in chunk],
+                np.array([p["embedding"] for _, p in chunk], dtype="float32"),
+            )
+
+    if STORE_PATH.exists():
+        shutil.rmtree(STORE_PATH)
+    tmp_path.rename(STORE_PATH)
+
+    store = EmbeddingStore(STORE_PATH)
+    print(
+        f"Saved {len(store)} embeddings (dim={store.dim}) "
+        f"to {STORE_PATH.resolve()}"
+    )
+    for mode in args.quantize:
+        quantize(mode)
+
+
+if __name__ == "__main__":
+    main()
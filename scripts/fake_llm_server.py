@@ -0,0 +1,79 @@
+# scripts/fake_llm_server.py
+#
+# Local OpenAI-compatible stub for development and load tests:
+#   uvicorn scripts.fake_llm_server:app --port 9000
+#   FOUNDATION_MODELS_BASE_URL=http://127.0.0.1:9000/v1 uvicorn backend.app.main:app
+#
+# FAKE_LLM_DELAY_S / FAKE_LLM_SLOW_EVERY emulate round-trip latency and stragglers.
+
+import asyncio
+import hashlib
+import itertools
+import os
+import time
+
+from fastapi import FastAPI, Request
+
+DELAY_S = float(os.environ.get("FAKE_LLM_DELAY_S", "0.5"))
+# каждый N-й запрос «зависает» на 10x дольше (0 = выключено)
+SLOW_EVERY = int(os.environ.get("FAKE_LLM_SLOW_EVERY", "0"))
+
+app = FastAPI(title="Fake OpenAI-compatible LLM")
+
+_counter = itertools.count(1)
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    n = next(_counter)
+
+    delay = DELAY_S
+    if SLOW_EVERY and n % SLOW_EVERY == 0:
+        delay *= 10
+    await asyncio.sleep(delay)
+
+    prompt = body["messages"][-1]["content"]
+    # последняя строка в кавычках — описание рекомендуемого товара
+    quoted = [line for line in prompt.splitlines() if line.startswith('"')]
+    item = quoted[-1].strip('"') if quoted else "this product"
+
+    return {
+        "id": f"chatcmpl-fake-{n}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "fake"),
+        "choices": [
+            {
+                "index": 0,
+                "message": {
+                    "role": "assistant",
+                    "content": f"{item.title()} fits well with your previous purchases.",
+                },
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+    }
+
+
+@app.post("/v1/embeddings")
+async def embeddings(request: Request):
+    body = await request.json()
+    await asyncio.sleep(DELAY_S)
+
+    inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+    dim = int(os.environ.get("FAKE_EMBEDDING_DIM", "1024"))
+    data = []
+    for i, text in enumerate(inputs):
+        # детерминированный псевдо-эмбеддинг из хеша текста
+        seed = int(hashlib.md5(text.encode("utf-8")).hexdigest()[:8], 16)
+        vec = [((seed * (j + 1)) % 1000) / 1000.0 - 0.5 for j in range(dim)]
+        data.append({"object": "embedding", "index": i, "embedding": vec})
+
+    return {
+        "object": "list",
+        "data": data,
+        "model": body.get("model", "fake"),
+        "usage": {"prompt_tokens": 0, "total_tokens": 0},
+    }
@@ -0,0 +1,228 @@
+# scripts/ingest_transactions.py
+#
+# Shared ingest stage for OnlineRetail.csv: the latin1 CSV is parsed once,
+# in chunks with explicit dtypes, cleaned once (no cancelled invoices, no
+# non-positive quantities, no rows without InvoiceNo/StockCode) and cached
+# as columnar .npz arrays with categorical codes:
+#
+#   invoice             (rows,)    int32   index into invoice_ids
+#   stock               (rows,)    int32   index into stock_ids
+#   customer            (rows,)    int32   index into customer_ids, -1 = no CustomerID
+#   quantity            (rows,)    int32
+#   ts                  (rows,)    uint32  InvoiceDate, unix seconds (0 = unparsable)
+#   invoice_ids, stock_ids, customer_ids   str vocabularies (first appearance order)
+#   stock_descriptions  (stocks,)  str     first non-empty description over the
+#                                          whole file (cancelled rows included), "" if none
+#
+# Builders call load_transactions(), which re-ingests only when the CSV
+# changed (size / mtime):
+#
+#   python -m scripts.ingest_transactions
+
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+CSV_PATH = Path("backend/data/OnlineRetail.csv")
+CACHE_PATH = Path("backend/data/transactions.npz")
+
+# строк CSV в одном чанке (ограничивает пиковую память)
+CHUNK_ROWS = 200_000
+
+DTYPES = {
+    "InvoiceNo": str,
+    "StockCode": str,
+    "Description": str,
+    "Quantity": "float64",
+    "InvoiceDate": str,
+    "CustomerID": "float64",
+}
+DATE_FORMAT = "%m/%d/%Y %H:%M"
+
+
+class _Encoder:
+    """
+    Value -> dense int code, stable across chunks (first appearance order).
+    """
+
+    def __init__(self):
+        self.codes: Dict[str, int] = {}
+
+    def encode(self, values: pd.Series) -> np.ndarray:
+        codes, uniques = pd.factorize(values)  # NaN -> -1
+        mapping = np.array(
+            [self.codes.setdefault(u, len(self.codes)) for u in uniques.tolist()] + [-1],
+            dtype="int32",
+        )
+        return mapping[codes]
+
+    def vocabulary(self) -> np.ndarray:
+        return np.asarray(list(self.codes.keys()), dtype=str)
+
+
+class Transactions:
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self.invoice: np.ndarray = arrays["invoice"]
+        self.stock: np.ndarray = arrays["stock"]
+        self.customer: np.ndarray = arrays["customer"]
+        self.quantity: np.ndarray = arrays["quantity"]
+        self.ts: np.ndarray = arrays["ts"]
+        self.invoice_ids: np.ndarray = arrays["invoice_ids"]
+        self.stock_ids: np.ndarray = arrays["stock_ids"]
+        self.customer_ids: np.ndarray = arrays["customer_ids"]
+        self.stock_descriptions: np.ndarray = arrays["stock_descriptions"]
+        self.source_size = int(arrays["source_size"])
+        self.source_mtime_ns = int(arrays["source_mtime_ns"])
+
+    def __len__(self) -> int:
+        return len(self.invoice)
+
+    @classmethod
+    def load(cls, path: str | Path) -> "Transactions":
+        data = np.load(path)
+        return cls({key: data[key] for key in data.files})
+
+    def save(self, path: str | Path) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp.npz")
+        np.savez(
+            tmp,
+            invoice=self.invoice,
+            stock=self.stock,
+            customer=self.customer,
+            quantity=self.quantity,
+            ts=self.ts,
+            invoice_ids=self.invoice_ids,
+            stock_ids=self.stock_ids,
+            customer_ids=self.customer_ids,
+            stock_descriptions=self.stock_descriptions,
+            source_size=np.int64(self.source_size),
+            source_mtime_ns=np.int64(self.source_mtime_ns),
+        )
+        tmp.replace(path)
+
+    def matches(self, csv_path: str | Path) -> bool:
+        stat = Path(csv_path).stat()
+        return stat.st_size == self.source_size and stat.st_mtime_ns == self.source_mtime_ns
+
+    def catalog(self) -> Dict[str, str]:
+        """
+        product_id -> description, products with a non-empty description only.
+        """
+        has_desc = self.stock_descriptions != ""
+        return dict(
+            zip(self.stock_ids[has_desc].tolist(), self.stock_descriptions[has_desc].tolist())
+        )
+
+
+def ingest(csv_path: str | Path = CSV_PATH, chunk_rows: int = CHUNK_ROWS) -> Transactions:
+    """
+    Parses and cleans the CSV chunk by chunk; only the int columns of the
+    kept rows and the vocabularies stay in memory.
+    """
+    csv_path = Path(csv_path)
+    stat = csv_path.stat()
+    invoices, stocks, customers = _Encoder(), _Encoder(), _Encoder()
+    descriptions: Dict[int, str] = {}
+    columns: Dict[str, List[np.ndarray]] = {
+        "invoice": [], "stock": [], "customer": [], "quantity": [], "ts": []
+    }
+
+    reader = pd.read_csv(
+        csv_path,
+        encoding="latin1",
+        usecols=list(DTYPES),
+        dtype=DTYPES,
+        chunksize=chunk_rows,
+    )
+    with reader:
+        for chunk in reader:
+            stock = stocks.encode(chunk["StockCode"])
+
+            # каталог: первое непустое описание товара (по всем строкам, включая отмены)
+            desc = chunk["Description"].str.strip()
+            has_desc = ((stock >= 0) & desc.notna() & (desc != "")).to_numpy()
+            codes, first = np.unique(stock[has_desc], return_index=True)
+            desc_values = desc.to_numpy()[has_desc][first]
+            for code, text in zip(codes.tolist(), desc_values.tolist()):
+                descriptions.setdefault(code, text)
+
+            # Убираем отменённые/возвратные инвойсы и неположительное количество
+            invoice_no = chunk["InvoiceNo"]
+            keep = (
+                (stock >= 0)
+                & invoice_no.notna().to_numpy()
+                & ~invoice_no.str.startswith("C", na=False).to_numpy()
+                & (chunk["Quantity"] > 0).to_numpy()
+            )
+            kept = chunk[keep]
+
+            customer = np.full(len(kept), -1, dtype="int32")
+            has_customer = kept["CustomerID"].notna().to_numpy()
+            customer[has_customer] = customers.encode(
+                kept["CustomerID"][has_customer].astype("int64").astype(str)
+            )
+
+            ts = pd.to_datetime(kept["InvoiceDate"], format=DATE_FORMAT, errors="coerce")
+            seconds = (ts - pd.Timestamp(0)).dt.total_seconds().fillna(0)
+
+            columns["invoice"].append(invoices.encode(kept["InvoiceNo"]))
+            columns["stock"].append(stock[keep])
+            columns["customer"].append(customer)
+            columns["quantity"].append(kept["Quantity"].to_numpy().astype("int32"))
+            columns["ts"].append(seconds.to_numpy().clip(0, 2**32 - 1).astype("uint32"))
+
+    stock_ids = stocks.vocabulary()
+    arrays = {key: np.concatenate(parts) for key, parts in columns.items()}
+    arrays.update(
+        invoice_ids=invoices.vocabulary(),
+        stock_ids=stock_ids,
+        customer_ids=customers.vocabulary(),
+        stock_descriptions=np.asarray(
+            [descriptions.get(i, "") for i in range(len(stock_ids))], dtype=str
+        ),
+        source_size=stat.st_size,
+        source_mtime_ns=stat.st_mtime_ns,
+    )
+    return Transactions(arrays)
+
+
+def load_transactions(
+    csv_path: str | Path = CSV_PATH, cache_path: str | Path = CACHE_PATH
+) -> Transactions:
+    """
+    Cleaned transactions from the columnar cache, re-ingesting the CSV
+    when the cache is missing or older than the CSV.
+    """
+    csv_path, cache_path = Path(csv_path), Path(cache_path)
+    if cache_path.exists():
+        cached = Transactions.load(cache_path)
+        if not csv_path.exists() or cached.matches(csv_path):
+            return cached
+    if not csv_path.exists():
+        raise FileNotFoundError(f"Dataset not found at {csv_path}")
+
+    print(f"Ingesting {csv_path}...")
+    t0 = time.perf_counter()
+    transactions = ingest(csv_path)
+    transactions.save(cache_path)
+    print(
+        f"Cached {len(transactions)} transactions ({len(transactions.stock_ids)} products, "
+        f"{len(transactions.customer_ids)} customers) to {cache_path} "
+        f"in {time.perf_counter() - t0:.1f}s"
+    )
+    return transactions
+
+
+def main():
+    if CACHE_PATH.exists():
+        CACHE_PATH.unlink()  # явный запуск — всегда пересобираем
+    load_transactions()
+
+
+if __name__ == "__main__":
+    main()
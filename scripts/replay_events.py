@@ -0,0 +1,57 @@
+# scripts/replay_events.py
+#
+# Bulk replay of purchase events into the live event log:
+#
+#   python -m scripts.replay_events events.jsonl            # replay once
+#   python -m scripts.replay_events events.jsonl --follow   # keep tailing (tail -f)
+#
+# Input: one {"user_id", "product_id", "ts"?} object per line. Events are
+# appended to the write-ahead log in batches; running servers apply them
+# within PURCHASE_EVENTS_POLL_S and compact them into the purchase store.
+
+import argparse
+import time
+from pathlib import Path
+
+from backend.app.config import get_settings
+from backend.app.events import PurchaseEventLog, make_event, read_jsonl
+
+# событий за одну запись в лог
+BATCH_SIZE = 10_000
+# байт входного файла за одно чтение (ограничивает память)
+READ_BYTES = 16 << 20
+# пауза между чтениями в режиме --follow, секунд
+POLL_S = 0.5
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay purchase events into the event log")
+    parser.add_argument("path", type=Path, help="JSONL file with purchase events")
+    parser.add_argument("--follow", action="store_true", help="keep reading appended lines")
+    args = parser.parse_args()
+
+    settings = get_settings()
+    log = PurchaseEventLog(settings.purchase_events_path, fsync=settings.purchase_events_fsync)
+
+    offset, total, skipped = 0, 0, 0
+    t0 = time.perf_counter()
+    while True:
+        records, new_offset = read_jsonl(args.path, offset, READ_BYTES)
+        progressed, offset = new_offset > offset, new_offset
+        events = [make_event(r) for r in records]
+        skipped += sum(e is None for e in events)
+        events = [e for e in events if e is not None]
+        for start in range(0, len(events), BATCH_SIZE):
+            log.append(events[start : start + BATCH_SIZE])
+        total += len(events)
+        if records:
+            print(f"Appended {total} events ({skipped} skipped) in {time.perf_counter() - t0:.1f}s")
+        if progressed:
+            continue
+        if not args.follow:
+            break
+        time.sleep(POLL_S)
+
+
+if __name__ == "__main__":
+    main()